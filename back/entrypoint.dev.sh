@@ -3,6 +3,9 @@
 echo "Running db migrations..."
 flask --app src/index.py db upgrade
 
+echo "Creating upcoming sales partitions..."
+poetry run python3 -m src.data_scripts.sales_partition_maintenance
+
 echo "Populating db..."
 poetry run python3 -m src.data_scripts.storage_data_generator
 poetry run python3 -m src.data_scripts.sales_data_generator
@@ -0,0 +1,31 @@
+"""add sales ingest batches table
+
+Revision ID: 4c6e1b9d2f73
+Revises: f2a7c9d4e816
+Create Date: 2025-12-18 09:41:12.503817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c6e1b9d2f73'
+down_revision = 'f2a7c9d4e816'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One row per ingested batch, written in the same transaction as its sales rows
+    op.create_table('sales_ingest_batches',
+    sa.Column('idempotency_key', sa.String(length=255), nullable=False),
+    sa.Column('checksum', sa.String(length=64), nullable=False),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('idempotency_key')
+    )
+
+
+def downgrade():
+    op.drop_table('sales_ingest_batches')
@@ -0,0 +1,150 @@
+"""add sales daily rollup table
+
+Revision ID: 5b0e8a7c41d2
+Revises: d3f3a6be0760
+Create Date: 2025-12-08 09:12:40.118302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b0e8a7c41d2'
+down_revision = 'd3f3a6be0760'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_daily_rollup',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False, server_default='0'),
+    sa.Column('transactions', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+
+    # Recompute the rollup rows of the given days from the raw sales rows.
+    # Only the touched days are re-aggregated, so the cost of a write is
+    # proportional to the sales of those days and not to the whole history.
+    # Refreshes of the same day are serialized with a transaction-level advisory
+    # lock: a concurrent writer of that day waits for the first one to commit and
+    # then re-aggregates with its rows visible, instead of overwriting them with
+    # totals from its own snapshot. Days are locked in order to avoid deadlocks.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION refresh_sales_daily_rollup(p_days date[])
+        RETURNS void AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtext('sales_daily_rollup'), hashtext(d.day::text))
+            FROM (SELECT DISTINCT day FROM unnest(p_days) AS u(day) ORDER BY day) AS d;
+
+            DELETE FROM sales_daily_rollup WHERE day = ANY(p_days);
+
+            INSERT INTO sales_daily_rollup (day, product_id, quantity, revenue, transactions)
+            SELECT
+                d.day,
+                s.product_id,
+                SUM(s.quantity),
+                COALESCE(SUM(s.amount), 0),
+                COUNT(DISTINCT s.transaction_id)
+            FROM unnest(p_days) AS d(day)
+            JOIN sales s ON s.date >= d.day AND s.date < d.day + 1
+            GROUP BY d.day, s.product_id
+            ON CONFLICT (day, product_id) DO UPDATE SET
+                quantity = EXCLUDED.quantity,
+                revenue = EXCLUDED.revenue,
+                transactions = EXCLUDED.transactions;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION sales_daily_rollup_sync()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM refresh_sales_daily_rollup(
+                    ARRAY(SELECT DISTINCT date::date FROM new_rows)
+                );
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM refresh_sales_daily_rollup(
+                    ARRAY(
+                        SELECT date::date FROM old_rows
+                        UNION
+                        SELECT date::date FROM new_rows
+                    )
+                );
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM refresh_sales_daily_rollup(
+                    ARRAY(SELECT DISTINCT date::date FROM old_rows)
+                );
+            ELSIF TG_OP = 'TRUNCATE' AND EXISTS (SELECT 1 FROM sales_daily_rollup) THEN
+                -- TRUNCATE products CASCADE (used by the data generators) empties
+                -- the rollup in the same statement, and truncating it again from
+                -- here fails because the table is still in use by that statement
+                TRUNCATE sales_daily_rollup;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    # Transition tables can only be attached to single-event triggers
+    op.execute(
+        """
+        CREATE TRIGGER sales_daily_rollup_insert
+        AFTER INSERT ON sales
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sales_daily_rollup_sync();
+
+        CREATE TRIGGER sales_daily_rollup_update
+        AFTER UPDATE ON sales
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sales_daily_rollup_sync();
+
+        CREATE TRIGGER sales_daily_rollup_delete
+        AFTER DELETE ON sales
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sales_daily_rollup_sync();
+
+        CREATE TRIGGER sales_daily_rollup_truncate
+        AFTER TRUNCATE ON sales
+        FOR EACH STATEMENT EXECUTE FUNCTION sales_daily_rollup_sync();
+        """
+    )
+
+    # Backfill the existing history
+    op.execute(
+        """
+        INSERT INTO sales_daily_rollup (day, product_id, quantity, revenue, transactions)
+        SELECT
+            date::date,
+            product_id,
+            SUM(quantity),
+            COALESCE(SUM(amount), 0),
+            COUNT(DISTINCT transaction_id)
+        FROM sales
+        GROUP BY date::date, product_id;
+        """
+    )
+
+
+def downgrade():
+    op.execute(
+        """
+        DROP TRIGGER IF EXISTS sales_daily_rollup_truncate ON sales;
+        DROP TRIGGER IF EXISTS sales_daily_rollup_delete ON sales;
+        DROP TRIGGER IF EXISTS sales_daily_rollup_update ON sales;
+        DROP TRIGGER IF EXISTS sales_daily_rollup_insert ON sales;
+        DROP FUNCTION IF EXISTS sales_daily_rollup_sync();
+        DROP FUNCTION IF EXISTS refresh_sales_daily_rollup(date[]);
+        """
+    )
+    op.drop_table('sales_daily_rollup')
@@ -0,0 +1,32 @@
+"""add inventory snapshots table
+
+Revision ID: 8a1d5e3f6c29
+Revises: 4c6e1b9d2f73
+Create Date: 2025-12-19 14:05:37.918402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a1d5e3f6c29'
+down_revision = '4c6e1b9d2f73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Inventory of every product at taken_at, point-in-time lookups replay history from here.
+    # The primary key is the index for the nearest snapshot of a product.
+    op.create_table('inventory_snapshots',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('taken_at', sa.DateTime(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'taken_at')
+    )
+
+
+def downgrade():
+    op.drop_table('inventory_snapshots')
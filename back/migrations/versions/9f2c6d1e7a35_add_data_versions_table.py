@@ -0,0 +1,63 @@
+"""add data versions table
+
+Revision ID: 9f2c6d1e7a35
+Revises: 5b0e8a7c41d2
+Create Date: 2025-12-09 13:27:05.642917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f2c6d1e7a35'
+down_revision = '5b0e8a7c41d2'
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ('sales', 'customers', 'inventory', 'products')
+
+
+def upgrade():
+    op.create_table('data_versions',
+    sa.Column('table_name', sa.String(length=63), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text("timezone('utc', now())")),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+    # One counter row per table, bumped once per modifying statement
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_data_version()
+        RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO data_versions (table_name, version, updated_at)
+            VALUES (TG_TABLE_NAME, 1, timezone('utc', now()))
+            ON CONFLICT (table_name) DO UPDATE SET
+                version = data_versions.version + 1,
+                updated_at = timezone('utc', now());
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    for table in VERSIONED_TABLES:
+        op.execute(
+            f"""
+            INSERT INTO data_versions (table_name, version, updated_at)
+            VALUES ('{table}', 1, timezone('utc', now()));
+
+            CREATE TRIGGER {table}_data_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+            """
+        )
+
+
+def downgrade():
+    for table in VERSIONED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_data_version ON {table};")
+    op.execute("DROP FUNCTION IF EXISTS bump_data_version();")
+    op.drop_table('data_versions')
@@ -0,0 +1,174 @@
+"""partition sales by month
+
+Revision ID: a3b8e5f21c07
+Revises: e7d35b2a9c14
+Create Date: 2025-12-12 10:05:31.274816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3b8e5f21c07'
+down_revision = 'e7d35b2a9c14'
+branch_labels = None
+depends_on = None
+
+# Months of partitions created ahead of today by the migration itself.
+# src.data_scripts.sales_partition_maintenance keeps this window rolling afterwards.
+MONTHS_AHEAD = 12
+
+SALES_TRIGGERS = """
+    CREATE TRIGGER sales_daily_rollup_insert
+    AFTER INSERT ON sales
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_daily_rollup_sync();
+
+    CREATE TRIGGER sales_daily_rollup_update
+    AFTER UPDATE ON sales
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_daily_rollup_sync();
+
+    CREATE TRIGGER sales_daily_rollup_delete
+    AFTER DELETE ON sales
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_daily_rollup_sync();
+
+    CREATE TRIGGER sales_daily_rollup_truncate
+    AFTER TRUNCATE ON sales
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_daily_rollup_sync();
+
+    CREATE TRIGGER sales_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON sales
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+"""
+
+
+def _move_sales_aside():
+    # The old table keeps its triggers when renamed; they are dropped with it
+    op.execute(
+        """
+        LOCK TABLE sales IN ACCESS EXCLUSIVE MODE;
+        ALTER SEQUENCE sales_id_seq OWNED BY NONE;
+        ALTER TABLE sales RENAME TO sales_old;
+        ALTER TABLE sales_old RENAME CONSTRAINT sales_pkey TO sales_old_pkey;
+        ALTER TABLE sales_old RENAME CONSTRAINT sales_product_id_fkey TO sales_old_product_id_fkey;
+        ALTER INDEX IF EXISTS ix_sales_date RENAME TO ix_sales_old_date;
+        ALTER INDEX IF EXISTS ix_sales_product_id_date RENAME TO ix_sales_old_product_id_date;
+        """
+    )
+
+
+def _finish_sales():
+    op.create_index('ix_sales_date', 'sales', ['date'], unique=False)
+    op.create_index('ix_sales_product_id_date', 'sales', ['product_id', 'date'], unique=False)
+    op.execute(SALES_TRIGGERS)
+    op.execute(
+        """
+        ALTER SEQUENCE sales_id_seq OWNED BY sales.id;
+        DROP TABLE sales_old;
+        ANALYZE sales;
+        """
+    )
+
+
+def upgrade():
+    # One-off rewrite of the table: sales is locked for the duration of the copy.
+    # The rollup is already up to date, so the triggers are only re-created after the copy.
+    _move_sales_aside()
+
+    op.create_table('sales',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('sales_id_seq')"), nullable=False),
+    sa.Column('transaction_id', sa.String(length=36), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], name='sales_product_id_fkey'),
+    # The partition key has to be part of every unique constraint of a partitioned table
+    sa.PrimaryKeyConstraint('id', 'date', name='sales_pkey'),
+    postgresql_partition_by='RANGE (date)'
+    )
+
+    # Create the missing monthly partitions sales_yYYYYmMM covering p_from .. p_to.
+    # A partition is created as a plain table and then attached, because ATTACH PARTITION
+    # only takes a SHARE UPDATE EXCLUSIVE lock on sales and so does not block reads or writes.
+    # There is deliberately no DEFAULT partition: it would rule out DETACH PARTITION CONCURRENTLY.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION ensure_sales_partitions(p_from date, p_to date)
+        RETURNS integer AS $$
+        DECLARE
+            month_start date := date_trunc('month', p_from)::date;
+            month_end date;
+            partition_name text;
+            created integer := 0;
+        BEGIN
+            WHILE month_start <= p_to LOOP
+                month_end := (month_start + interval '1 month')::date;
+                partition_name := 'sales_' || to_char(month_start, '"y"YYYY"m"MM');
+
+                IF to_regclass(quote_ident(partition_name)) IS NULL THEN
+                    EXECUTE format(
+                        'CREATE TABLE %I (LIKE sales INCLUDING DEFAULTS, '
+                        'CHECK (date >= %L AND date < %L))',
+                        partition_name, month_start, month_end
+                    );
+                    -- The CHECK constraint lets ATTACH skip validating the rows
+                    EXECUTE format(
+                        'ALTER TABLE sales ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                        partition_name, month_start, month_end
+                    );
+                    created := created + 1;
+                END IF;
+
+                month_start := month_end;
+            END LOOP;
+            RETURN created;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    op.execute(
+        f"""
+        SELECT ensure_sales_partitions(
+            COALESCE((SELECT min(date)::date FROM sales_old), current_date),
+            GREATEST(
+                COALESCE((SELECT max(date)::date FROM sales_old), current_date),
+                (current_date + interval '{MONTHS_AHEAD} months')::date
+            )
+        );
+
+        INSERT INTO sales (id, transaction_id, quantity, amount, product_id, date)
+        SELECT id, transaction_id, quantity, amount, product_id, date FROM sales_old;
+        """
+    )
+
+    _finish_sales()
+
+
+def downgrade():
+    _move_sales_aside()
+
+    op.create_table('sales',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('sales_id_seq')"), nullable=False),
+    sa.Column('transaction_id', sa.String(length=36), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], name='sales_product_id_fkey'),
+    sa.PrimaryKeyConstraint('id', name='sales_pkey')
+    )
+    op.execute(
+        """
+        INSERT INTO sales (id, transaction_id, quantity, amount, product_id, date)
+        SELECT id, transaction_id, quantity, amount, product_id, date FROM sales_old;
+        """
+    )
+
+    # Dropping the partitioned table drops its partitions with it
+    _finish_sales()
+    op.execute("DROP FUNCTION IF EXISTS ensure_sales_partitions(date, date);")
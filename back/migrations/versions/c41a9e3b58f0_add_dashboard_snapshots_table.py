@@ -0,0 +1,33 @@
+"""add dashboard snapshots table
+
+Revision ID: c41a9e3b58f0
+Revises: 9f2c6d1e7a35
+Create Date: 2025-12-10 10:02:51.390274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41a9e3b58f0'
+down_revision = '9f2c6d1e7a35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # UNLOGGED: snapshots are derived data, losing them on a crash only costs a rebuild
+    op.create_table('dashboard_snapshots',
+    sa.Column('key', sa.String(length=100), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('data_version', sa.String(length=255), nullable=False),
+    sa.Column('built_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key'),
+    prefixes=['UNLOGGED']
+    )
+
+
+def downgrade():
+    op.drop_table('dashboard_snapshots')
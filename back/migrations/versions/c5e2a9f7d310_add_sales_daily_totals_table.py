@@ -0,0 +1,127 @@
+"""add sales daily totals table
+
+Revision ID: c5e2a9f7d310
+Revises: 8a1d5e3f6c29
+Create Date: 2025-12-22 10:03:26.715940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e2a9f7d310'
+down_revision = '8a1d5e3f6c29'
+branch_labels = None
+depends_on = None
+
+REFRESH_FUNCTION = """
+    CREATE OR REPLACE FUNCTION refresh_sales_daily_rollup(p_days date[])
+    RETURNS void AS $$
+    DECLARE
+        change_version bigint;
+    BEGIN
+        PERFORM pg_advisory_xact_lock(hashtext('sales_daily_rollup'), hashtext(d.day::text))
+        FROM (SELECT DISTINCT day FROM unnest(p_days) AS u(day) ORDER BY day) AS d;
+
+        DELETE FROM sales_daily_rollup WHERE day = ANY(p_days);
+
+        INSERT INTO sales_daily_rollup (day, product_id, quantity, revenue, transactions)
+        SELECT
+            d.day,
+            s.product_id,
+            SUM(s.quantity),
+            COALESCE(SUM(s.amount), 0),
+            COUNT(DISTINCT s.transaction_id)
+        FROM unnest(p_days) AS d(day)
+        JOIN sales s ON s.date >= d.day AND s.date < d.day + 1
+        GROUP BY d.day, s.product_id
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            quantity = EXCLUDED.quantity,
+            revenue = EXCLUDED.revenue,
+            transactions = EXCLUDED.transactions;
+        {totals}
+        IF cardinality(p_days) = 0 THEN
+            RETURN;
+        END IF;
+
+        -- The upsert locks the counter row until commit, so versions become visible
+        -- in increasing order and a reader's cursor can never skip a change
+        INSERT INTO data_versions (table_name, version, updated_at)
+        VALUES ('sales_rollup', 1, timezone('utc', now()))
+        ON CONFLICT (table_name) DO UPDATE SET
+            version = data_versions.version + 1,
+            updated_at = timezone('utc', now())
+        RETURNING version INTO change_version;
+
+        INSERT INTO sales_rollup_changes (day, version)
+        SELECT DISTINCT d.day, change_version FROM unnest(p_days) AS d(day)
+        ON CONFLICT (day) DO UPDATE SET version = EXCLUDED.version;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+# A basket with several products shows up in the rollup row of each of its products,
+# so the transactions of a day are counted over the day's sales and not summed from there
+REFRESH_TOTALS = """
+        DELETE FROM sales_daily_totals WHERE day = ANY(p_days);
+
+        INSERT INTO sales_daily_totals (day, quantity, revenue, transactions)
+        SELECT
+            d.day,
+            SUM(s.quantity),
+            COALESCE(SUM(s.amount), 0),
+            COUNT(DISTINCT s.transaction_id)
+        FROM (SELECT DISTINCT day FROM unnest(p_days) AS u(day)) AS d
+        JOIN sales s ON s.date >= d.day AND s.date < d.day + 1
+        GROUP BY d.day;
+"""
+
+
+def upgrade():
+    # Totals of all products per day, kept next to the per-product rollup by the same refresh
+    op.create_table('sales_daily_totals',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('quantity', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False, server_default='0'),
+    sa.Column('transactions', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.execute(
+        """
+        INSERT INTO sales_daily_totals (day, quantity, revenue, transactions)
+        SELECT date::date, SUM(quantity), COALESCE(SUM(amount), 0), COUNT(DISTINCT transaction_id)
+        FROM sales
+        GROUP BY date::date;
+        """
+    )
+    op.execute(REFRESH_FUNCTION.format(totals=REFRESH_TOTALS))
+
+    # sales_daily_totals has no foreign key to products, so TRUNCATE products CASCADE
+    # does not reach it and it is emptied here
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION sales_daily_totals_truncate()
+        RETURNS trigger AS $$
+        BEGIN
+            TRUNCATE sales_daily_totals;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER sales_daily_totals_truncate
+        AFTER TRUNCATE ON sales
+        FOR EACH STATEMENT EXECUTE FUNCTION sales_daily_totals_truncate();
+        """
+    )
+
+
+def downgrade():
+    op.execute(
+        """
+        DROP TRIGGER IF EXISTS sales_daily_totals_truncate ON sales;
+        DROP FUNCTION IF EXISTS sales_daily_totals_truncate();
+        """
+    )
+    op.execute(REFRESH_FUNCTION.format(totals=""))
+    op.drop_table('sales_daily_totals')
@@ -0,0 +1,83 @@
+"""add sales history version
+
+Revision ID: d8e1f4a6b203
+Revises: a3b8e5f21c07
+Create Date: 2025-12-15 09:41:12.508336
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e1f4a6b203'
+down_revision = 'a3b8e5f21c07'
+branch_labels = None
+depends_on = None
+
+SYNC_FUNCTION = """
+    CREATE OR REPLACE FUNCTION sales_daily_rollup_sync()
+    RETURNS trigger AS $$
+    DECLARE
+        touched date[];
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            IF EXISTS (SELECT 1 FROM sales_daily_rollup) THEN
+                TRUNCATE sales_daily_rollup;
+            END IF;
+            {truncate_history}
+            RETURN NULL;
+        END IF;
+
+        IF TG_OP = 'INSERT' THEN
+            touched := ARRAY(SELECT DISTINCT date::date FROM new_rows);
+        ELSIF TG_OP = 'UPDATE' THEN
+            touched := ARRAY(
+                SELECT date::date FROM old_rows
+                UNION
+                SELECT date::date FROM new_rows
+            );
+        ELSIF TG_OP = 'DELETE' THEN
+            touched := ARRAY(SELECT DISTINCT date::date FROM old_rows);
+        END IF;
+
+        PERFORM refresh_sales_daily_rollup(touched);
+        {touched_history}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+BUMP_HISTORY = """
+            INSERT INTO data_versions (table_name, version, updated_at)
+            VALUES ('sales_history', 1, timezone('utc', now()))
+            ON CONFLICT (table_name) DO UPDATE SET
+                version = data_versions.version + 1,
+                updated_at = timezone('utc', now());
+"""
+
+
+def upgrade():
+    # sales_history is a pseudo table in data_versions: its counter only moves when sales
+    # of a day before today change, so snapshots of closed periods survive today's writes
+    op.execute(
+        """
+        INSERT INTO data_versions (table_name, version, updated_at)
+        VALUES ('sales_history', 1, timezone('utc', now()))
+        ON CONFLICT (table_name) DO NOTHING;
+        """
+    )
+    op.execute(
+        SYNC_FUNCTION.format(
+            truncate_history=BUMP_HISTORY,
+            touched_history=(
+                "IF EXISTS (SELECT 1 FROM unnest(touched) AS d(day) WHERE d.day < current_date)"
+                " THEN" + BUMP_HISTORY + "        END IF;"
+            ),
+        )
+    )
+
+
+def downgrade():
+    op.execute(SYNC_FUNCTION.format(truncate_history="", touched_history=""))
+    op.execute("DELETE FROM data_versions WHERE table_name = 'sales_history';")
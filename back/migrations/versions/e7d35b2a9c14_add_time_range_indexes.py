@@ -0,0 +1,50 @@
+"""add time range indexes
+
+Revision ID: e7d35b2a9c14
+Revises: c41a9e3b58f0
+Create Date: 2025-12-11 14:40:18.905117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7d35b2a9c14'
+down_revision = 'c41a9e3b58f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    # It does not block writes to the tables while the indexes are built.
+    with op.get_context().autocommit_block():
+        # Date range filters on raw sales rows (SalesTool, rollup refresh)
+        op.create_index('ix_sales_date', 'sales', ['date'], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+        # Per-product date range queries
+        op.create_index('ix_sales_product_id_date', 'sales', ['product_id', 'date'], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_customers_date', 'customers', ['date'], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+        # history is an append-only event log, so its physical order follows time
+        # and a BRIN index covers range scans at a fraction of the size of a B-tree
+        op.create_index('ix_history_time_brin', 'history', ['time'], unique=False,
+                        postgresql_using='brin', postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_history_product_id_time', 'history', ['product_id', 'time'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_history_product_id_time', table_name='history',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_history_time_brin', table_name='history',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_customers_date', table_name='customers',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_sales_product_id_date', table_name='sales',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_sales_date', table_name='sales',
+                      postgresql_concurrently=True, if_exists=True)
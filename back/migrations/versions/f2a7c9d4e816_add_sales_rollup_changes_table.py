@@ -0,0 +1,159 @@
+"""add sales rollup changes table
+
+Revision ID: f2a7c9d4e816
+Revises: d8e1f4a6b203
+Create Date: 2025-12-16 11:18:54.226041
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a7c9d4e816'
+down_revision = 'd8e1f4a6b203'
+branch_labels = None
+depends_on = None
+
+REFRESH_FUNCTION = """
+    CREATE OR REPLACE FUNCTION refresh_sales_daily_rollup(p_days date[])
+    RETURNS void AS $$
+    {declare}BEGIN
+        PERFORM pg_advisory_xact_lock(hashtext('sales_daily_rollup'), hashtext(d.day::text))
+        FROM (SELECT DISTINCT day FROM unnest(p_days) AS u(day) ORDER BY day) AS d;
+
+        DELETE FROM sales_daily_rollup WHERE day = ANY(p_days);
+
+        INSERT INTO sales_daily_rollup (day, product_id, quantity, revenue, transactions)
+        SELECT
+            d.day,
+            s.product_id,
+            SUM(s.quantity),
+            COALESCE(SUM(s.amount), 0),
+            COUNT(DISTINCT s.transaction_id)
+        FROM unnest(p_days) AS d(day)
+        JOIN sales s ON s.date >= d.day AND s.date < d.day + 1
+        GROUP BY d.day, s.product_id
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            quantity = EXCLUDED.quantity,
+            revenue = EXCLUDED.revenue,
+            transactions = EXCLUDED.transactions;
+        {log_changes}
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+LOG_CHANGES = """
+        IF cardinality(p_days) = 0 THEN
+            RETURN;
+        END IF;
+
+        -- The upsert locks the counter row until commit, so versions become visible
+        -- in increasing order and a reader's cursor can never skip a change
+        INSERT INTO data_versions (table_name, version, updated_at)
+        VALUES ('sales_rollup', 1, timezone('utc', now()))
+        ON CONFLICT (table_name) DO UPDATE SET
+            version = data_versions.version + 1,
+            updated_at = timezone('utc', now())
+        RETURNING version INTO change_version;
+
+        INSERT INTO sales_rollup_changes (day, version)
+        SELECT DISTINCT d.day, change_version FROM unnest(p_days) AS d(day)
+        ON CONFLICT (day) DO UPDATE SET version = EXCLUDED.version;
+"""
+
+SYNC_FUNCTION = """
+    CREATE OR REPLACE FUNCTION sales_daily_rollup_sync()
+    RETURNS trigger AS $$
+    DECLARE
+        touched date[];
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            IF EXISTS (SELECT 1 FROM sales_daily_rollup) THEN
+                TRUNCATE sales_daily_rollup;
+            END IF;
+            {truncate_changes}
+            INSERT INTO data_versions (table_name, version, updated_at)
+            VALUES ('sales_history', 1, timezone('utc', now()))
+            ON CONFLICT (table_name) DO UPDATE SET
+                version = data_versions.version + 1,
+                updated_at = timezone('utc', now());
+            RETURN NULL;
+        END IF;
+
+        IF TG_OP = 'INSERT' THEN
+            touched := ARRAY(SELECT DISTINCT date::date FROM new_rows);
+        ELSIF TG_OP = 'UPDATE' THEN
+            touched := ARRAY(
+                SELECT date::date FROM old_rows
+                UNION
+                SELECT date::date FROM new_rows
+            );
+        ELSIF TG_OP = 'DELETE' THEN
+            touched := ARRAY(SELECT DISTINCT date::date FROM old_rows);
+        END IF;
+
+        PERFORM refresh_sales_daily_rollup(touched);
+        IF EXISTS (SELECT 1 FROM unnest(touched) AS d(day) WHERE d.day < current_date) THEN
+            INSERT INTO data_versions (table_name, version, updated_at)
+            VALUES ('sales_history', 1, timezone('utc', now()))
+            ON CONFLICT (table_name) DO UPDATE SET
+                version = data_versions.version + 1,
+                updated_at = timezone('utc', now());
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+# After a TRUNCATE every earlier cursor is meaningless. The log is emptied and a
+# row for day -infinity tells clients with an older cursor to resync from scratch.
+TRUNCATE_CHANGES = """
+            DELETE FROM sales_rollup_changes;
+            INSERT INTO data_versions (table_name, version, updated_at)
+            VALUES ('sales_rollup', 1, timezone('utc', now()))
+            ON CONFLICT (table_name) DO UPDATE SET
+                version = data_versions.version + 1,
+                updated_at = timezone('utc', now());
+            INSERT INTO sales_rollup_changes (day, version)
+            SELECT '-infinity'::date, version FROM data_versions
+            WHERE table_name = 'sales_rollup';
+"""
+
+
+def upgrade():
+    # Change log of the daily rollup: the version at which each day last changed.
+    # One row per day, so it grows with the calendar and not with the number of writes.
+    op.create_table('sales_rollup_changes',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_index('ix_sales_rollup_changes_version', 'sales_rollup_changes', ['version'],
+                    unique=False)
+
+    # Every existing day counts as changed at version 1
+    op.execute(
+        """
+        INSERT INTO data_versions (table_name, version, updated_at)
+        VALUES ('sales_rollup', 1, timezone('utc', now()))
+        ON CONFLICT (table_name) DO NOTHING;
+
+        INSERT INTO sales_rollup_changes (day, version)
+        SELECT DISTINCT day, 1 FROM sales_daily_rollup;
+        """
+    )
+
+    op.execute(
+        REFRESH_FUNCTION.format(declare="DECLARE\n        change_version bigint;\n    ",
+                                log_changes=LOG_CHANGES)
+    )
+    op.execute(SYNC_FUNCTION.format(truncate_changes=TRUNCATE_CHANGES))
+
+
+def downgrade():
+    op.execute(SYNC_FUNCTION.format(truncate_changes=""))
+    op.execute(REFRESH_FUNCTION.format(declare="", log_changes=""))
+    op.execute("DELETE FROM data_versions WHERE table_name = 'sales_rollup';")
+    op.drop_index('ix_sales_rollup_changes_version', table_name='sales_rollup_changes')
+    op.drop_table('sales_rollup_changes')
@@ -0,0 +1,84 @@
+import sys
+import time
+from datetime import datetime
+from statistics import median
+
+from sqlalchemy import event
+
+from ..database.sales import (
+    query_sales,
+    query_timeperiod_sales,
+    query_timeperiod_transactions,
+    query_transactions,
+)
+from ..extensions import db
+from ..index import app
+from ..utils.dashboard import create_sales_data, get_quarter_dates
+from ..utils.logger import logger
+
+
+def legacy_fan_out():
+    """
+    Issue the same queries the dashboard used to run per request:
+    two daily series and three graph queries for each of the three datasets.
+    """
+    today = datetime.today()
+    todays_date = today.strftime("%Y-%m-%d")
+    last_year = str(today.year - 1) + "-01-01"
+    quarters = get_quarter_dates()
+
+    query_sales(last_year, todays_date)
+    query_transactions(last_year, todays_date)
+
+    for datatype in ("revenue", "quantity", "transactions"):
+        query = (
+            query_timeperiod_transactions if datatype == "transactions" else query_timeperiod_sales
+        )
+        query(quarters["current"][0], quarters["current"][1], "week")
+        query(quarters["previous"][0], quarters["previous"][1], "week")
+        query(str(today.year) + "-01-01", todays_date, "month")
+
+
+def measure(label: str, func, runs: int) -> dict:
+    """Run func `runs` times and return the query count per run and latency stats."""
+    statements = []
+
+    def count_statement(*_args):
+        statements.append(1)
+
+    event.listen(db.engine, "before_cursor_execute", count_statement)
+    timings = []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count_statement)
+
+    result = {
+        "label": label,
+        "queries_per_run": len(statements) // runs,
+        "median_ms": round(median(timings), 2),
+        "max_ms": round(max(timings), 2),
+    }
+    logger.info(
+        f"{label}: {result['queries_per_run']} queries, "
+        f"median {result['median_ms']} ms, max {result['max_ms']} ms"
+    )
+    return result
+
+
+def main(runs: int = 20):
+    with app.app_context():
+        # Warm up the connection pool so the first run is not measured as a connect
+        create_sales_data()
+
+        before = measure("legacy fan-out", legacy_fan_out, runs)
+        after = measure("single-scan builder", create_sales_data, runs)
+
+    return {"before": before, "after": after}
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,57 @@
+import argparse
+from pathlib import Path
+
+from ..database.product_dimension import get_product_dimension
+from ..database.sales_ingest import (
+    INGEST_FORMATS,
+    batch_checksum,
+    ingest_sales_batch,
+    parse_sales_batch,
+    validate_sales_batch,
+)
+from ..index import app
+from ..utils.logger import logger
+
+
+def ingest_file(path: Path, batch_format: str | None = None, idempotency_key: str | None = None):
+    """
+    Validate a CSV or NDJSON file of sales and load it in one transaction.
+    The idempotency key defaults to the checksum of the file, so loading the same file twice
+    inserts it only once.
+    Returns:
+        dict: result of ingest_sales_batch, or {"errors": [...]} if rows were invalid
+    """
+    content = path.read_bytes()
+    batch_format = batch_format or ("ndjson" if path.suffix in (".ndjson", ".jsonl") else "csv")
+    checksum = batch_checksum(content)
+
+    with app.app_context():
+        frame = parse_sales_batch(content, batch_format)
+        prices = {pid: product["price"] for pid, product in get_product_dimension().items()}
+        rows, errors = validate_sales_batch(frame, prices)
+        if errors:
+            return {"errors": errors}
+        return ingest_sales_batch(rows, idempotency_key or checksum, checksum)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load a batch of sales into the database")
+    parser.add_argument("path", type=Path, help="CSV or NDJSON file of sales")
+    parser.add_argument("--format", choices=INGEST_FORMATS, help="default: from the file suffix")
+    parser.add_argument("--key", help="idempotency key, default: checksum of the file")
+    args = parser.parse_args(argv)
+
+    result = ingest_file(args.path, args.format, args.key)
+    if "errors" in result:
+        for error in result["errors"]:
+            logger.error(f"Row {error['row']}: {', '.join(error['errors'])}")
+        raise SystemExit(1)
+    if result["duplicate"]:
+        logger.info(f"Batch {result['idempotency_key']} was already ingested, nothing to do")
+    else:
+        logger.info(f"Ingested {result['rows']} sales as batch {result['idempotency_key']}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+from ..database.inventory_history import take_inventory_snapshot
+from ..index import app
+from ..utils.logger import logger
+
+
+def main():
+    """
+    Snapshot the inventory of every product. Point-in-time inventory lookups replay the
+    history from the nearest snapshot, so this is meant to run daily, e.g. from cron.
+    """
+    with app.app_context():
+        count = take_inventory_snapshot()
+    logger.info(f"Stored an inventory snapshot of {count} products")
+    return count
+
+
+if __name__ == "__main__":
+    main()
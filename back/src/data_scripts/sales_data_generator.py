@@ -132,6 +132,11 @@ def generate_sales_data(num_days: int, output_path: Path):
             except Exception:
                 conn.execute(sales_table.delete())
 
+            # sales is partitioned by month, every generated day needs its partition
+            conn.execute(
+                text("SELECT ensure_sales_partitions(:start, :end);"),
+                {"start": start_dt, "end": end_dt},
+            )
             conn.execute(sales_table.insert(), sales_records)
     finally:
         engine.dispose()
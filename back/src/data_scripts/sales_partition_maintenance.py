@@ -0,0 +1,37 @@
+from datetime import date
+
+from .. import config
+from ..database.sales_partitions import (
+    add_months,
+    archive_sales_partitions,
+    ensure_sales_partitions,
+)
+from ..index import app
+from ..utils.logger import logger
+
+
+def main(today: date | None = None):
+    """
+    Keep the monthly sales partitions ready for the coming months and,
+    if configured, archive the old ones. Meant to run on every deploy and from a monthly cron.
+    """
+    today = today or date.today()
+    months_ahead = config.get("partitions.months_ahead", 12)
+    archive_after = config.get("partitions.archive_after_months", 0)
+    archive_schema = config.get("partitions.archive_schema", "archive")
+
+    with app.app_context():
+        created = ensure_sales_partitions(today, add_months(today, months_ahead))
+        logger.info(f"Created {created} sales partitions up to {months_ahead} months ahead")
+
+        archived = []
+        if archive_after:
+            cutoff = add_months(today, -archive_after)
+            archived = archive_sales_partitions(cutoff, archive_schema)
+            logger.info(f"Archived {len(archived)} sales partitions ending before {cutoff}")
+
+    return {"created": created, "archived": archived}
+
+
+if __name__ == "__main__":
+    main()
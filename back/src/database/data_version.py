@@ -0,0 +1,50 @@
+from sqlalchemy import bindparam, text
+
+from ..extensions import db
+
+
+def _versions(rows) -> dict:
+    return {
+        row["table_name"]: {"version": int(row["version"]), "updated_at": row["updated_at"]}
+        for row in rows
+    }
+
+
+def fetch_data_versions(tables, connection=None):
+    """
+    Return the current version counter and last write time of the given tables.
+    The counters are bumped by triggers, so this is a single primary key lookup per table.
+    Args:
+        tables (list[str]): table names, e.g. ["sales", "customers"]
+        connection: SQLAlchemy connection to read with instead of the Flask session,
+            for code running outside the app context
+    Returns:
+        dict: {table_name: {"version": int, "updated_at": datetime}}
+    """
+    sql = text(
+        """
+        SELECT table_name, version, updated_at
+        FROM data_versions
+        WHERE table_name IN :tables;
+        """
+    ).bindparams(bindparam("tables", expanding=True))
+    if connection is not None:
+        return _versions(connection.execute(sql, {"tables": list(tables)}).mappings().all())
+
+    try:
+        return _versions(db.session.execute(sql, {"tables": list(tables)}).mappings().all())
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def data_version_key(tables, connection=None) -> str:
+    """
+    Return a cache key describing the current state of the given tables,
+    e.g. "customers:4,sales:17". The key changes whenever any of the tables is written to.
+    """
+    versions = fetch_data_versions(tables, connection)
+    return ",".join(
+        f"{table}:{versions.get(table, {}).get('version', 0)}" for table in sorted(tables)
+    )
@@ -0,0 +1,177 @@
+from datetime import date, datetime, time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from ..extensions import db
+
+# Inventory of products at :at, starting from the snapshot nearest to :at. The current
+# inventory is a snapshot as well, taken now and including every event recorded so far.
+LEVELS_AT_SQL = """
+    WITH current AS (
+        SELECT product_id, SUM(amount) AS amount
+        FROM inventory
+        {product_filter}
+        GROUP BY product_id
+    )
+    SELECT
+        c.product_id,
+        CASE
+            WHEN s.taken_at IS NULL THEN c.amount - COALESCE((
+                SELECT SUM(h.amount) FROM history h
+                WHERE h.product_id = c.product_id AND h.time > :at
+            ), 0)
+            WHEN s.taken_at <= :at THEN s.amount + COALESCE((
+                SELECT SUM(h.amount) FROM history h
+                WHERE h.product_id = c.product_id AND h.time > s.taken_at AND h.time <= :at
+            ), 0)
+            ELSE s.amount - COALESCE((
+                SELECT SUM(h.amount) FROM history h
+                WHERE h.product_id = c.product_id AND h.time > :at AND h.time <= s.taken_at
+            ), 0)
+        END AS amount
+    FROM current c
+    CROSS JOIN LATERAL (
+        SELECT n.taken_at, n.amount
+        FROM (
+            (
+                SELECT taken_at, amount FROM inventory_snapshots
+                WHERE product_id = c.product_id AND taken_at <= :at
+                ORDER BY taken_at DESC LIMIT 1
+            )
+            UNION ALL
+            (
+                SELECT taken_at, amount FROM inventory_snapshots
+                WHERE product_id = c.product_id AND taken_at > :at
+                ORDER BY taken_at LIMIT 1
+            )
+            UNION ALL
+            SELECT NULL, NULL
+        ) n
+        ORDER BY abs(extract(epoch FROM COALESCE(n.taken_at, LOCALTIMESTAMP) - :at))
+        LIMIT 1
+    ) s
+    ORDER BY c.product_id;
+"""
+
+
+def take_inventory_snapshot() -> int:
+    """
+    Store the current inventory of every product as a snapshot and commit.
+    Meant to run periodically, e.g. daily from cron; lookups replay at most the events
+    between two snapshots. Events dated after now are left out of the snapshot.
+    Returns:
+        int: number of products in the snapshot
+    """
+    # Waits for sale batches holding inventory locks, so their events are in the snapshot,
+    # and takes the rows in the same order as record_sales
+    lock = text("SELECT id FROM inventory ORDER BY id FOR SHARE;")
+    snapshot = text(
+        """
+        INSERT INTO inventory_snapshots (product_id, taken_at, amount)
+        SELECT i.product_id, LOCALTIMESTAMP, SUM(i.amount) - COALESCE((
+            SELECT SUM(h.amount) FROM history h
+            WHERE h.product_id = i.product_id AND h.time > LOCALTIMESTAMP
+        ), 0)
+        FROM inventory i
+        GROUP BY i.product_id
+        ON CONFLICT (product_id, taken_at) DO NOTHING;
+        """
+    )
+    try:
+        db.session.execute(lock)
+        count = db.session.execute(snapshot).rowcount
+        db.session.commit()
+        return count
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def inventory_levels_at(at: datetime, product_ids=None) -> dict:
+    """
+    Inventory of products at a point in time, replayed from the nearest snapshot.
+    Args:
+        at (datetime): the point in time, events at exactly this time are included
+        product_ids (list[int] | None): products to look up, all by default
+    Returns:
+        dict: {product_id: amount} of the products with an inventory row
+    """
+    product_filter = "" if product_ids is None else "WHERE product_id = ANY(:product_ids)"
+    sql = text(LEVELS_AT_SQL.format(product_filter=product_filter))
+    params = {"at": at}
+    if product_ids is not None:
+        params["product_ids"] = [int(pid) for pid in product_ids]
+    try:
+        rows = db.session.execute(sql, params).all()
+        return {int(row.product_id): int(row.amount) for row in rows}
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def inventory_at(product_id: int, at: datetime) -> int | None:
+    """
+    Inventory of one product at a point in time, or None if the product has no inventory.
+    Uses the snapshot and history indexes of the product only.
+    """
+    return inventory_levels_at(at, [product_id]).get(int(product_id))
+
+
+def _end_of_day(day: date) -> datetime:
+    return datetime.combine(day, time.max)
+
+
+def inventory_levels(start: date, end: date) -> pd.DataFrame:
+    """
+    End-of-day inventory of every product for each day of start..end.
+    Reads the levels at the end of the range and the daily net change of every product once,
+    and walks back from the end with a reverse cumulative sum.
+    Returns:
+        pd.DataFrame: one row per day (DatetimeIndex) and one column per product id
+    """
+    if end < start:
+        raise ValueError("end is before start")
+
+    final = inventory_levels_at(_end_of_day(end))
+    days = pd.date_range(start, end, freq="D")
+    product_ids = np.array(sorted(final), dtype=np.int64)
+
+    sql = text(
+        """
+        SELECT CAST(date_trunc('day', time) AS date) AS day, product_id, SUM(amount) AS amount
+        FROM history
+        WHERE time > :start AND time <= :end
+        GROUP BY 1, 2;
+        """
+    )
+    try:
+        rows = db.session.execute(sql, {"start": _end_of_day(start), "end": _end_of_day(end)}).all()
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+    changes = np.zeros((len(days), len(product_ids)), dtype=np.int64)
+    if rows and len(product_ids):
+        day_index = (
+            np.array([row.day for row in rows], dtype="datetime64[D]") - np.datetime64(start, "D")
+        ).astype(int)
+        row_products = np.array([row.product_id for row in rows], dtype=np.int64)
+        columns = np.minimum(np.searchsorted(product_ids, row_products), len(product_ids) - 1)
+        # Products without an inventory row have no level to walk back from
+        known = product_ids[columns] == row_products
+        np.add.at(
+            changes,
+            (day_index[known], columns[known]),
+            np.array([row.amount for row in rows], dtype=np.int64)[known],
+        )
+
+    # The level of a day is the final level minus the changes of the days after it
+    after = np.cumsum(changes[::-1], axis=0)[::-1]
+    after = np.vstack([after[1:], np.zeros((1, len(product_ids)), dtype=np.int64)])
+    levels = np.array([final[pid] for pid in product_ids], dtype=np.int64) - after
+    return pd.DataFrame(levels, index=days, columns=product_ids)
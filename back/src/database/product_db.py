@@ -1,23 +1,14 @@
-from sqlalchemy import text
-
-from ..extensions import db
 from ..index import app
+from .product_dimension import get_product_dimension
 
 
 def fetch_product_data():
     """
-    Execute the sales summary query between start and end datetimes.
+    Return the price of every product keyed by product id (as a string),
+    from the cached product dimension.
     """
-    sql_query = text("""SELECT id, price FROM products;""")
-
     with app.app_context():
-        try:
-            rows = db.session.execute(sql_query).mappings().all()
-
-            product_price_map = {str(row["id"]): float(row["price"]) for row in rows}
-
-            return product_price_map
-
-        except Exception:
-            db.session.rollback()
-            raise
+        return {
+            str(product_id): product["price"]
+            for product_id, product in get_product_dimension().items()
+        }
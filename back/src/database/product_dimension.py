@@ -0,0 +1,82 @@
+import threading
+import time
+
+from sqlalchemy import text
+
+from .. import config
+from ..extensions import db
+from .data_version import data_version_key
+
+# How long a loaded dimension is used before its data version is checked again
+VERSION_CHECK_SECONDS = config.get("products.version_check_seconds", 5)
+# Only products: inventory is written on every recorded sale, and its rows are looked up
+# where they are needed (see sales_recording)
+DIMENSION_TABLES = ["products"]
+
+_dimension = {"version": None, "checked_at": 0.0, "products": {}}
+_dimension_lock = threading.Lock()
+
+
+def query_product_dimension():
+    """
+    Query every product with its name and price.
+    Returns:
+        dict: {product_id: {"name": str, "price": float}}
+    """
+    sql = text("SELECT id, name, price FROM products ORDER BY id;")
+    try:
+        rows = db.session.execute(sql).mappings().all()
+        return {int(row["id"]): {"name": row["name"], "price": float(row["price"])} for row in rows}
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def get_product_dimension(max_age: float = VERSION_CHECK_SECONDS) -> dict:
+    """
+    Return the products of query_product_dimension from a per-process cache.
+    The cache is reloaded when the data version of products changes; the version
+    is looked up at most every max_age seconds, so most calls do not touch the database.
+    """
+    now = time.monotonic()
+    with _dimension_lock:
+        if _dimension["version"] is not None and now - _dimension["checked_at"] < max_age:
+            return _dimension["products"]
+
+    # The version is read first, so a write racing with the reload only causes another reload
+    version = data_version_key(DIMENSION_TABLES)
+    with _dimension_lock:
+        if version == _dimension["version"]:
+            _dimension["checked_at"] = now
+            return _dimension["products"]
+
+    products = query_product_dimension()
+    with _dimension_lock:
+        _dimension.update(version=version, checked_at=now, products=products)
+    return products
+
+
+def clear_product_dimension():
+    with _dimension_lock:
+        _dimension.update(version=None, checked_at=0.0, products={})
+
+
+def product_name(product_id) -> str | None:
+    """Return the name of a product id, or None if there is no such product."""
+    product = get_product_dimension().get(int(product_id))
+    return product["name"] if product else None
+
+
+def resolve_product_id(product) -> int | None:
+    """Return the id of a product given by id or by name (case-insensitive), or None."""
+    products = get_product_dimension()
+    if str(product).strip().isdigit():
+        product_id = int(product)
+        return product_id if product_id in products else None
+
+    name = str(product).strip().casefold()
+    for product_id, info in products.items():
+        if info["name"].casefold() == name:
+            return product_id
+    return None
@@ -6,15 +6,17 @@ from ..extensions import db
 def fetch_sales_data(start, end):
     """
     Execute the sales summary query between start and end datetimes.
+    Reads from the sales_daily_totals table, so the cost grows with the number of days
+    in the range instead of the number of sales rows.
     """
     sql_query = text(
         """
         SELECT
-            COALESCE(SUM(amount), 0) AS revenue,
+            COALESCE(SUM(revenue), 0) AS revenue,
             COALESCE(SUM(quantity), 0) AS sales,
-            COUNT(DISTINCT transaction_id) AS transactions
-        FROM sales
-        WHERE date BETWEEN :start_date AND :end_date;
+            COALESCE(SUM(transactions), 0) AS transactions
+        FROM sales_daily_totals
+        WHERE day BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date);
     """
     )
     try:
@@ -34,6 +36,59 @@ def fetch_sales_data(start, end):
         raise
 
 
+def fetch_sales_data_ranges(ranges):
+    """
+    Execute the sales summary query for several named date ranges in a single statement.
+    Every daily totals row is read once and counted into each range it falls in with FILTER
+    aggregates, so overlapping ranges (e.g. a quarter and YTD) do not scan the same days twice.
+    Args:
+        ranges (dict): {name: (start, end)}, start and end as dates or date strings, inclusive
+    Returns:
+        dict: {name: {"revenue": float, "sales": int, "transactions": int}}
+    """
+    if not ranges:
+        return {}
+
+    names = list(ranges)
+    params = {}
+    aggregates = []
+    conditions = []
+    for i, name in enumerate(names):
+        params[f"start_{i}"], params[f"end_{i}"] = ranges[name]
+        condition = f"day BETWEEN CAST(:start_{i} AS date) AND CAST(:end_{i} AS date)"
+        conditions.append(f"({condition})")
+        aggregates.append(
+            f"""
+            COALESCE(SUM(revenue) FILTER (WHERE {condition}), 0) AS revenue_{i},
+            COALESCE(SUM(quantity) FILTER (WHERE {condition}), 0) AS sales_{i},
+            COALESCE(SUM(transactions) FILTER (WHERE {condition}), 0) AS transactions_{i}"""
+        )
+
+    # Names only ever reach the SQL as positional aliases, the dates as bound parameters
+    sql_query = text(
+        f"""
+        SELECT {",".join(aggregates)}
+        FROM sales_daily_totals
+        WHERE {" OR ".join(conditions)};
+        """
+    )
+    try:
+        result = db.session.execute(sql_query, params).mappings().first()
+
+        return {
+            name: {
+                "revenue": float(result[f"revenue_{i}"] or 0),
+                "sales": int(result[f"sales_{i}"] or 0),
+                "transactions": int(result[f"transactions_{i}"] or 0),
+            }
+            for i, name in enumerate(names)
+        }
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
 def query_sales(start, end):
     """
     Query sales data for date, quantity and revenue per day.
@@ -46,17 +101,15 @@ def query_sales(start, end):
     sql = text(
         """
         SELECT 
-                date,
-                SUM(quantity) as quantity,
-                SUM(amount)  as revenue 
+                CAST(day AS timestamp) as date,
+                quantity,
+                revenue 
         FROM 
-                sales
+                sales_daily_totals
         WHERE 
-                date BETWEEN :start_date AND :end_date
-        GROUP BY 
-                date
+                day BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
         ORDER BY
-                date; 
+                day; 
         """
     )
     try:
@@ -72,6 +125,8 @@ def query_sales(start, end):
 def query_timeperiod_sales(start, end, time_interval):
     """
     Query sales data for quantity and revenue per selected time interval. Returns a query object.
+    The same week or month number of different years ends up in one bucket and empty buckets
+    are left out; new code should use query_time_buckets instead.
     Args:
         start (str): start date as string
         end (str): end date as string
@@ -80,13 +135,13 @@ def query_timeperiod_sales(start, end, time_interval):
     sql = text(
         """
         SELECT 
-            date_part(:time_interval, date) as timeperiod,
-            SUM(quantity) as quantity,
-            SUM(amount)  as revenue 
+            date_part(:time_interval, day) as timeperiod,
+            CAST(SUM(quantity) AS bigint) as quantity,
+            SUM(revenue)  as revenue 
         FROM 
-            sales
+            sales_daily_totals
         WHERE 
-            date BETWEEN :start_date AND :end_date
+            day BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
         GROUP BY 
             timeperiod
         ORDER BY
@@ -115,16 +170,14 @@ def query_transactions(start, end):
     sql = text(
         """
         SELECT 
-            date, 
-            COUNT(transaction_id) as transactions
+            CAST(day AS timestamp) as date, 
+            transactions
         FROM 
-            sales 
+            sales_daily_totals 
         WHERE 
-            date BETWEEN :start_date AND :end_date 
-        GROUP BY 
-            date 
+            day BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date) 
         ORDER BY 
-            date;
+            day;
         """
     )
     try:
@@ -139,6 +192,7 @@ def query_transactions(start, end):
 def query_timeperiod_transactions(start, end, time_interval):
     """
     Query transactions over selected time interval, e.g. daily, weekly or monthly.
+    Has the same bucketing caveats as query_timeperiod_sales; prefer query_time_buckets.
     Args:
         start (str): start date of query
         end (str): end date of query
@@ -148,12 +202,12 @@ def query_timeperiod_transactions(start, end, time_interval):
     sql = text(
         """
         SELECT 
-                date_part(:time_interval, date) as timeperiod, 
-                COUNT(transaction_id) as transactions
+                date_part(:time_interval, day) as timeperiod, 
+                CAST(SUM(transactions) AS bigint) as transactions
         FROM 
-                sales 
+                sales_daily_totals 
         WHERE 
-                date BETWEEN :start_date AND :end_date 
+                day BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date) 
         GROUP BY 
                 timeperiod 
         ORDER BY 
@@ -169,3 +223,426 @@ def query_timeperiod_transactions(start, end, time_interval):
     except Exception:
         db.session.rollback()
         raise
+
+
+TIME_BUCKET_STEPS = {
+    "hour": "1 hour",
+    "day": "1 day",
+    "week": "1 week",
+    "month": "1 month",
+    "quarter": "3 months",
+    "year": "1 year",
+}
+
+# Sales per bucket; the daily totals serve every granularity of a day or more
+_ROLLUP_BUCKETS = """
+        SELECT
+            date_trunc(:granularity, CAST(day AS timestamp)) AS bucket,
+            SUM(quantity) AS quantity,
+            SUM(revenue) AS revenue,
+            SUM(transactions) AS transactions
+        FROM sales_daily_totals
+        WHERE day BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
+        GROUP BY 1
+"""
+
+_RAW_SALES_BUCKETS = """
+        SELECT
+            date_trunc(:granularity, date) AS bucket,
+            SUM(quantity) AS quantity,
+            COALESCE(SUM(amount), 0) AS revenue,
+            COUNT(DISTINCT transaction_id) AS transactions
+        FROM sales
+        WHERE date >= CAST(:start_date AS date) AND date < CAST(:end_date AS date) + 1
+        GROUP BY 1
+"""
+
+
+def query_time_buckets(start, end, granularity):
+    """
+    Query quantity, revenue, transactions and customers per calendar bucket in one statement.
+    Buckets come from date_trunc, so e.g. week 5 of different years stay apart, and
+    generate_series fills buckets without sales with zeros. The first and last bucket
+    only count the days inside start .. end.
+    Args:
+        start (str): start date as string
+        end (str): end date as string, inclusive
+        granularity (str): one of TIME_BUCKET_STEPS, e.g. 'week' or 'quarter'
+    Returns:
+        list of rows with bucket (timestamp of the bucket start), quantity, revenue,
+        transactions and customers
+    """
+    if granularity not in TIME_BUCKET_STEPS:
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    # Hourly buckets need the raw rows, every coarser bucket is a sum of whole days
+    sales_buckets = _RAW_SALES_BUCKETS if granularity == "hour" else _ROLLUP_BUCKETS
+    sql = text(
+        f"""
+        WITH buckets AS (
+            SELECT generate_series(
+                date_trunc(:granularity, CAST(CAST(:start_date AS date) AS timestamp)),
+                CAST(CAST(:end_date AS date) + 1 AS timestamp) - interval '1 microsecond',
+                CAST(:step AS interval)
+            ) AS bucket
+        ),
+        sales_buckets AS ({sales_buckets}),
+        customer_buckets AS (
+            SELECT
+                date_trunc(:granularity, date) AS bucket,
+                SUM(daily_customer_amount) AS customers
+            FROM customers
+            WHERE date >= CAST(:start_date AS date) AND date < CAST(:end_date AS date) + 1
+            GROUP BY 1
+        )
+        SELECT
+            b.bucket,
+            CAST(COALESCE(s.quantity, 0) AS bigint) AS quantity,
+            COALESCE(s.revenue, 0) AS revenue,
+            CAST(COALESCE(s.transactions, 0) AS bigint) AS transactions,
+            CAST(COALESCE(c.customers, 0) AS bigint) AS customers
+        FROM buckets b
+        LEFT JOIN sales_buckets s ON s.bucket = b.bucket
+        LEFT JOIN customer_buckets c ON c.bucket = b.bucket
+        ORDER BY b.bucket;
+        """
+    )
+    try:
+        result = db.session.execute(
+            sql,
+            {
+                "start_date": start,
+                "end_date": end,
+                "granularity": granularity,
+                "step": TIME_BUCKET_STEPS[granularity],
+            },
+        ).fetchall()
+        return result
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def query_daily_series(start, end):
+    """
+    Query revenue, quantity and transactions per day in a single statement.
+    Used by the dashboard, which derives every period total and graph bucket from this one series.
+    Args:
+        start (str): start date as string
+        end (str): end date as string
+    """
+    sql = text(
+        """
+        SELECT 
+                CAST(day AS timestamp) as date,
+                quantity,
+                revenue,
+                transactions
+        FROM 
+                sales_daily_totals
+        WHERE 
+                day BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
+        ORDER BY 
+                day;
+        """
+    )
+    try:
+        result = db.session.execute(sql, {"start_date": start, "end_date": end}).fetchall()
+        return result
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def query_daily_revenue(start, end):
+    """
+    Query revenue per day with its trailing 7 day average, gap filled with zero revenue days.
+    The average is a window function over the six days before start as well,
+    so the first days of the range have a full week behind them.
+    Args:
+        start (date): first day
+        end (date): last day (inclusive)
+    Returns:
+        list of rows with date (timestamp), revenue, average_7d and has_sales
+    """
+    sql = text(
+        """
+        WITH days AS (
+            SELECT CAST(d AS date) AS day
+            FROM generate_series(
+                CAST(:start_date AS date) - 6, CAST(:end_date AS date), interval '1 day'
+            ) AS d
+        ),
+        daily AS (
+            SELECT day, revenue
+            FROM sales_daily_totals
+            WHERE day BETWEEN CAST(:start_date AS date) - 6 AND CAST(:end_date AS date)
+        ),
+        series AS (
+            SELECT
+                days.day,
+                COALESCE(daily.revenue, 0) AS revenue,
+                daily.day IS NOT NULL AS has_sales,
+                AVG(COALESCE(daily.revenue, 0)) OVER (
+                    ORDER BY days.day ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+                ) AS average_7d
+            FROM days
+            LEFT JOIN daily ON daily.day = days.day
+        )
+        SELECT CAST(day AS timestamp) AS date, revenue, average_7d, has_sales
+        FROM series
+        WHERE day >= CAST(:start_date AS date)
+        ORDER BY day;
+        """
+    )
+    try:
+        result = db.session.execute(sql, {"start_date": start, "end_date": end}).fetchall()
+        return result
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def query_sales_changes(since: int, granularity: str = "day"):
+    """
+    Return the rollup buckets that changed after the change log version `since`.
+    The daily rollup triggers record, per day, the version of its last change in
+    sales_rollup_changes, so the cost follows the number of changed days and not the history.
+    Args:
+        since (int): cursor returned by the previous call, 0 for a full sync
+        granularity (str): bucket size, one of TIME_BUCKET_STEPS except 'hour'
+    Returns:
+        dict: {"cursor": int, "reset": bool, "buckets": rows with bucket, quantity,
+        revenue and transactions}. reset is set when the client's cached series is no longer
+        valid (sales were truncated or the cursor is unknown); buckets then hold everything.
+    """
+    if granularity not in TIME_BUCKET_STEPS or granularity == "hour":
+        raise ValueError(f"Unsupported granularity: {granularity}")
+
+    cursor_sql = text(
+        """
+        SELECT
+            COALESCE(
+                (SELECT version FROM data_versions WHERE table_name = 'sales_rollup'), 0
+            ) AS cursor,
+            EXISTS (
+                SELECT 1 FROM sales_rollup_changes
+                WHERE day = '-infinity' AND version > :since
+            ) AS reset;
+        """
+    )
+    # Changes committed after the cursor was read are left for the next call
+    buckets_sql = text(
+        """
+        WITH changed AS (
+            SELECT DISTINCT date_trunc(:granularity, CAST(day AS timestamp)) AS bucket
+            FROM sales_rollup_changes
+            WHERE version > :since AND version <= :cursor AND day <> '-infinity'
+        )
+        SELECT
+            c.bucket,
+            CAST(COALESCE(SUM(r.quantity), 0) AS bigint) AS quantity,
+            COALESCE(SUM(r.revenue), 0) AS revenue,
+            CAST(COALESCE(SUM(r.transactions), 0) AS bigint) AS transactions
+        FROM changed c
+        LEFT JOIN sales_daily_totals r
+            ON r.day >= c.bucket AND r.day < c.bucket + CAST(:step AS interval)
+        GROUP BY c.bucket
+        ORDER BY c.bucket;
+        """
+    )
+    try:
+        state = db.session.execute(cursor_sql, {"since": since}).mappings().first()
+        cursor, reset = int(state["cursor"]), bool(state["reset"])
+        if since > cursor:
+            since, reset = 0, True
+
+        rows = db.session.execute(
+            buckets_sql,
+            {
+                "since": since,
+                "cursor": cursor,
+                "granularity": granularity,
+                "step": TIME_BUCKET_STEPS[granularity],
+            },
+        ).fetchall()
+        return {"cursor": cursor, "reset": reset, "buckets": rows}
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def query_rollup_cells(since: int = 0):
+    """
+    Return the daily rollup cells (day x product) of the days changed after change log
+    version `since`, for keeping a copy of the rollup in sync.
+    Args:
+        since (int): cursor returned by the previous call, 0 for every cell
+    Returns:
+        dict: {"cursor": int, "reset": bool, "days": changed days (None when every cell is
+        returned), "cells": rows with day, product_id, quantity, revenue_cents and transactions,
+        "day_transactions": rows with day and transactions of all products of the same days}.
+        A changed day without cells has no sales anymore.
+    """
+    cursor_sql = text(
+        """
+        SELECT
+            COALESCE(
+                (SELECT version FROM data_versions WHERE table_name = 'sales_rollup'), 0
+            ) AS cursor,
+            EXISTS (
+                SELECT 1 FROM sales_rollup_changes
+                WHERE day = '-infinity' AND version > :since
+            ) AS reset;
+        """
+    )
+    all_cells_sql = text(
+        """
+        SELECT
+            day, product_id, quantity,
+            CAST(round(revenue * 100) AS bigint) AS revenue_cents,
+            transactions
+        FROM sales_daily_rollup
+        ORDER BY day, product_id;
+        """
+    )
+    all_day_transactions_sql = text(
+        "SELECT day, transactions FROM sales_daily_totals ORDER BY day;"
+    )
+    days_sql = text(
+        """
+        SELECT day FROM sales_rollup_changes
+        WHERE version > :since AND version <= :cursor AND day <> '-infinity'
+        ORDER BY day;
+        """
+    )
+    changed_cells_sql = text(
+        """
+        SELECT
+            r.day, r.product_id, r.quantity,
+            CAST(round(r.revenue * 100) AS bigint) AS revenue_cents,
+            r.transactions
+        FROM sales_rollup_changes c
+        JOIN sales_daily_rollup r ON r.day = c.day
+        WHERE c.version > :since AND c.version <= :cursor AND c.day <> '-infinity'
+        ORDER BY r.day, r.product_id;
+        """
+    )
+    changed_day_transactions_sql = text(
+        """
+        SELECT t.day, t.transactions
+        FROM sales_rollup_changes c
+        JOIN sales_daily_totals t ON t.day = c.day
+        WHERE c.version > :since AND c.version <= :cursor AND c.day <> '-infinity'
+        ORDER BY t.day;
+        """
+    )
+    try:
+        state = db.session.execute(cursor_sql, {"since": since}).mappings().first()
+        cursor, reset = int(state["cursor"]), bool(state["reset"])
+        if since > cursor:
+            reset = True
+
+        # Cells changed after the cursor was read are applied again by the next call
+        if since == 0 or reset:
+            cells = db.session.execute(all_cells_sql).fetchall()
+            day_transactions = db.session.execute(all_day_transactions_sql).fetchall()
+            return {
+                "cursor": cursor,
+                "reset": reset,
+                "days": None,
+                "cells": cells,
+                "day_transactions": day_transactions,
+            }
+
+        params = {"since": since, "cursor": cursor}
+        days = [row.day for row in db.session.execute(days_sql, params).fetchall()]
+        cells, day_transactions = [], []
+        if days:
+            cells = db.session.execute(changed_cells_sql, params).fetchall()
+            day_transactions = db.session.execute(changed_day_transactions_sql, params).fetchall()
+        return {
+            "cursor": cursor,
+            "reset": False,
+            "days": days,
+            "cells": cells,
+            "day_transactions": day_transactions,
+        }
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def query_sales_report(start, end, group_by):
+    """
+    Query revenue, items sold and the best-selling product per period in one statement.
+    Periods come from date_trunc over the daily rollup; ROW_NUMBER picks the product with the
+    most units in each period (lowest product id on ties), so only one row per period is returned.
+    Args:
+        start (date | None): first day, or None for no lower bound
+        end (date | None): last day (inclusive), or None for no upper bound
+        group_by (str): 'day', 'week', 'month' or 'year'
+    Returns:
+        list of rows with period (timestamp of the period start), total_revenue,
+        total_items_sold, best_selling_product (name) and best_selling_product_units
+    """
+    if group_by not in ("day", "week", "month", "year"):
+        raise ValueError("Invalid group_by value (must be 'year', 'month', 'week', or 'day')")
+
+    conditions = []
+    if start is not None:
+        conditions.append("day >= CAST(:start_date AS date)")
+    if end is not None:
+        conditions.append("day <= CAST(:end_date AS date)")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    sql = text(
+        f"""
+        WITH product_periods AS (
+            SELECT
+                date_trunc(:group_by, CAST(day AS timestamp)) AS period,
+                product_id,
+                SUM(quantity) AS units,
+                SUM(revenue) AS revenue
+            FROM sales_daily_rollup
+            {where}
+            GROUP BY 1, 2
+        ),
+        ranked AS (
+            SELECT
+                period,
+                product_id,
+                units,
+                SUM(revenue) OVER (PARTITION BY period) AS total_revenue,
+                SUM(units) OVER (PARTITION BY period) AS total_items_sold,
+                ROW_NUMBER() OVER (
+                    PARTITION BY period ORDER BY units DESC, product_id
+                ) AS product_rank
+            FROM product_periods
+        )
+        SELECT
+            r.period,
+            r.total_revenue,
+            CAST(r.total_items_sold AS bigint) AS total_items_sold,
+            p.name AS best_selling_product,
+            CAST(r.units AS bigint) AS best_selling_product_units
+        FROM ranked r
+        JOIN products p ON p.id = r.product_id
+        WHERE r.product_rank = 1
+        ORDER BY r.period;
+        """
+    )
+    try:
+        result = db.session.execute(
+            sql, {"start_date": start, "end_date": end, "group_by": group_by}
+        ).fetchall()
+        return result
+
+    except Exception:
+        db.session.rollback()
+        raise
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from ..extensions import db
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Column dtypes of the frames, amount depends on the requested representation
+SALES_FRAME_DTYPES = {
+    "date": "datetime64[ns]",
+    "product_id": np.int64,
+    "quantity": np.int64,
+    "transaction_id": object,
+}
+ROLLUP_FRAME_DTYPES = {
+    "day": "datetime64[ns]",
+    "product_id": np.int64,
+    "quantity": np.int64,
+    "revenue": np.float64,
+    "transactions": np.int64,
+}
+AMOUNT_DTYPES = {"float": np.float64, "cents": "Int64"}
+# Amount is converted in the database so the driver never builds a Decimal per cell
+AMOUNT_COLUMNS = {
+    "float": "CAST(amount AS double precision)",
+    "cents": "CAST(round(amount * 100) AS bigint)",
+}
+
+
+def empty_sales_frame(amount: str = "float") -> pd.DataFrame:
+    """Return an empty sales frame with the same columns and dtypes as a loaded chunk."""
+    dtypes = {**SALES_FRAME_DTYPES, "amount": AMOUNT_DTYPES[amount]}
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in dtypes.items()})
+
+
+def empty_rollup_frame() -> pd.DataFrame:
+    """Return an empty rollup frame with the same columns and dtypes as iter_rollup_frames."""
+    return pd.DataFrame(
+        {column: pd.Series(dtype=dtype) for column, dtype in ROLLUP_FRAME_DTYPES.items()}
+    )
+
+
+def _to_frame(rows, amount: str) -> pd.DataFrame:
+    columns = list(zip(*rows))
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(pd.Series(columns[0], dtype=object)),
+            "product_id": np.asarray(columns[1], dtype=np.int64),
+            "quantity": np.asarray(columns[2], dtype=np.int64),
+            "transaction_id": pd.Series(columns[3], dtype=object),
+            "amount": pd.array(columns[4], dtype=AMOUNT_DTYPES[amount]),
+        }
+    )
+
+
+def _range_filter(column: str, start, end, product_id) -> str:
+    conditions = []
+    if start is not None:
+        conditions.append(f"{column} >= :start_date")
+    if end is not None:
+        conditions.append(f"{column} <= :end_date")
+    if product_id is not None:
+        conditions.append("product_id = :product_id")
+    return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+def _stream_partitions(sql, params: dict, chunk_size: int):
+    """Yield the rows of sql in lists of at most chunk_size rows from a server-side cursor."""
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    try:
+        result = db.session.execute(
+            sql, params, execution_options={"stream_results": True, "yield_per": chunk_size}
+        )
+        try:
+            yield from result.partitions(chunk_size)
+        finally:
+            result.close()
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def iter_sales_frames(
+    start=None,
+    end=None,
+    product_id: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    amount: str = "float",
+):
+    """
+    Stream raw sales rows from a server-side cursor as typed DataFrames of at most chunk_size
+    rows, so multi-year ranges can be processed with bounded memory. Rows come in date order.
+    Args:
+        start (datetime | None): first timestamp included, or None for no lower bound
+        end (datetime | None): last timestamp included, or None for no upper bound
+        product_id (int | None): only rows of this product
+        chunk_size (int): rows per frame
+        amount (str): 'float' for float64 euros or 'cents' for integer cents
+    Yields:
+        DataFrames with columns date, product_id, quantity, transaction_id and amount
+    """
+    if amount not in AMOUNT_COLUMNS:
+        raise ValueError(f"Unknown amount representation: {amount}")
+
+    sql = text(
+        f"""
+        SELECT date, product_id, quantity, transaction_id, {AMOUNT_COLUMNS[amount]} AS amount
+        FROM sales
+        {_range_filter("date", start, end, product_id)}
+        ORDER BY date, id;
+        """
+    )
+    params = {"start_date": start, "end_date": end, "product_id": product_id}
+    for rows in _stream_partitions(sql, params, chunk_size):
+        yield _to_frame(rows, amount)
+
+
+def iter_rollup_frames(
+    start=None,
+    end=None,
+    product_id: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+):
+    """
+    Stream the daily rollup (one row per day and product) like iter_sales_frames.
+    Args:
+        start (date | None): first day included, or None for no lower bound
+        end (date | None): last day included, or None for no upper bound
+        product_id (int | None): only rows of this product
+        chunk_size (int): rows per frame
+    Yields:
+        DataFrames with columns day, product_id, quantity, revenue and transactions
+    """
+    sql = text(
+        f"""
+        SELECT day, product_id, quantity, CAST(revenue AS double precision) AS revenue, transactions
+        FROM sales_daily_rollup
+        {_range_filter("day", start, end, product_id)}
+        ORDER BY day, product_id;
+        """
+    )
+    params = {"start_date": start, "end_date": end, "product_id": product_id}
+    for rows in _stream_partitions(sql, params, chunk_size):
+        columns = list(zip(*rows))
+        yield pd.DataFrame(
+            {
+                "day": pd.to_datetime(pd.Series(columns[0], dtype=object)),
+                "product_id": np.asarray(columns[1], dtype=np.int64),
+                "quantity": np.asarray(columns[2], dtype=np.int64),
+                "revenue": np.asarray(columns[3], dtype=np.float64),
+                "transactions": np.asarray(columns[4], dtype=np.int64),
+            }
+        )
+
+
+def load_sales_frame(
+    start=None,
+    end=None,
+    product_id: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    amount: str = "float",
+) -> pd.DataFrame:
+    """
+    Load raw sales rows into one typed DataFrame, see iter_sales_frames for the arguments.
+    """
+    frames = list(iter_sales_frames(start, end, product_id, chunk_size, amount))
+    if not frames:
+        return empty_sales_frame(amount)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,243 @@
+import hashlib
+import io
+import uuid
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from .. import config
+from ..extensions import db
+from .sales_partitions import partition_window, prepare_sales_partitions
+
+INGEST_FORMATS = ("csv", "ndjson")
+REQUIRED_COLUMNS = ("product_id", "quantity", "date")
+MAX_BATCH_ROWS = config.get("ingest.max_batch_rows", 100_000)
+# Largest accepted difference in euros between a row's amount and quantity * product price
+AMOUNT_TOLERANCE = config.get("ingest.amount_tolerance", 0.01)
+MAX_REPORTED_ERRORS = 100
+
+COPY_SQL = (
+    "COPY sales (transaction_id, product_id, quantity, date, amount) "
+    "FROM STDIN WITH (FORMAT csv)"
+)
+
+
+class IdempotencyKeyConflict(ValueError):
+    """The idempotency key was already used for a batch with different contents."""
+
+
+def batch_checksum(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def parse_sales_batch(content: bytes, batch_format: str = "csv") -> pd.DataFrame:
+    """
+    Parse an uploaded batch of sales into a DataFrame of strings, one row per sale.
+    Raises ValueError on an unknown format, unparseable content or an empty batch.
+    """
+    if batch_format not in INGEST_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(INGEST_FORMATS)}")
+    try:
+        if batch_format == "csv":
+            frame = pd.read_csv(io.BytesIO(content), dtype=str, keep_default_na=False)
+        else:
+            frame = pd.read_json(io.BytesIO(content), lines=True, dtype=False)
+    except Exception as e:
+        raise ValueError(f"Could not parse the batch as {batch_format}: {e}") from e
+
+    if frame.empty:
+        raise ValueError("The batch contains no sales")
+    if len(frame) > MAX_BATCH_ROWS:
+        raise ValueError(f"A batch can contain at most {MAX_BATCH_ROWS} sales")
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return frame
+
+
+def _blank(values: pd.Series) -> pd.Series:
+    return values.isna() | (values.astype(str).str.strip() == "")
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    """Parse ISO 8601 dates to naive timestamps, timestamps with an offset are stored as UTC."""
+    dates = pd.to_datetime(values, errors="coerce", format="ISO8601", utc=True)
+    return dates.dt.tz_localize(None)
+
+
+def _check_products(product_id: pd.Series, prices: dict):
+    """Prices of the rows' products and the mask of rows whose product does not exist."""
+    known = np.fromiter(prices, dtype=np.int64, count=len(prices))
+    bad_product = ~(product_id % 1 == 0) | ~product_id.isin(known)
+    return product_id.map({key: float(value) for key, value in prices.items()}), bad_product
+
+
+def _check_amounts(frame: pd.DataFrame, expected: pd.Series):
+    """
+    Amounts of the rows, missing ones replaced by the expected quantity * price,
+    and the mask of given amounts that are invalid or too far from the expected one.
+    """
+    if "amount" not in frame.columns:
+        return expected, pd.Series(False, index=frame.index)
+
+    missing = _blank(frame["amount"])
+    amount = pd.to_numeric(frame["amount"].where(~missing), errors="coerce")
+    bad_amount = ~missing & (
+        amount.isna() | (amount < 0) | ((amount - expected).abs() > AMOUNT_TOLERANCE + 1e-9)
+    )
+    return amount.where(~missing, expected), bad_amount
+
+
+def _transaction_ids(frame: pd.DataFrame):
+    """
+    Transaction ids of the rows, a generated UUID for missing ones,
+    and the mask of ids that are too long.
+    """
+    if "transaction_id" not in frame.columns:
+        frame = frame.assign(transaction_id="")
+    transaction_id = frame["transaction_id"].astype("string").str.strip()
+    too_long = (transaction_id.str.len() > 36).fillna(False)
+    generate = _blank(frame["transaction_id"])
+    transaction_id = transaction_id.astype(object)
+    transaction_id.loc[generate] = [str(uuid.uuid4()) for _ in range(int(generate.sum()))]
+    return transaction_id, too_long
+
+
+def _row_errors(checks: dict) -> list:
+    """Errors of the rows failing any of the {message: mask} checks, at most MAX_REPORTED_ERRORS."""
+    failed = np.column_stack([mask.to_numpy(dtype=bool) for mask in checks.values()])
+    messages = np.array(list(checks))
+    return [
+        {"row": int(row) + 1, "errors": messages[failed[row]].tolist()}
+        for row in np.flatnonzero(failed.any(axis=1))[:MAX_REPORTED_ERRORS]
+    ]
+
+
+def validate_sales_batch(frame: pd.DataFrame, prices: dict, window: tuple | None = None):
+    """
+    Check every row of a parsed batch at once and normalize it for loading.
+    A row is invalid if its product does not exist, its quantity is not a non-negative
+    integer, its date cannot be parsed or falls outside the partition window, or its amount
+    differs from quantity * price by more than AMOUNT_TOLERANCE. A missing amount is computed
+    from the price and a missing transaction_id is generated.
+    Args:
+        frame (pd.DataFrame): output of parse_sales_batch
+        prices (dict): {product_id: price} of the existing products
+        window (tuple[date, date] | None): first allowed day and first day after the
+            allowed range, partition_window() by default
+    Returns:
+        (pd.DataFrame, list[dict]): the normalized rows and the errors as
+        {"row": 1-based row number, "errors": [str]}, at most MAX_REPORTED_ERRORS of them
+    """
+    product_id = pd.to_numeric(frame["product_id"], errors="coerce")
+    quantity = pd.to_numeric(frame["quantity"], errors="coerce")
+    dates = _parse_dates(frame["date"])
+    window_start, window_end = window or partition_window()
+
+    price, bad_product = _check_products(product_id, prices)
+    amount, bad_amount = _check_amounts(frame, (quantity * price).round(2))
+    transaction_id, bad_transaction = _transaction_ids(frame)
+
+    errors = _row_errors(
+        {
+            "unknown product_id": bad_product,
+            "quantity must be a non-negative integer": ~(quantity % 1 == 0) | (quantity < 0),
+            "date must be an ISO 8601 date or timestamp": dates.isna(),
+            f"date must be on or after {window_start} and before {window_end}": (
+                (dates < pd.Timestamp(window_start)) | (dates >= pd.Timestamp(window_end))
+            ),
+            f"amount must match quantity * price within {AMOUNT_TOLERANCE}": (
+                bad_amount & ~bad_product
+            ),
+            "transaction_id must be at most 36 characters": bad_transaction,
+        }
+    )
+    if errors:
+        return None, errors
+
+    return (
+        pd.DataFrame(
+            {
+                "transaction_id": transaction_id.astype(str),
+                "product_id": product_id.astype(np.int64),
+                "quantity": quantity.astype(np.int64),
+                "date": dates,
+                "amount": amount.round(2),
+            }
+        ),
+        [],
+    )
+
+
+def _copy_rows(rows: pd.DataFrame):
+    """Load the rows into sales with COPY on the session's connection and transaction."""
+    buffer = io.StringIO()
+    rows.to_csv(buffer, header=False, index=False, date_format="%Y-%m-%d %H:%M:%S.%f")
+    buffer.seek(0)
+
+    cursor = db.session.connection().connection.dbapi_connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            cursor.copy_expert(COPY_SQL, buffer)
+        else:  # psycopg 3
+            with cursor.copy(COPY_SQL) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def ingest_sales_batch(rows: pd.DataFrame, idempotency_key: str, checksum: str) -> dict:
+    """
+    Insert a validated batch into sales in one transaction, at most once per idempotency key.
+    The key is claimed first, so a concurrent retry of the same batch waits for this
+    transaction and then sees the batch as already ingested.
+    Args:
+        rows (pd.DataFrame): output of validate_sales_batch
+        idempotency_key (str): client chosen key of the batch
+        checksum (str): batch_checksum of the uploaded contents
+    Returns:
+        dict: {"idempotency_key": str, "rows": int, "duplicate": bool}
+    Raises:
+        IdempotencyKeyConflict: the key was used before for different contents
+    """
+    if not idempotency_key or len(idempotency_key) > 255:
+        raise ValueError("idempotency key must be 1-255 characters")
+
+    claim = text(
+        """
+        INSERT INTO sales_ingest_batches (idempotency_key, checksum, rows)
+        VALUES (:key, :checksum, :rows)
+        ON CONFLICT (idempotency_key) DO NOTHING
+        RETURNING idempotency_key;
+        """
+    )
+    try:
+        claimed = db.session.execute(
+            claim, {"key": idempotency_key, "checksum": checksum, "rows": len(rows)}
+        ).scalar()
+
+        if claimed is None:
+            existing = db.session.execute(
+                text(
+                    "SELECT checksum, rows FROM sales_ingest_batches "
+                    "WHERE idempotency_key = :key;"
+                ),
+                {"key": idempotency_key},
+            ).one()
+            db.session.rollback()
+            if existing.checksum != checksum:
+                raise IdempotencyKeyConflict(
+                    f"Idempotency key {idempotency_key} was already used for a different batch"
+                )
+            return {"idempotency_key": idempotency_key, "rows": existing.rows, "duplicate": True}
+
+        # sales is partitioned by month, every day of the batch needs its partition
+        prepare_sales_partitions(db.session, rows["date"].min().date(), rows["date"].max().date())
+        _copy_rows(rows)
+        db.session.commit()
+        return {"idempotency_key": idempotency_key, "rows": len(rows), "duplicate": False}
+
+    except Exception:
+        db.session.rollback()
+        raise
@@ -0,0 +1,151 @@
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+from .. import config
+from ..extensions import db
+
+# Monthly partitions of sales are named sales_yYYYYmMM (see migration a3b8e5f21c07)
+PARTITION_NAME = re.compile(r"^sales_y(\d{4})m(\d{2})$")
+SCHEMA_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+MONTHS_AHEAD = config.get("partitions.months_ahead", 12)
+MONTHS_BACK = config.get("partitions.months_back", 120)
+ARCHIVE_AFTER_MONTHS = config.get("partitions.archive_after_months", 0)
+
+ENSURE_PARTITIONS = text(
+    "SELECT ensure_sales_partitions(CAST(:start AS date), CAST(:end AS date));"
+)
+
+
+def add_months(day: date, months: int) -> date:
+    """Return the first day of the month `months` months after the month of day."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_month(name: str) -> date | None:
+    """Return the first day of the month a partition name covers, or None for other names."""
+    match = PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def partition_window(today: date | None = None) -> tuple[date, date]:
+    """
+    Return the range of dates sales may be written for: from the first day of the oldest
+    month still kept, MONTHS_BACK or the archive cutoff, up to but excluding the first day
+    after the last month kept ready, MONTHS_AHEAD months from today.
+    """
+    today = today or date.today()
+    months_back = min(MONTHS_BACK, ARCHIVE_AFTER_MONTHS or MONTHS_BACK)
+    return add_months(today, -months_back), add_months(today, MONTHS_AHEAD + 1)
+
+
+def ensure_sales_partitions(start, end) -> int:
+    """
+    Create the missing monthly partitions of sales covering start .. end and commit.
+    Existing partitions are left alone, so this is safe to run repeatedly.
+    Args:
+        start (date | str): first day to cover
+        end (date | str): last day to cover
+    Returns:
+        int: number of partitions created
+    """
+    try:
+        created = db.session.execute(ENSURE_PARTITIONS, {"start": start, "end": end}).scalar()
+        db.session.commit()
+        return created
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def prepare_sales_partitions(connection, start, end, today: date | None = None):
+    """
+    Create the partitions a write of sales dated start .. end needs, in the caller's
+    transaction. The partitions of this month and the next MONTHS_AHEAD months are created
+    as well, so they exist even if the maintenance script has not run since the last deploy.
+    Args:
+        connection: session or connection the write runs on
+        start (date): first day of the written sales
+        end (date): last day of the written sales
+    """
+    today = today or date.today()
+    connection.execute(ENSURE_PARTITIONS, {"start": start, "end": end})
+    connection.execute(ENSURE_PARTITIONS, {"start": today, "end": add_months(today, MONTHS_AHEAD)})
+
+
+def list_sales_partitions():
+    """
+    Return the partitions currently attached to sales, oldest first.
+    Returns:
+        list[dict]: {"name": str, "month": date, "estimated_rows": int}
+    """
+    sql = text(
+        """
+        SELECT c.relname AS name, GREATEST(c.reltuples, 0)::bigint AS estimated_rows
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'sales'::regclass;
+        """
+    )
+    try:
+        rows = db.session.execute(sql).mappings().all()
+
+        partitions = [
+            {
+                "name": row["name"],
+                "month": partition_month(row["name"]),
+                "estimated_rows": int(row["estimated_rows"]),
+            }
+            for row in rows
+        ]
+        return sorted(partitions, key=lambda p: (p["month"] is None, p["month"] or date.min))
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def detach_sales_partition(name: str, archive_schema: str | None = None):
+    """
+    Detach a monthly partition from sales without blocking reads or writes to the table.
+
+    Uses DETACH PARTITION CONCURRENTLY, which cannot run inside a transaction, so the
+    statements run on their own autocommit connection. The rows stay in the detached table,
+    and the daily rollup keeps their aggregates, so dashboard history is not affected.
+    Args:
+        name: partition name, e.g. "sales_y2023m01"
+        archive_schema: if given, the detached table is moved into this schema
+    """
+    if partition_month(name) is None:
+        raise ValueError(f"Not a monthly sales partition: {name}")
+    if archive_schema and not SCHEMA_NAME.match(archive_schema):
+        raise ValueError(f"Invalid archive schema name: {archive_schema}")
+
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f'ALTER TABLE sales DETACH PARTITION "{name}" CONCURRENTLY;'))
+        if archive_schema:
+            conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}";'))
+            conn.execute(text(f'ALTER TABLE "{name}" SET SCHEMA "{archive_schema}";'))
+
+
+def archive_sales_partitions(before: date, archive_schema: str = "archive"):
+    """
+    Detach every monthly partition that ends on or before the given date
+    and move it into archive_schema.
+    Returns:
+        list[str]: names of the archived partitions
+    """
+    archived = []
+    for partition in list_sales_partitions():
+        month = partition["month"]
+        if month is None:
+            continue
+        if add_months(month, 1) <= before:
+            detach_sales_partition(partition["name"], archive_schema)
+            archived.append(partition["name"])
+    return archived
@@ -0,0 +1,185 @@
+import pandas as pd
+from sqlalchemy import text
+
+from ..extensions import db
+from .sales_partitions import prepare_sales_partitions
+
+SALE_EVENT = "sale"
+# The till balance lives in a single counter row
+COUNTER_ID = 1
+
+
+class InsufficientInventory(ValueError):
+    """A batch sells more of a product than its inventory holds."""
+
+    def __init__(self, shortages: dict):
+        self.shortages = shortages
+        super().__init__(
+            "Not enough inventory for products: "
+            + ", ".join(f"{pid} (short by {short})" for pid, short in shortages.items())
+        )
+
+
+def record_sales(rows: pd.DataFrame) -> dict:
+    """
+    Record a batch of sales in one transaction with a fixed number of set-based statements:
+    append one history event per sale, correct the inventory snapshots taken after a
+    backdated sale, decrement the inventory of every product by its total quantity, insert
+    the sales and add the revenue to the counter balance.
+
+    Locks are always taken in the same order: the inventory rows of the batch's products by
+    id, then the statements that every batch contends on, kept last. The inventory update
+    bumps the inventory data version. The sales insert takes the advisory lock of every day
+    it touches, re-aggregates those days in the daily rollup and bumps the sales, sales_rollup
+    and, for backdated days, sales_history versions. The counter row comes last. All of these
+    are held until commit, so concurrent batches wait for each other from the inventory update
+    onward, whatever products they touch, but never deadlock. Only the history and snapshot
+    statements of batches for disjoint products run in parallel.
+    Args:
+        rows (pd.DataFrame): sales with columns transaction_id, product_id, quantity, date
+            and amount, e.g. the output of validate_sales_batch
+    Returns:
+        dict: {"sales": int, "revenue": float, "inventory": {product_id: amount left}}
+    Raises:
+        InsufficientInventory: a product would go below zero, nothing is recorded
+        ValueError: a product has no inventory row
+    """
+    if rows.empty:
+        raise ValueError("No sales to record")
+    totals = rows.groupby("product_id")["quantity"].sum()
+
+    lock = text(
+        """
+        SELECT i.id, i.product_id, i.amount
+        FROM inventory i
+        WHERE i.id IN (
+            SELECT MIN(id) FROM inventory
+            WHERE product_id = ANY(CAST(:product_ids AS int[]))
+            GROUP BY product_id
+        )
+        ORDER BY i.id
+        FOR UPDATE;
+        """
+    )
+    insert_sales = text(
+        """
+        INSERT INTO sales (transaction_id, product_id, quantity, date, amount)
+        SELECT *
+        FROM unnest(
+            CAST(:transaction_ids AS varchar[]),
+            CAST(:product_ids AS int[]),
+            CAST(:quantities AS int[]),
+            CAST(:dates AS timestamp[]),
+            CAST(:amounts AS numeric[])
+        );
+        """
+    )
+    update_inventory = text(
+        """
+        UPDATE inventory i
+        SET amount = i.amount - t.quantity
+        FROM unnest(CAST(:inventory_ids AS int[]), CAST(:quantities AS int[])) AS t(id, quantity)
+        WHERE i.id = t.id;
+        """
+    )
+    insert_history = text(
+        """
+        INSERT INTO history (time, product_id, event_type, amount)
+        SELECT s.date, s.product_id, :event_type, -s.quantity
+        FROM unnest(
+            CAST(:dates AS timestamp[]),
+            CAST(:product_ids AS int[]),
+            CAST(:quantities AS int[])
+        ) AS s(date, product_id, quantity);
+        """
+    )
+    # Snapshots taken after a backdated sale no longer match the inventory at their time
+    update_snapshots = text(
+        """
+        UPDATE inventory_snapshots s
+        SET amount = s.amount + late.amount
+        FROM (
+            SELECT n.product_id, n.taken_at, -SUM(e.quantity) AS amount
+            FROM unnest(
+                CAST(:dates AS timestamp[]),
+                CAST(:product_ids AS int[]),
+                CAST(:quantities AS int[])
+            ) AS e(date, product_id, quantity)
+            JOIN inventory_snapshots n ON n.product_id = e.product_id AND n.taken_at >= e.date
+            GROUP BY n.product_id, n.taken_at
+        ) late
+        WHERE s.product_id = late.product_id AND s.taken_at = late.taken_at;
+        """
+    )
+    update_counter = text(
+        """
+        INSERT INTO counter (id, balance)
+        VALUES (:counter_id, :revenue)
+        ON CONFLICT (id) DO UPDATE SET balance = counter.balance + EXCLUDED.balance;
+        """
+    )
+
+    sales = {
+        "transaction_ids": rows["transaction_id"].astype(str).tolist(),
+        "product_ids": rows["product_id"].astype(int).tolist(),
+        "quantities": rows["quantity"].astype(int).tolist(),
+        "dates": [day.to_pydatetime() for day in pd.to_datetime(rows["date"])],
+        "amounts": rows["amount"].round(2).astype(float).tolist(),
+    }
+    revenue = round(float(rows["amount"].sum()), 2)
+
+    try:
+        inventory = pd.DataFrame(
+            db.session.execute(lock, {"product_ids": totals.index.tolist()}).all(),
+            columns=["id", "product_id", "amount"],
+        ).set_index("product_id")
+
+        missing = totals.index.difference(inventory.index)
+        if len(missing):
+            raise ValueError(f"Products without inventory: {', '.join(map(str, missing))}")
+        left = inventory["amount"].reindex(totals.index) - totals
+        if (left < 0).any():
+            raise InsufficientInventory(
+                {int(pid): int(-short) for pid, short in left[left < 0].items()}
+            )
+
+        # sales is partitioned by month, every day of the batch needs its partition
+        prepare_sales_partitions(db.session, min(sales["dates"]).date(), max(sales["dates"]).date())
+        db.session.execute(
+            insert_history,
+            {
+                "dates": sales["dates"],
+                "product_ids": sales["product_ids"],
+                "quantities": sales["quantities"],
+                "event_type": SALE_EVENT,
+            },
+        )
+        db.session.execute(
+            update_snapshots,
+            {
+                "dates": sales["dates"],
+                "product_ids": sales["product_ids"],
+                "quantities": sales["quantities"],
+            },
+        )
+        # Every batch contends on the data versions bumped from here on, so they come last
+        db.session.execute(
+            update_inventory,
+            {
+                "inventory_ids": inventory["id"].reindex(totals.index).astype(int).tolist(),
+                "quantities": totals.astype(int).tolist(),
+            },
+        )
+        db.session.execute(insert_sales, sales)
+        db.session.execute(update_counter, {"counter_id": COUNTER_ID, "revenue": revenue})
+        db.session.commit()
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        "sales": len(rows),
+        "revenue": revenue,
+        "inventory": {int(pid): int(amount) for pid, amount in left.items()},
+    }
@@ -0,0 +1,101 @@
+import json
+
+from sqlalchemy import text
+
+from ..extensions import db
+
+
+def get_snapshot(key):
+    """
+    Return the stored snapshot for key as a mapping with payload, data_version and built_at,
+    or None if no snapshot has been built yet.
+    """
+    sql = text(
+        """
+        SELECT payload, data_version, built_at
+        FROM dashboard_snapshots
+        WHERE key = :key;
+        """
+    )
+    try:
+        return db.session.execute(sql, {"key": key}).mappings().first()
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def save_snapshot(key, payload, data_version):
+    """
+    Insert or replace the snapshot for key. Does not commit.
+    """
+    sql = text(
+        """
+        INSERT INTO dashboard_snapshots (key, payload, data_version, built_at)
+        VALUES (:key, CAST(:payload AS jsonb), :data_version, timezone('utc', now()))
+        ON CONFLICT (key) DO UPDATE SET
+            payload = EXCLUDED.payload,
+            data_version = EXCLUDED.data_version,
+            built_at = EXCLUDED.built_at;
+        """
+    )
+    try:
+        db.session.execute(
+            sql, {"key": key, "payload": json.dumps(payload), "data_version": data_version}
+        )
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def prune_snapshots(prefix: str, keep: int) -> int:
+    """
+    Delete the snapshots whose key starts with prefix, except the keep most recently built.
+    Rows locked by another transaction are left alone, so concurrent prunes never wait
+    on each other. Does not commit.
+    Returns:
+        int: number of deleted snapshots
+    """
+    sql = text(
+        """
+        DELETE FROM dashboard_snapshots
+        WHERE key IN (
+            SELECT key FROM dashboard_snapshots
+            WHERE starts_with(key, :prefix)
+            ORDER BY built_at DESC
+            OFFSET :keep
+            FOR UPDATE SKIP LOCKED
+        );
+        """
+    )
+    try:
+        return db.session.execute(sql, {"prefix": prefix, "keep": keep}).rowcount
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def lock_snapshot(key, wait: bool = True) -> bool:
+    """
+    Take the transaction-scoped writer lock of a snapshot key.
+    The lock is released when the current transaction commits or rolls back,
+    so only one worker across all processes rebuilds a given snapshot at a time.
+    Args:
+        key (str): snapshot key
+        wait (bool): block until the lock is free instead of giving up immediately
+    Returns:
+        bool: True if the lock is held by this transaction
+    """
+    params = {"key": f"snapshot:{key}"}
+    try:
+        if wait:
+            db.session.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key));"), params)
+            return True
+        sql = text("SELECT pg_try_advisory_xact_lock(hashtext(:key));")
+        return bool(db.session.execute(sql, params).scalar())
+
+    except Exception:
+        db.session.rollback()
+        raise
@@ -36,15 +36,50 @@ class Chat(db.Model):
 
 
 class Sale(db.Model):
+    # Range partitioned by month on date in Postgres (see migration a3b8e5f21c07),
+    # which is why date is part of the primary key
     __tablename__ = "sales"
-    id = db.Column(db.Integer, primary_key=True)
+    __table_args__ = (db.Index("ix_sales_product_id_date", "product_id", "date"),)
+    id = db.Column(db.Integer, db.Sequence("sales_id_seq"), primary_key=True)
     transaction_id = db.Column(db.String(36), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
-    date = db.Column(db.DateTime, nullable=False)
+    date = db.Column(db.DateTime, primary_key=True, nullable=False, index=True)
     amount = db.Column(db.Numeric(10, 2), nullable=True)
 
 
+class SalesDailyRollup(db.Model):
+    # Maintained by triggers on the sales table (see migration 5b0e8a7c41d2),
+    # never written to directly by the application
+    __tablename__ = "sales_daily_rollup"
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), primary_key=True)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    transactions = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class SalesDailyTotals(db.Model):
+    # Totals of all products per day, maintained next to sales_daily_rollup (see migration
+    # c5e2a9f7d310). A basket with several products is one transaction here.
+    __tablename__ = "sales_daily_totals"
+    day = db.Column(db.Date, primary_key=True)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    transactions = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class SalesIngestBatch(db.Model):
+    # Idempotency keys of ingested sales batches, a retried upload with the same key
+    # is acknowledged without inserting its rows again
+    __tablename__ = "sales_ingest_batches"
+    idempotency_key = db.Column(db.String(255), primary_key=True)
+    # sha256 of the batch contents, to reject a key reused for different data
+    checksum = db.Column(db.String(64), nullable=False)
+    rows = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+
 class Product(db.Model):
     __tablename__ = "products"
     id = db.Column(db.Integer, primary_key=True)
@@ -56,7 +91,7 @@ class Customer(db.Model):
     __tablename__ = "customers"
     id = db.Column(db.Integer, primary_key=True)
     daily_customer_amount = db.Column(db.Integer, nullable=False, default=0)
-    date = db.Column(db.DateTime, nullable=False)
+    date = db.Column(db.DateTime, nullable=False, index=True)
 
 
 class Inventory(db.Model):
@@ -68,6 +103,15 @@ class Inventory(db.Model):
     product = db.relationship("Product", backref="inventory_items")
 
 
+class InventorySnapshot(db.Model):
+    # Inventory of a product at taken_at, taken periodically so point-in-time lookups only
+    # replay the history events since the nearest snapshot
+    __tablename__ = "inventory_snapshots"
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), primary_key=True)
+    taken_at = db.Column(db.DateTime, primary_key=True)
+    amount = db.Column(db.Integer, nullable=False)
+
+
 class Counter(db.Model):
     __tablename__ = "counter"
     id = db.Column(db.Integer, primary_key=True)
@@ -76,10 +120,34 @@ class Counter(db.Model):
 
 class History(db.Model):
     __tablename__ = "history"
+    __table_args__ = (
+        db.Index("ix_history_time_brin", "time", postgresql_using="brin"),
+        db.Index("ix_history_product_id_time", "product_id", "time"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     time = db.Column(db.DateTime, nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
     event_type = db.Column(db.String(100), nullable=False)
+    # Signed change of the product's inventory, e.g. -3 for a sale of three items
     amount = db.Column(db.Integer, nullable=False)
 
     product = db.relationship("Product", backref="history_events")
+
+
+class DataVersion(db.Model):
+    # One row per table, bumped by a statement-level trigger on every write to that table
+    __tablename__ = "data_versions"
+    table_name = db.Column(db.String(63), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    # UTC, so it can be sent as a Last-Modified header as-is
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+
+class DashboardSnapshot(db.Model):
+    # Created as an UNLOGGED table by its migration; rows are precomputed payloads
+    # shared by all gunicorn workers
+    __tablename__ = "dashboard_snapshots"
+    key = db.Column(db.String(100), primary_key=True)
+    payload = db.Column(JSONB, nullable=False)
+    data_version = db.Column(db.String(255), nullable=False)
+    built_at = db.Column(db.DateTime, nullable=False)
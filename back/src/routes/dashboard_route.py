@@ -1,17 +1,52 @@
-from flask import jsonify
+from datetime import date, datetime
+
+from flask import jsonify, request
 
 from ..extensions import db
 from ..index import app
-from ..utils.dashboard import fetch_dashboard_data
+from ..utils.dashboard import check_as_of, fetch_dashboard_data, is_closed_period
+from ..utils.http_cache import conditional_on
+
+
+def parse_as_of(value: str | None) -> date | None:
+    """
+    Parse the as_of argument (YYYY-MM-DD). Raises ValueError when invalid, in the future,
+    or neither today nor the last day of a month.
+    """
+    if not value:
+        return None
+    as_of = datetime.strptime(value, "%Y-%m-%d").date()
+    check_as_of(as_of)
+    return as_of
+
+
+def dashboard_cache_policy():
+    """
+    Closed periods only change when past sales are corrected, so they depend on sales_history
+    alone, today's writes leave their ETag alone, and their URL can be pinned to its version.
+    """
+    try:
+        as_of = parse_as_of(request.args.get("as_of"))
+    except ValueError:
+        as_of = None
+
+    if as_of is not None and is_closed_period(as_of):
+        return ("sales_history",), False, True
+    return ("sales",), as_of is None, False
 
 
 @app.get("/api/dashboard-data")
+@conditional_on("sales", daily=True, policy=dashboard_cache_policy)
 def get_dashboard_data():
+    try:
+        as_of = parse_as_of(request.args.get("as_of"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        data = fetch_dashboard_data()
+        data = fetch_dashboard_data(as_of)
         return jsonify(data)
 
     except Exception as e:
-
-        return jsonify({"error": str(e)})
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,29 @@
+from flask import jsonify
+
+from ..database.data_version import fetch_data_versions
+from ..extensions import db
+from ..index import app
+
+VERSIONED_TABLES = ["sales", "customers", "inventory", "products"]
+
+
+@app.get("/api/data-version")
+def get_data_version():
+    """
+    Return the version vector of the analytics tables, usable as a cache key by clients.
+    """
+    try:
+        versions = fetch_data_versions(VERSIONED_TABLES)
+        return jsonify(
+            {
+                table: {
+                    "version": v["version"],
+                    "updated_at": v["updated_at"].isoformat() if v["updated_at"] else None,
+                }
+                for table, v in versions.items()
+            }
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,179 @@
+import io
+from datetime import datetime
+from functools import partial
+from itertools import chain
+
+from flask import Response, jsonify, request, stream_with_context
+from flask_login import login_required
+
+from .. import config
+from ..database.product_dimension import get_product_dimension, resolve_product_id
+from ..database.sales_frames import (
+    empty_rollup_frame,
+    empty_sales_frame,
+    iter_rollup_frames,
+    iter_sales_frames,
+)
+from ..extensions import db
+from ..index import app
+from ..utils.logger import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is a dependency, but keep the other formats working without it
+    pa = pq = None
+
+# Rows fetched from the server-side cursor and written per chunk of the response
+EXPORT_CHUNK_SIZE = config.get("export.chunk_size", 10_000)
+# Frame iterator of each source, and the empty frame exported when the range has no rows
+EXPORT_SOURCES = {
+    "sales": (iter_sales_frames, empty_sales_frame),
+    "rollup": (iter_rollup_frames, empty_rollup_frame),
+}
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _csv_chunks(frames):
+    for i, frame in enumerate(frames):
+        yield frame.to_csv(index=False, header=i == 0)
+
+
+def _ndjson_chunks(frames):
+    for frame in frames:
+        if len(frame):
+            lines = frame.to_json(orient="records", lines=True, date_format="iso")
+            yield lines if lines.endswith("\n") else lines + "\n"
+
+
+def _parquet_schema(source: str):
+    """
+    Columns of the exported frames in order, product_name included. The schema is fixed up
+    front: inferred from a chunk whose product_name or amount is all null, it would have null
+    columns and every later chunk would fail to write.
+    """
+    columns = {
+        "sales": [
+            ("date", pa.timestamp("ns")),
+            ("product_id", pa.int64()),
+            ("product_name", pa.string()),
+            ("quantity", pa.int64()),
+            ("transaction_id", pa.string()),
+            ("amount", pa.float64()),
+        ],
+        "rollup": [
+            ("day", pa.timestamp("ns")),
+            ("product_id", pa.int64()),
+            ("product_name", pa.string()),
+            ("quantity", pa.int64()),
+            ("revenue", pa.float64()),
+            ("transactions", pa.int64()),
+        ],
+    }
+    return pa.schema(columns[source])
+
+
+def _parquet_chunks(frames, schema):
+    """Write every frame as a row group and yield the bytes written so far."""
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, schema) as writer:
+        for frame in frames:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+def _drain(buffer: io.BytesIO) -> bytes:
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+EXPORT_WRITERS = {"csv": _csv_chunks, "ndjson": _ndjson_chunks, "parquet": _parquet_chunks}
+
+
+def _with_product_names(frames, products: dict):
+    for frame in frames:
+        names = {pid: products.get(pid, {}).get("name") for pid in frame["product_id"].unique()}
+        frame.insert(
+            frame.columns.get_loc("product_id") + 1, "product_name", frame["product_id"].map(names)
+        )
+        yield frame
+
+
+@app.get("/api/export/sales")
+@login_required
+def export_sales():
+    """
+    Stream raw sales or daily rollup rows of a date range as CSV, NDJSON or Parquet.
+    Rows are read from a server-side cursor chunk by chunk, so memory use does not depend on
+    the size of the range.
+    """
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    source = request.args.get("source", "sales")
+    export_format = request.args.get("format", "csv")
+    product = request.args.get("product")
+
+    if not start_date or not end_date:
+        return jsonify({"error": "start_date and end_date are required"}), 400
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "start_date and end_date must be YYYY-MM-DD"}), 400
+    if end < start:
+        return jsonify({"error": "end_date is before start_date"}), 400
+    if source not in EXPORT_SOURCES:
+        return jsonify({"error": f"source must be one of {', '.join(EXPORT_SOURCES)}"}), 400
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    if export_format == "parquet" and pq is None:
+        return jsonify({"error": "Parquet export requires pyarrow to be installed"}), 501
+
+    if source == "sales":
+        # Set end time to 23:59:59 to include the entire end day
+        end = end.replace(hour=23, minute=59, second=59)
+    else:
+        start, end = start.date(), end.date()
+
+    try:
+        products = get_product_dimension()
+        product_id = None
+        if product:
+            product_id = resolve_product_id(product)
+            if product_id is None:
+                return jsonify({"error": f"Unknown product: {product}"}), 400
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    iter_frames, empty_frame = EXPORT_SOURCES[source]
+    write = EXPORT_WRITERS[export_format]
+    if export_format == "parquet":
+        write = partial(write, schema=_parquet_schema(source))
+
+    def generate():
+        # The cursor is opened here: the session of the view is closed once it returns
+        try:
+            frames = iter_frames(start, end, product_id, EXPORT_CHUNK_SIZE)
+            first = next(frames, None)
+            frames = chain([first if first is not None else empty_frame()], frames)
+            yield from write(_with_product_names(frames, products))
+        except Exception:
+            # The status line is already sent, so the client sees a truncated file
+            logger.exception(f"Sales export {start_date}..{end_date} failed mid-stream")
+            raise
+
+    filename = f"{source}_{start_date}_{end_date}.{export_format}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,93 @@
+import pandas as pd
+from flask import jsonify, request
+from flask_login import login_required
+
+from ..database.product_dimension import get_product_dimension
+from ..database.sales_ingest import (
+    INGEST_FORMATS,
+    REQUIRED_COLUMNS,
+    IdempotencyKeyConflict,
+    batch_checksum,
+    ingest_sales_batch,
+    parse_sales_batch,
+    validate_sales_batch,
+)
+from ..database.sales_recording import InsufficientInventory, record_sales
+from ..extensions import db
+from ..index import app
+
+CONTENT_TYPE_FORMATS = {"text/csv": "csv", "application/x-ndjson": "ndjson"}
+
+
+@app.post("/api/sales/ingest")
+@login_required
+def ingest_sales():
+    """
+    Load a CSV or NDJSON batch of sales in one transaction. The Idempotency-Key header
+    identifies the batch, retrying the upload with the same key does not insert it again.
+    """
+    idempotency_key = request.headers.get("Idempotency-Key", "").strip()
+    if not idempotency_key or len(idempotency_key) > 255:
+        return jsonify({"error": "Idempotency-Key header of 1-255 characters is required"}), 400
+
+    batch_format = request.args.get("format") or CONTENT_TYPE_FORMATS.get(request.mimetype)
+    if batch_format not in INGEST_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(INGEST_FORMATS)}"}), 400
+
+    content = request.get_data()
+    try:
+        frame = parse_sales_batch(content, batch_format)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        prices = {pid: product["price"] for pid, product in get_product_dimension().items()}
+        rows, errors = validate_sales_batch(frame, prices)
+        if errors:
+            return jsonify({"error": "The batch contains invalid rows", "errors": errors}), 400
+
+        result = ingest_sales_batch(rows, idempotency_key, batch_checksum(content))
+
+    except IdempotencyKeyConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify(result), 200 if result["duplicate"] else 201
+
+
+@app.post("/api/sales/record")
+@login_required
+def record_sales_route():
+    """
+    Record live sales: the sales are inserted and the inventory, history and counter
+    balance are updated in the same transaction.
+    """
+    data = request.get_json(silent=True) or {}
+    sales = data.get("sales")
+    if not isinstance(sales, list) or not sales or not all(isinstance(s, dict) for s in sales):
+        return jsonify({"error": "sales must be a non-empty list of objects"}), 400
+
+    frame = pd.DataFrame(sales)
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame.columns]
+    if missing:
+        return jsonify({"error": f"Missing columns: {', '.join(missing)}"}), 400
+
+    try:
+        prices = {pid: product["price"] for pid, product in get_product_dimension().items()}
+        rows, errors = validate_sales_batch(frame, prices)
+        if errors:
+            return jsonify({"error": "The batch contains invalid rows", "errors": errors}), 400
+
+        result = record_sales(rows)
+
+    except InsufficientInventory as e:
+        return jsonify({"error": str(e), "shortages": e.shortages}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify(result), 201
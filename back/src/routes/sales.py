@@ -3,13 +3,56 @@ from datetime import datetime, timedelta
 
 from flask import Flask, jsonify, request
 
-from ..database.sales import fetch_sales_data
+from ..database.sales import (
+    TIME_BUCKET_STEPS,
+    fetch_sales_data,
+    fetch_sales_data_ranges,
+    query_sales_changes,
+    query_time_buckets,
+)
 from ..extensions import db
 from ..index import app
+from ..utils.downsample import DOWNSAMPLE_METHODS, downsample_indices
+from ..utils.http_cache import conditional_on
+
+MAX_RANGES = 20
+MAX_BUCKETS = 5000
+# Shortest length of each bucket in days, used to bound the size of a time series response
+BUCKET_DAYS = {"hour": 1 / 24, "day": 1, "week": 7, "month": 28, "quarter": 89, "year": 365}
+
+
+def parse_ranges(values):
+    """
+    Parse repeated range=name:start_date:end_date arguments into {name: (start, end)}.
+    Raises ValueError on a malformed, duplicate or reversed range.
+    """
+    if len(values) > MAX_RANGES:
+        raise ValueError(f"At most {MAX_RANGES} ranges can be requested at once")
+
+    ranges = {}
+    for value in values:
+        try:
+            name, start_date, end_date = value.rsplit(":", 2)
+            start = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        except ValueError as e:
+            raise ValueError(f"Invalid range '{value}', expected name:YYYY-MM-DD:YYYY-MM-DD") from e
+
+        if not name or name in ranges:
+            raise ValueError(f"Range names must be unique and non-empty: '{value}'")
+        if end < start:
+            raise ValueError(f"Range '{name}' ends before it starts")
+        ranges[name] = (start, end)
+    return ranges
 
 
 @app.get("/api/sales-data")
+@conditional_on("sales")
 def get_sales_data():
+    range_args = request.args.getlist("range")
+    if range_args:
+        return get_sales_data_ranges(range_args)
+
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
 
@@ -29,3 +72,117 @@ def get_sales_data():
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e), "revenue": 0, "sales": 0, "transactions": 0}), 500
+
+
+def get_sales_data_ranges(range_args):
+    try:
+        ranges = parse_ranges(range_args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        return jsonify({"ranges": fetch_sales_data_ranges(ranges)})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e), "ranges": {}}), 500
+
+
+@app.get("/api/sales-timeseries")
+@conditional_on("sales", "customers")
+def get_sales_timeseries():
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    granularity = request.args.get("granularity", "day")
+
+    if not start_date or not end_date:
+        return jsonify({"error": "start_date and end_date are required"}), 400
+    if granularity not in TIME_BUCKET_STEPS:
+        return jsonify({"error": f"granularity must be one of {', '.join(TIME_BUCKET_STEPS)}"}), 400
+
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "start_date and end_date must be YYYY-MM-DD"}), 400
+
+    if end < start:
+        return jsonify({"error": "end_date is before start_date"}), 400
+    if ((end - start).days + 1) / BUCKET_DAYS[granularity] > MAX_BUCKETS:
+        return jsonify({"error": f"More than {MAX_BUCKETS} buckets requested"}), 400
+
+    points = request.args.get("points")
+    method = request.args.get("method", "lttb")
+    if points is not None:
+        if not points.isdigit() or int(points) < 3:
+            return jsonify({"error": "points must be an integer of at least 3"}), 400
+        points = int(points)
+    if method not in DOWNSAMPLE_METHODS:
+        return jsonify({"error": f"method must be one of {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+
+    try:
+        rows = query_time_buckets(start, end, granularity)
+        if points is not None:
+            # Whole buckets are kept, picked by the shape of the revenue series
+            rows = [
+                rows[i] for i in downsample_indices([row.revenue for row in rows], points, method)
+            ]
+        return jsonify(
+            {
+                "granularity": granularity,
+                "buckets": [
+                    {
+                        "bucket": row.bucket.isoformat(),
+                        "quantity": int(row.quantity),
+                        "revenue": round(float(row.revenue), 2),
+                        "transactions": int(row.transactions),
+                        "customers": int(row.customers),
+                    }
+                    for row in rows
+                ],
+            }
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e), "buckets": []}), 500
+
+
+@app.get("/api/sales-changes")
+@conditional_on("sales_rollup")
+def get_sales_changes():
+    """
+    Delta sync of the sales series: the buckets changed since the cursor of the previous call.
+    """
+    granularity = request.args.get("granularity", "day")
+    try:
+        since = int(request.args.get("since", 0))
+    except ValueError:
+        return jsonify({"error": "since must be an integer cursor"}), 400
+    if since < 0:
+        return jsonify({"error": "since must be an integer cursor"}), 400
+
+    try:
+        changes = query_sales_changes(since, granularity)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify(
+        {
+            "cursor": changes["cursor"],
+            "reset": changes["reset"],
+            "granularity": granularity,
+            "buckets": [
+                {
+                    "bucket": row.bucket.isoformat(),
+                    "quantity": int(row.quantity),
+                    "revenue": round(float(row.revenue), 2),
+                    "transactions": int(row.transactions),
+                }
+                for row in changes["buckets"]
+            ],
+        }
+    )
@@ -0,0 +1,24 @@
+from flask import jsonify
+from flask_login import login_required
+
+from ..index import app
+from ..services.sql_plan_cache import clear_plans, plan_cache_stats, plan_summaries
+
+
+@app.get("/api/sql-plans")
+@login_required
+def get_sql_plans():
+    """
+    Hit/miss counters of the SQL agent plan cache and the hits of each cached plan.
+    The cache is shared by all users, so their questions and SQL are not returned.
+    The cache lives in each worker process, so this shows the worker serving the request.
+    """
+    return jsonify({"stats": plan_cache_stats(), "plans": plan_summaries()})
+
+
+@app.delete("/api/sql-plans")
+@login_required
+def delete_sql_plans():
+    """Drop every cached plan of this worker and reset its counters."""
+    clear_plans()
+    return jsonify({"stats": plan_cache_stats()})
@@ -0,0 +1,119 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from io import BytesIO
+
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .. import config
+from ..database.data_version import data_version_key
+from ..database.sales import query_daily_revenue
+from ..utils.downsample import lttb_indices
+
+RENDER_WORKERS = config.get("charts.render_workers", 2)
+CACHE_SIZE = config.get("charts.cache_size", 128)
+RENDER_TIMEOUT = config.get("charts.render_timeout_seconds", 30)
+MAX_POINTS = config.get("charts.max_points", 500)
+GRAPH_TYPES = ("line", "bar")
+
+# Figures are drawn with the object oriented API on their own Agg canvas, never through
+# pyplot's global state, so renders can run in parallel. The pool bounds how many run at once.
+_render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="chart-render")
+
+# (spec, data version) -> Future of the PNG bytes, or of None when there is no data.
+# A render in progress is shared by every request asking for the same chart.
+_charts = OrderedDict()
+_charts_lock = threading.Lock()
+
+
+def month_window(month: str):
+    """Return the first and last day of a month given as YYYY-MM. Raises ValueError if invalid."""
+    try:
+        period = pd.Period(month, freq="M")
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid month '{month}', expected YYYY-MM") from e
+    return (
+        date(period.year, period.month, 1),
+        date(period.year, period.month, period.days_in_month),
+    )
+
+
+def render_revenue_chart(dates, revenue, average, graph_type: str = "line") -> bytes:
+    """Render daily revenue and its 7 day average as a PNG."""
+    figure = Figure(figsize=(8, 6), dpi=100)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+
+    if graph_type == "bar":
+        axes.bar(dates, revenue)
+    else:
+        axes.plot(dates, revenue)
+
+    axes.plot(dates, average, linestyle="--")
+    axes.set_xlabel("Date")
+    axes.set_ylabel("Revenue")
+    axes.tick_params(axis="x", labelrotation=45)
+
+    buffer = BytesIO()
+    figure.savefig(buffer, format="png", bbox_inches="tight", dpi=100)
+    return buffer.getvalue()
+
+
+def _render(start, end, graph_type: str, points: int):
+    # Runs in the request thread, which has the database session; only drawing goes to the pool
+    rows = query_daily_revenue(start, end)
+    if not any(row.has_sales for row in rows):
+        return None
+
+    # Long ranges are reduced to the points that keep the shape of the revenue line
+    keep = lttb_indices([float(row.revenue) for row in rows], points)
+    dates = [rows[i].date for i in keep]
+    revenue = [float(rows[i].revenue) for i in keep]
+    average = [float(rows[i].average_7d) for i in keep]
+    return _render_pool.submit(render_revenue_chart, dates, revenue, average, graph_type).result(
+        timeout=RENDER_TIMEOUT
+    )
+
+
+def revenue_chart_png(start, end, graph_type: str = "line", points: int = MAX_POINTS):
+    """
+    Return the daily revenue chart of start..end as PNG bytes, or None if there are no sales.
+    Only the requested days are aggregated in SQL, and at most points days are drawn.
+    Charts are cached per process by (chart spec, sales data version),
+    so a repeated request costs one version lookup.
+    """
+    if graph_type not in GRAPH_TYPES:
+        raise ValueError(f"graph_type must be one of {', '.join(GRAPH_TYPES)}")
+    if end < start:
+        raise ValueError("The chart ends before it starts")
+
+    spec = ("revenue", start.isoformat(), end.isoformat(), graph_type, points)
+    key = (spec, data_version_key(["sales"]))
+    with _charts_lock:
+        chart = _charts.get(key)
+        owner = chart is None
+        if owner:
+            chart = _charts[key] = Future()
+            while len(_charts) > CACHE_SIZE:
+                _charts.popitem(last=False)
+        else:
+            _charts.move_to_end(key)
+
+    if owner:
+        try:
+            chart.set_result(_render(start, end, graph_type, points))
+        except Exception as e:
+            with _charts_lock:
+                if _charts.get(key) is chart:
+                    del _charts[key]
+            chart.set_exception(e)
+
+    return chart.result(timeout=RENDER_TIMEOUT)
+
+
+def clear_chart_cache():
+    with _charts_lock:
+        _charts.clear()
@@ -7,6 +7,7 @@ from dotenv import load_dotenv
 from langchain.agents import create_agent
 from langchain.tools import ToolRuntime, tool
 
+from ..database.product_dimension import get_product_dimension
 from .sales_agent import sales_agent_tool
 from .sql_agent import sql_agent_tool
 from .storage_agent import storage_agent_tool
@@ -171,6 +172,8 @@ class CounterfactualAgent:
             if "error" in real_data_result:
                 return real_data_result
 
+            self._add_product_names(real_data_result)
+
             self.data_manager.cache_real_data(
                 f"{analysis_type}_{hash(base_query)}", real_data_result
             )
@@ -218,6 +221,31 @@ class CounterfactualAgent:
         except Exception as e:
             return {"error": f"Failed to get base data: {str(e)}"}
 
+    def _add_product_names(self, data: Dict[str, Any]) -> None:
+        """Name the items that only carry a product_id, using the cached product dimension."""
+        items = data.get("data") if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            return
+        unnamed = [
+            item
+            for item in items
+            if isinstance(item, dict) and "product_id" in item and "product_name" not in item
+        ]
+        if not unnamed:
+            return
+
+        try:
+            products = get_product_dimension()
+        except Exception:
+            return
+        for item in unnamed:
+            try:
+                product = products.get(int(item["product_id"]))
+            except (TypeError, ValueError):
+                continue
+            if product:
+                item["product_name"] = product["name"]
+
     def _run_analysis_on_counterfactual(
         self, cf_data: Dict[str, Any], analysis_type: str
     ) -> Dict[str, Any]:
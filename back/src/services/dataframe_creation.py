@@ -12,6 +12,7 @@ from ..utils.csv_to_pd import csv_to_pd  # temp
 from ..utils.logger import logger
 from .mcp_client import mcp_agent_tool
 from .sql_agent import sql_agent_tool
+from .sql_result_store import column_values, is_result_handle, require_result
 
 
 @tool
@@ -25,8 +26,8 @@ def create_dataframe_tool(
     Create a DataFrame by combining sales data and weather data, then save as CSV.
 
     Args:
-        sales_data: JSON string with database data from sql agent
-        customer_data: JSON string with customer data from sql agent
+        sales_data: JSON string with database data from sql agent, or the handle of its result
+        customer_data: JSON string with customer data from sql agent, or the handle of its result
         weather_data: JSON string with weather data from MCP agent
         runtime: ToolRuntime object for accessing tool call metadata.
 
@@ -47,6 +48,11 @@ def create_dataframe_tool(
                 return None
             if isinstance(parameter_data, (dict, list)):
                 return parameter_data
+            if is_result_handle(parameter_data):
+                # The full result of an SQL agent query, without its rows passing the model.
+                # The datasets are joined on date, so the result needs that column.
+                frame = require_result(parameter_data.strip(), columns=("date",))
+                return column_values(frame)
             if isinstance(parameter_data, str):
                 parameter_data = parameter_data.strip()
                 if not parameter_data:
@@ -144,6 +150,8 @@ base_prompt = """
 
         Step 1. Use the SQL agent to retrieve the internal data, i.e. product prices, customer amounts and total sales.
         Ask the SQL Agent to return data in JSON, if the returned data is not JSON convert it yourself.
+        If the SQL Agent returns a result handle (sqlres_...), pass the handle as sales_data or
+        customer_data to the create dataframe tool instead of the rows.
 
         The JSON should be formatted as follows: 
         For sales data:
@@ -1,15 +1,15 @@
 import base64
 from datetime import datetime, timedelta
-from io import BytesIO
 
-import matplotlib.pyplot as plt
 import pandas as pd
 from langchain.agents import create_agent
 from langchain.messages import HumanMessage
 from langchain.tools import tool
 
-from ..extensions import db
-from ..models.models import Sale
+from ..database.product_dimension import resolve_product_id
+from ..database.sales import query_sales_report
+from ..database.sales_frames import empty_sales_frame, load_sales_frame
+from .chart_service import month_window, revenue_chart_png
 from .sql_agent import sql_agent_tool
 
 
@@ -29,9 +29,12 @@ class SalesAgent:
 
         if task == "create_graph":
             month = request.get("month")
-            if not month:
+            start_date = request.get("start_date")
+            if not month and not start_date:
                 raise ValueError("Month parameter is required for creating sales graph.")
-            return self.tool.create_sales_graph(month)
+            return self.tool.create_sales_graph(
+                month, start_date=start_date, end_date=request.get("end_date")
+            )
         return f"Unknown task: {task}"
 
 
@@ -45,34 +48,37 @@ class SalesTool:
         """
         Fetch only the required subset of sales data from the database.
         """
-        query = db.session.query(
-            Sale.date.label("date"),
-            Sale.product_id.label("product"),
-            Sale.quantity.label("items_sold"),
-            Sale.amount.label("revenue"),
-        )
-
         if start_date:
             start_date = pd.to_datetime(start_date)
-            query = query.filter(Sale.date >= start_date)
 
         if end_date:
             end_date = pd.to_datetime(end_date) + timedelta(days=1) - timedelta(seconds=1)
-            query = query.filter(Sale.date <= end_date)
-
-        if product:
-            query = query.filter(Sale.product_id == product)
 
-        rows = query.all()
-
-        if not rows:
-            return pd.DataFrame(columns=["date", "product", "items_sold", "revenue"])
+        # Products may be named, they are resolved from the cached product dimension
+        product_id = resolve_product_id(product) if product else None
+        if product and product_id is None:
+            frame = empty_sales_frame()
+        else:
+            frame = load_sales_frame(start_date, end_date, product_id=product_id)
 
-        df = pd.DataFrame([r._asdict() for r in rows])
-        df["date"] = pd.to_datetime(df["date"])
+        df = frame.rename(
+            columns={"product_id": "product", "quantity": "items_sold", "amount": "revenue"}
+        )[["date", "product", "items_sold", "revenue"]]
         df["month"] = df["date"].dt.to_period("M")
         return df
 
+    @staticmethod
+    def _format_period(period: datetime, group_by: str) -> str:
+        """Format a period start like the pandas Period it replaces, e.g. '2025-09'."""
+        if group_by == "year":
+            return period.strftime("%Y")
+        if group_by == "month":
+            return period.strftime("%Y-%m")
+        if group_by == "week":
+            week_end = period + timedelta(days=6)
+            return f"{period:%Y-%m-%d}/{week_end:%Y-%m-%d}"
+        return period.strftime("%Y-%m-%d")
+
     def generate_sales_report(
         self,
         start_date: str | None = None,
@@ -83,44 +89,26 @@ class SalesTool:
         if start_date and not end_date:
             end_date = start_date
 
-        sales_data = self._fetch_sales_data(start_date, end_date)
-        if sales_data.empty:
+        # The periods and best sellers are computed in the database,
+        # only one row per period is transferred
+        rows = query_sales_report(
+            pd.to_datetime(start_date).date() if start_date else None,
+            pd.to_datetime(end_date).date() if end_date else None,
+            group_by,
+        )
+        if not rows:
             return {"status": "error", "message": "No sales data for requested range"}
 
-        # Ensure datetimes
-        sales_data["date"] = pd.to_datetime(sales_data["date"], errors="coerce")
-
-        # Determine grouping
-        if group_by == "year":
-            sales_data["period"] = sales_data["date"].dt.to_period("Y")
-        elif group_by == "month":
-            sales_data["period"] = sales_data["date"].dt.to_period("M")
-        elif group_by == "week":
-            sales_data["period"] = sales_data["date"].dt.to_period("W")
-        elif group_by == "day":
-            sales_data["period"] = sales_data["date"].dt.date
-        else:
-            raise ValueError("Invalid group_by value (must be 'year', 'month', 'week', or 'day')")
-
-        report = []
-
-        for period, group in sales_data.groupby("period"):
-            total_revenue = group["revenue"].sum()
-            total_items = group["items_sold"].sum()
-
-            best_product_series = group.groupby("product")["items_sold"].sum()
-            best_product = best_product_series.idxmax()
-            best_units = best_product_series.max()
-
-            report.append(
-                {
-                    "period": str(period),
-                    "total_revenue": float(total_revenue),
-                    "total_items_sold": int(total_items),
-                    "best_selling_product": best_product,
-                    "best_selling_product_units": int(best_units),
-                }
-            )
+        report = [
+            {
+                "period": self._format_period(row.period, group_by),
+                "total_revenue": float(row.total_revenue),
+                "total_items_sold": int(row.total_items_sold),
+                "best_selling_product": row.best_selling_product,
+                "best_selling_product_units": int(row.best_selling_product_units),
+            }
+            for row in rows
+        ]
 
         return {
             "status": "success",
@@ -132,38 +120,28 @@ class SalesTool:
             },
         }
 
-    def create_sales_graph(self, month: str, graph_type: str = "line"):
-        sales_data = self._fetch_sales_data(month)
-        if sales_data.empty:
-            return {"status": "error", "message": f"No sales data for {month}"}
-
-        aggregated_data = (
-            sales_data.groupby("date").agg(total_revenue=("revenue", "sum")).reset_index()
-        )
-        aggregated_data["7_day_avg"] = aggregated_data["total_revenue"].rolling(7).mean()
-
-        plt.figure(figsize=(8, 6), dpi=100)
-
-        if graph_type == "bar":
-            plt.bar(aggregated_data["date"], aggregated_data["total_revenue"])
+    def create_sales_graph(
+        self,
+        month: str | None = None,
+        graph_type: str = "line",
+        start_date: str | None = None,
+        end_date: str | None = None,
+    ):
+        if start_date:
+            start = pd.to_datetime(start_date).date()
+            end = pd.to_datetime(end_date).date() if end_date else datetime.today().date()
+            label = f"{start} - {end}"
         else:
-            plt.plot(aggregated_data["date"], aggregated_data["total_revenue"])
+            start, end = month_window(month)
+            label = month
 
-        plt.plot(aggregated_data["date"], aggregated_data["7_day_avg"], linestyle="--")
-        plt.xlabel("Date")
-        plt.ylabel("Revenue")
-        plt.xticks(rotation=45)
-
-        buffer = BytesIO()
-        plt.savefig(buffer, format="png", bbox_inches="tight", dpi=100)
-        plt.close()
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.read()).decode("utf-8")
-        buffer.close()
+        image = revenue_chart_png(start, end, graph_type)
+        if image is None:
+            return {"status": "error", "message": f"No sales data for {label}"}
 
         return {
             "type": "image",
-            "data": image_base64,
+            "data": base64.b64encode(image).decode("utf-8"),
         }
 
 
@@ -221,12 +199,22 @@ def generate_sales_report(
 
 
 @tool
-def create_sales_graph(month: str) -> dict:
+def create_sales_graph(
+    month: str | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> dict:
     """
-    Returns base64-encoded image data of a graph that visualizes daily revenue for a specific month.
+    Returns base64-encoded image data of a graph that visualizes daily revenue for a specific month
+    (YYYY-MM), or for a date range of any length given as start_date and end_date (YYYY-MM-DD).
     The return value should be formatted as a message content block for image display.
     """
-    request = {"task": "create_graph", "month": month}
+    request = {
+        "task": "create_graph",
+        "month": month,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
     result = sales_agent_instance.handle_request(request)
     return result
 
@@ -0,0 +1,177 @@
+import threading
+import time
+
+from sqlalchemy import bindparam, text
+
+from .. import config
+
+# Tables the SQL agent can see. Application tables such as chat and users are left out.
+SCHEMA_TABLES = config.get(
+    "sql_agent.schema_tables",
+    [
+        "products",
+        "sales",
+        "sales_daily_rollup",
+        "sales_daily_totals",
+        "inventory",
+        "inventory_snapshots",
+        "history",
+        "customers",
+        "counter",
+    ],
+)
+# How long a digest is used before the schema fingerprint is checked again
+SCHEMA_CHECK_SECONDS = config.get("sql_agent.schema_check_seconds", 60)
+
+# Hints for tables whose use cannot be read off their columns
+TABLE_NOTES = {
+    "sales": "one row per sale, partitioned by month on date",
+    "sales_daily_rollup": (
+        "sales totals per product and day, a basket counts as a transaction of each product"
+    ),
+    "sales_daily_totals": "sales totals per day, prefer it over sales for totals over products",
+    "inventory": "current stock per product",
+    "inventory_snapshots": "stock per product at taken_at",
+    "history": "inventory events, amount is the signed change of stock",
+    "customers": "number of customers per day",
+    "counter": "till balance, a single row",
+}
+TYPE_NAMES = {
+    "character varying": "varchar",
+    "character": "char",
+    "timestamp without time zone": "timestamp",
+    "timestamp with time zone": "timestamptz",
+    "double precision": "float8",
+    "integer": "int",
+    "boolean": "bool",
+}
+
+FINGERPRINT_SQL = """
+    SELECT md5(
+        (
+            SELECT string_agg(
+                table_name || '.' || column_name || ' ' || data_type, ','
+                ORDER BY table_name, ordinal_position
+            )
+            FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name IN :tables
+        ) || '|' || (
+            SELECT COALESCE(string_agg(constraint_name, ',' ORDER BY constraint_name), '')
+            FROM information_schema.table_constraints
+            WHERE table_schema = current_schema() AND table_name IN :tables
+        )
+    );
+"""
+COLUMNS_SQL = """
+    SELECT table_name, column_name, data_type
+    FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name IN :tables
+    ORDER BY table_name, ordinal_position;
+"""
+# The foreign key of a partitioned table is repeated for every partition, hence DISTINCT
+KEYS_SQL = """
+    SELECT DISTINCT tc.table_name, kcu.column_name, tc.constraint_type,
+        ccu.table_name AS ref_table, ccu.column_name AS ref_column
+    FROM information_schema.table_constraints tc
+    JOIN information_schema.key_column_usage kcu
+        ON kcu.constraint_schema = tc.constraint_schema
+        AND kcu.constraint_name = tc.constraint_name
+        AND kcu.table_name = tc.table_name
+    LEFT JOIN information_schema.constraint_column_usage ccu
+        ON tc.constraint_type = 'FOREIGN KEY'
+        AND ccu.constraint_schema = tc.constraint_schema
+        AND ccu.constraint_name = tc.constraint_name
+    WHERE tc.table_schema = current_schema() AND tc.table_name IN :tables
+        AND tc.constraint_type IN ('PRIMARY KEY', 'FOREIGN KEY');
+"""
+
+# Engine URL -> {"fingerprint", "checked_at", "text", "tables"}
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def _query(connection, sql: str, tables):
+    statement = text(sql).bindparams(bindparam("tables", expanding=True))
+    return connection.execute(statement, {"tables": list(tables)})
+
+
+def format_schema_digest(columns, keys) -> str:
+    """
+    One line per table with its columns, short type names, primary keys and foreign key hints:
+    sales_daily_rollup(day date PK, product_id int PK -> products.id, ...) -- note
+    Args:
+        columns: rows of table_name, column_name, data_type in column order
+        keys: rows of table_name, column_name, constraint_type, ref_table, ref_column
+    """
+    primary = {
+        (row.table_name, row.column_name) for row in keys if row.constraint_type == "PRIMARY KEY"
+    }
+    references = {
+        (row.table_name, row.column_name): f"{row.ref_table}.{row.ref_column}"
+        for row in keys
+        if row.constraint_type == "FOREIGN KEY" and row.ref_table
+    }
+
+    tables = {}
+    for row in columns:
+        column = f"{row.column_name} {TYPE_NAMES.get(row.data_type, row.data_type)}"
+        if (row.table_name, row.column_name) in primary:
+            column += " PK"
+        if (row.table_name, row.column_name) in references:
+            column += f" -> {references[(row.table_name, row.column_name)]}"
+        tables.setdefault(row.table_name, []).append(column)
+
+    lines = []
+    for table in sorted(tables, key=lambda name: (SCHEMA_TABLES + [name]).index(name)):
+        line = f"{table}({', '.join(tables[table])})"
+        if table in TABLE_NOTES:
+            line += f" -- {TABLE_NOTES[table]}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def get_schema_digest(engine, max_age: float = SCHEMA_CHECK_SECONDS) -> dict:
+    """
+    Compact summary of the allow-listed tables for the SQL agent, cached per process.
+    The digest is rebuilt only when the fingerprint of their columns and constraints in
+    information_schema changes, i.e. after a migration; the fingerprint is checked at most
+    every max_age seconds.
+    Args:
+        engine: SQLAlchemy engine of the database the agent queries
+    Returns:
+        dict: {"fingerprint": str, "text": str, "tables": {table: [column names]}}
+    """
+    key = str(engine.url)
+    now = time.monotonic()
+    with _digests_lock:
+        digest = _digests.get(key)
+        if digest is not None and now - digest["checked_at"] < max_age:
+            return digest
+
+    with engine.connect() as connection:
+        fingerprint = _query(connection, FINGERPRINT_SQL, SCHEMA_TABLES).scalar()
+        if digest is not None and digest["fingerprint"] == fingerprint:
+            with _digests_lock:
+                digest["checked_at"] = now
+            return digest
+
+        columns = _query(connection, COLUMNS_SQL, SCHEMA_TABLES).all()
+        keys = _query(connection, KEYS_SQL, SCHEMA_TABLES).all()
+
+    tables = {}
+    for row in columns:
+        tables.setdefault(row.table_name, []).append(row.column_name)
+    digest = {
+        "fingerprint": fingerprint,
+        "checked_at": now,
+        "text": format_schema_digest(columns, keys),
+        "tables": tables,
+    }
+    with _digests_lock:
+        _digests[key] = digest
+    return digest
+
+
+def clear_schema_digests():
+    with _digests_lock:
+        _digests.clear()
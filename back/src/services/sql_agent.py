@@ -1,22 +1,32 @@
 # pylint: disable=E1101
 import os
+import uuid
 from functools import lru_cache
 from typing import Any, Dict, Literal
 
 from dotenv import load_dotenv
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 from langchain_community.utilities import SQLDatabase
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from langchain_core.tools import StructuredTool
 from langchain_openai import ChatOpenAI
 from langgraph.graph import END, START, MessagesState, StateGraph
 from langgraph.prebuilt import ToolNode
 
 from ..utils.logger import logger
+from .schema_digest import get_schema_digest
+from .sql_plan_cache import evict_plan, lookup_plan, store_plan
+from .sql_result_cache import CachedQuerySQLDatabaseTool
+from .sql_validator import validate_sql
 
 load_dotenv()
 
 SELECTED_MODEL = "gpt-4o-mini"
+# Tool calls replayed from the plan cache have ids with this prefix
+PLAN_CALL_PREFIX = "plan-cache-"
+# Names marking query messages that passed static validation or the LLM check
+VALIDATED = "validate_query"
+CHECKED = "check_query"
 
 
 def _get_env_or_raise(name: str) -> str:
@@ -26,28 +36,48 @@ def _get_env_or_raise(name: str) -> str:
     return val
 
 
-_schema_cache: Dict[str, str] = {}
+def _schema_digest() -> dict:
+    return get_schema_digest(_make_toolkit().db._engine)
 
 
-def get_cached_schema(state: MessagesState) -> Dict[str, Any]:  # pragma: no cover
-    """Get schema from cache or fetch if not cached."""
-    toolkit = _make_toolkit()
+def get_cached_schema(_state: MessagesState) -> Dict[str, Any]:
+    """Describe the tables the agent may query with the digest, rebuilt only after migrations."""
+    digest = _schema_digest()
+    return {
+        "messages": [
+            AIMessage(
+                "Available tables with their columns and types"
+                " (PK primary key, -> foreign key):\n" + digest["text"]
+            )
+        ]
+    }
 
-    cache_key = _get_env_or_raise("DATABASE_URL")
 
-    if cache_key in _schema_cache:
-        return {"messages": [AIMessage(_schema_cache[cache_key])]}
+def _query_tool(toolkit) -> CachedQuerySQLDatabaseTool:
+    """
+    The tool the run_query node executes: the toolkit's sql_db_query with its results cached
+    and shaped, so the model is bound to the description of what it actually gets back.
+    """
+    return CachedQuerySQLDatabaseTool(db=toolkit.db)
 
-    list_tables_tool = _get_tool(toolkit.get_tools(), "sql_db_list_tables")
-    get_schema_tool = _get_tool(toolkit.get_tools(), "sql_db_schema")
 
-    tables = list_tables_tool.invoke({})
-    schema = get_schema_tool.invoke({"table_names": tables})
+def _schema_fingerprint() -> str:
+    return _schema_digest()["fingerprint"]
+
+
+def _validate(query: str):
+    return validate_sql(query, _schema_digest()["tables"] or None)
+
 
-    combined = f"Available tables: {tables}\n\nSchema:\n{schema}"
-    _schema_cache[cache_key] = combined
+def _question(state: MessagesState) -> str | None:
+    for message in state["messages"]:
+        if getattr(message, "type", None) == "human":
+            return message.content
+    return None
 
-    return {"messages": [AIMessage(combined)]}
+
+def _is_error(message) -> bool:
+    return "error" in str(message.content).lower()
 
 
 @lru_cache(maxsize=1)
@@ -83,9 +113,52 @@ def call_get_schema(state: MessagesState) -> Dict[str, Any]:
     return {"messages": [response]}
 
 
+def lookup_cached_plan(state: MessagesState) -> Dict[str, Any]:
+    """Replay the SQL of an earlier question of the same shape as a query tool call."""
+    question = _question(state)
+    sql = lookup_plan(question, _schema_fingerprint()) if question else None
+    if sql is None:
+        return {"messages": []}
+
+    tool_call = {
+        "name": "sql_db_query",
+        "args": {"query": sql},
+        "id": f"{PLAN_CALL_PREFIX}{uuid.uuid4().hex}",
+        "type": "tool_call",
+    }
+    return {"messages": [AIMessage(content="", tool_calls=[tool_call])]}
+
+
+def remember_plan(state: MessagesState) -> Dict[str, Any]:
+    """Store the SQL of a successful query, so the next question of this shape skips the LLM."""
+    question = _question(state)
+    last_message = state["messages"][-1] if state["messages"] else None
+    if not question or getattr(last_message, "type", None) != "tool" or _is_error(last_message):
+        return {"messages": []}
+
+    call_id = getattr(last_message, "tool_call_id", "")
+    if call_id.startswith(PLAN_CALL_PREFIX):
+        return {"messages": []}
+    for message in reversed(state["messages"]):
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            if tool_call.get("id") == call_id:
+                store_plan(question, _schema_fingerprint(), tool_call["args"]["query"])
+                return {"messages": []}
+    return {"messages": []}
+
+
 def generate_query(state: MessagesState) -> Dict[str, Any]:
+    # A cached plan that failed, e.g. after a migration, is generated again and replaced
+    last_message = state["messages"][-1] if state["messages"] else None
+    if (
+        getattr(last_message, "type", None) == "tool"
+        and str(getattr(last_message, "tool_call_id", "")).startswith(PLAN_CALL_PREFIX)
+        and _is_error(last_message)
+    ):
+        evict_plan(_question(state), _schema_fingerprint())
+
     toolkit = _make_toolkit()
-    run_query_tool = _get_tool(toolkit.get_tools(), "sql_db_query")
+    run_query_tool = _query_tool(toolkit)
 
     sql_db = toolkit.db
     generate_query_system_prompt = f"""
@@ -102,6 +175,11 @@ def generate_query(state: MessagesState) -> Dict[str, Any]:
     
     ALWAYS include a date column in your queries.
 
+    The sales table is partitioned by month on its date column. Filter it with plain
+    ranges on the column itself, e.g. date >= '2025-01-01' AND date < '2025-02-01',
+    and never wrap it in a function (date_trunc, EXTRACT, CAST) inside WHERE,
+    so that only the months in the range are read.
+
     DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the database.
     DO NOT come up with any data, only return real data present in the database.
 
@@ -110,7 +188,8 @@ def generate_query(state: MessagesState) -> Dict[str, Any]:
     """.strip()
 
     system_message = {"role": "system", "content": generate_query_system_prompt}
-    llm_with_tools = _make_llm().bind_tools([run_query_tool])
+    # One query per turn: cached plans, the check and the retry count all assume a single call
+    llm_with_tools = _make_llm().bind_tools([run_query_tool], parallel_tool_calls=False)
     response = llm_with_tools.invoke([system_message] + state["messages"])
     logger.debug("sql response:", response)
     return {"messages": [response]}
@@ -118,7 +197,7 @@ def generate_query(state: MessagesState) -> Dict[str, Any]:
 
 def check_query(state: MessagesState) -> Dict[str, Any]:
     toolkit = _make_toolkit()
-    run_query_tool = _get_tool(toolkit.get_tools(), "sql_db_query")
+    run_query_tool = _query_tool(toolkit)
 
     sql_db = toolkit.db
     check_query_system_prompt = f"""
@@ -141,16 +220,63 @@ def check_query(state: MessagesState) -> Dict[str, Any]:
     """.strip()
 
     tool_call = state["messages"][-1].tool_calls[0]
-    user_message = {"role": "user", "content": tool_call["args"]["query"]}
-    llm_with_tools = _make_llm().bind_tools([run_query_tool], tool_choice="any")
+    _, problems = _validate(tool_call["args"]["query"])
+    content = tool_call["args"]["query"]
+    if problems:
+        content += "\n\nProblems found in this query:\n" + "\n".join(
+            f"- {problem}" for problem in problems
+        )
+    user_message = {"role": "user", "content": content}
+    llm_with_tools = _make_llm().bind_tools(
+        [run_query_tool], tool_choice="any", parallel_tool_calls=False
+    )
     response = llm_with_tools.invoke(
         [{"role": "system", "content": check_query_system_prompt}, user_message]
     )
 
     response.id = state["messages"][-1].id
+    response.name = CHECKED
     return {"messages": [response]}
 
 
+def validate_query(state: MessagesState) -> Dict[str, Any]:
+    """
+    Check the generated query statically, without an LLM call, and run it with the safe
+    rewrites of validate_sql applied. A query that fails goes to the LLM check once, and is
+    answered with an error if it still fails after that, so that it is generated again.
+    Only the first query of a turn is run, should the model make several calls anyway.
+    """
+    last_message = state["messages"][-1]
+    validated = [
+        (tool_call, *_validate(tool_call["args"]["query"]))
+        for tool_call in last_message.tool_calls[:1]
+    ]
+    problems = [problem for _, _, call_problems in validated for problem in call_problems]
+
+    if not problems:
+        tool_calls = [
+            {**tool_call, "args": {**tool_call["args"], "query": sql}}
+            for tool_call, sql, _ in validated
+        ]
+        return {
+            "messages": [
+                last_message.model_copy(update={"tool_calls": tool_calls, "name": VALIDATED})
+            ]
+        }
+    if getattr(last_message, "name", None) != CHECKED:
+        return {"messages": []}
+
+    # Every tool call needs an answer before the model is called again
+    error = f"Error: query rejected before running: {'; '.join(problems)}"
+    logger.debug(error)
+    return {
+        "messages": [
+            ToolMessage(content=error, tool_call_id=tool_call["id"], name="sql_db_query")
+            for tool_call in last_message.tool_calls
+        ]
+    }
+
+
 def analyze_results(state: MessagesState) -> Dict[str, Any]:
     """Analysoi query-tulokset ja muodosta lopullinen vastaus."""
     llm = _make_llm()
@@ -161,6 +287,11 @@ def analyze_results(state: MessagesState) -> Dict[str, Any]:
     concise answer to the user's original question. Format the results in a
     readable way.
 
+    Query results are JSON with a handle to the full result. When a result is
+    truncated or its rows are needed as data, e.g. for a dataset, include the
+    handle in the answer as "result handle: <handle>" so that other tools can
+    fetch the full result.
+
     CRITICAL: Do NOT call any tools. Simply analyze the data you already have
     and provide the final answer.
     """
@@ -171,16 +302,36 @@ def analyze_results(state: MessagesState) -> Dict[str, Any]:
 
 def should_continue_after_generate(
     state: MessagesState,
-) -> Literal["check_query", "analyze_results"]:
+) -> Literal["validate_query", "analyze_results"]:
     """Decide if the query should be executed or if there are results to be analyzed."""
     last_message = state["messages"][-1]
 
     if getattr(last_message, "tool_calls", None):
-        return "check_query"
+        return "validate_query"
 
     return "analyze_results"
 
 
+def should_use_cached_plan(state: MessagesState) -> Literal["run_query", "generate_query"]:
+    """Run a cached plan directly, otherwise generate the query with the LLM."""
+    tool_calls = getattr(state["messages"][-1], "tool_calls", None) or []
+    if tool_calls and str(tool_calls[0].get("id", "")).startswith(PLAN_CALL_PREFIX):
+        return "run_query"
+    return "generate_query"
+
+
+def after_validate_query(
+    state: MessagesState,
+) -> Literal["run_query", "check_query", "generate_query", "analyze_results"]:
+    """Run a validated query, have a failing one checked, or retry after a rejection."""
+    last_message = state["messages"][-1]
+    if getattr(last_message, "type", None) == "tool":
+        return should_retry_query(state)
+    if getattr(last_message, "name", None) == VALIDATED:
+        return "run_query"
+    return "check_query"
+
+
 def should_retry_query(state: MessagesState) -> Literal["generate_query", "analyze_results"]:
     """Decide if the query should be retried or if we should continue to analysis."""
     query_count = sum(
@@ -198,7 +349,7 @@ def should_retry_query(state: MessagesState) -> Literal["generate_query", "analy
             last_tool_message = msg
             break
 
-    if last_tool_message and "error" in str(last_tool_message.content).lower():
+    if last_tool_message and _is_error(last_tool_message):
         return "generate_query"
 
     return "analyze_results"
@@ -211,32 +362,52 @@ def build_sql_agent_graph():  # pragma: no cover
     tools = toolkit.get_tools()
 
     get_schema_node = ToolNode([_get_tool(tools, "sql_db_schema")])
-    run_query_node = ToolNode([_get_tool(tools, "sql_db_query")])
+    run_query_node = ToolNode([_query_tool(toolkit)])
 
     builder = StateGraph(MessagesState)
     builder.add_node("get_cached_schema", get_cached_schema)
+    builder.add_node("lookup_cached_plan", lookup_cached_plan)
     builder.add_node("generate_query", generate_query)
+    builder.add_node("validate_query", validate_query)
     builder.add_node("check_query", check_query)
     builder.add_node("run_query", run_query_node)
+    builder.add_node("remember_plan", remember_plan)
     builder.add_node("analyze_results", analyze_results)
 
     builder.add_edge(START, "get_cached_schema")
-    builder.add_edge("get_cached_schema", "generate_query")
+    builder.add_edge("get_cached_schema", "lookup_cached_plan")
+
+    builder.add_conditional_edges(
+        "lookup_cached_plan",
+        should_use_cached_plan,
+        {"run_query": "run_query", "generate_query": "generate_query"},
+    )
 
     builder.add_conditional_edges(
         "generate_query",
         should_continue_after_generate,
-        {"check_query": "check_query", "analyze_results": "analyze_results"},
+        {"validate_query": "validate_query", "analyze_results": "analyze_results"},
     )
 
-    builder.add_edge("check_query", "run_query")
+    builder.add_conditional_edges(
+        "validate_query",
+        after_validate_query,
+        {
+            "run_query": "run_query",
+            "check_query": "check_query",
+            "generate_query": "generate_query",
+            "analyze_results": "remember_plan",
+        },
+    )
+    builder.add_edge("check_query", "validate_query")
 
     builder.add_conditional_edges(
         "run_query",
         should_retry_query,
-        {"generate_query": "generate_query", "analyze_results": "analyze_results"},
+        {"generate_query": "generate_query", "analyze_results": "remember_plan"},
     )
 
+    builder.add_edge("remember_plan", "analyze_results")
     builder.add_edge("analyze_results", END)
 
     return builder.compile()
@@ -0,0 +1,193 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+from .. import config
+
+PLAN_CACHE_SIZE = config.get("sql_agent.plan_cache_size", 256)
+
+# Literals lifted out of questions, most specific first. Their values are only ever digits
+# and dashes, so they can be written into a SQL template without quoting issues.
+PARAMETER_PATTERNS = (
+    ("date", r"\d{4}-\d{2}-\d{2}"),
+    ("month", r"\d{4}-\d{2}"),
+    ("number", r"\d+(?:\.\d+)?"),
+)
+_PARAMETERS = re.compile(
+    "|".join(
+        rf"(?P<{kind}>(?<![\w.-]){pattern}(?![\w-]|\.\d))" for kind, pattern in PARAMETER_PATTERNS
+    )
+)
+# Years, months and dates left in a template were derived from the question, e.g. the 2026
+# of "this year", and would be replayed unchanged for later questions
+_PERIOD_LITERAL = re.compile(r"(?<![\w.])(?:19|20)\d{2}(?:-\d{2}){0,2}(?![\w.])")
+# Words whose meaning moves with the calendar. Questions with them are cached per day.
+_RELATIVE_TIME = re.compile(
+    r"\b(?:today|tonight|yesterday|tomorrow|now|current(?:ly)?|this|last|next|previous|past"
+    r"|recent(?:ly)?|ago|latest|so far|ytd|mtd)\b"
+)
+_MARKER = re.compile(r"__p(\d+)__")
+
+# (normalized question, schema fingerprint) -> plan, least recently used first
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "uncacheable": 0, "evictions": 0}
+
+
+def normalize_question(question: str):
+    """
+    Lower-case a question, collapse whitespace and lift dates, months and numbers out of it.
+    "Total sales on 2025-01-05?" -> ("total sales on {date}", ["2025-01-05"])
+    Returns:
+        (str, list[str]): the question with typed placeholders, and the lifted values in order
+    """
+    values = []
+
+    def lift(match):
+        values.append(match.group())
+        return "{" + match.lastgroup + "}"
+
+    text = " ".join(question.lower().split()).rstrip("?.! ")
+    return _PARAMETERS.sub(lift, text), values
+
+
+def _plan_key(question: str):
+    """The cache key of a question and its lifted values, see normalize_question."""
+    key, values = normalize_question(question)
+    if _RELATIVE_TIME.search(key):
+        key = f"{key} @{date.today().isoformat()}"
+    return key, values
+
+
+def _literal(value: str) -> re.Pattern:
+    return re.compile(rf"(?<![\w.-]){re.escape(value)}(?![\w-]|\.\d)")
+
+
+def make_template(sql: str, values: list) -> str | None:
+    """
+    Replace the lifted values of a question in the SQL answering it with markers.
+    Returns None when the SQL cannot be reused for other values: a value does not appear
+    exactly once in the SQL or appears twice among the values, or the SQL has year, month or
+    date literals that were derived from the question rather than copied from it, e.g. an
+    exclusive end date or the year of "this year".
+    """
+    if len(set(values)) != len(values):
+        return None
+    template = sql
+    # Longest values first, so that 2025-01 is not replaced inside 2025-01-31
+    for i in sorted(range(len(values)), key=lambda i: -len(values[i])):
+        template, count = _literal(values[i]).subn(f"__p{i}__", template)
+        if count != 1:
+            return None
+    if _PERIOD_LITERAL.search(template):
+        return None
+    return template
+
+
+def render_template(template: str, values: list) -> str:
+    return _MARKER.sub(lambda match: values[int(match.group(1))], template)
+
+
+def lookup_plan(question: str, fingerprint: str) -> str | None:
+    """Return the SQL of a cached plan for the question, or None on a miss."""
+    key, values = _plan_key(question)
+    with _plans_lock:
+        plan = _plans.get((key, fingerprint))
+        if plan is None:
+            _stats["misses"] += 1
+            return None
+        _plans.move_to_end((key, fingerprint))
+        plan["hits"] += 1
+        plan["last_hit_at"] = datetime.now()
+        _stats["hits"] += 1
+    return render_template(plan["template"], values)
+
+
+def store_plan(question: str, fingerprint: str, sql: str) -> bool:
+    """
+    Cache the SQL that answered a question as a template for similar questions.
+    Returns:
+        bool: whether the SQL could be turned into a template and was stored
+    """
+    key, values = _plan_key(question)
+    template = make_template(sql, values)
+    with _plans_lock:
+        if template is None:
+            _stats["uncacheable"] += 1
+            return False
+        _plans[(key, fingerprint)] = {
+            "template": template,
+            "hits": 0,
+            "created_at": datetime.now(),
+            "last_hit_at": None,
+        }
+        _plans.move_to_end((key, fingerprint))
+        _stats["stores"] += 1
+        while len(_plans) > PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+            _stats["evictions"] += 1
+    return True
+
+
+def evict_plan(question: str, fingerprint: str):
+    """Drop the plan of a question, e.g. after its SQL failed."""
+    key, _ = _plan_key(question)
+    with _plans_lock:
+        if _plans.pop((key, fingerprint), None) is not None:
+            _stats["evictions"] += 1
+
+
+def plan_cache_stats() -> dict:
+    with _plans_lock:
+        return {**_stats, "size": len(_plans), "max_size": PLAN_CACHE_SIZE}
+
+
+def list_plans() -> list:
+    """Cached plans, most recently used first."""
+    with _plans_lock:
+        return [
+            {
+                "question": key,
+                "schema_fingerprint": fingerprint,
+                "template": plan["template"],
+                "hits": plan["hits"],
+                "created_at": plan["created_at"].isoformat(timespec="seconds"),
+                "last_hit_at": (
+                    plan["last_hit_at"].isoformat(timespec="seconds")
+                    if plan["last_hit_at"]
+                    else None
+                ),
+            }
+            for (key, fingerprint), plan in reversed(_plans.items())
+        ]
+
+
+def plan_summaries() -> list:
+    """
+    Cached plans, most recently used first, without their questions and SQL, which come
+    from every user. Each plan is identified by a hash of its question and schema fingerprint.
+    """
+    with _plans_lock:
+        return [
+            {
+                "id": hashlib.sha256(f"{key}\0{fingerprint}".encode()).hexdigest()[:16],
+                "schema_fingerprint": fingerprint,
+                "hits": plan["hits"],
+                "created_at": plan["created_at"].isoformat(timespec="seconds"),
+                "last_hit_at": (
+                    plan["last_hit_at"].isoformat(timespec="seconds")
+                    if plan["last_hit_at"]
+                    else None
+                ),
+            }
+            for (key, fingerprint), plan in reversed(_plans.items())
+        ]
+
+
+def clear_plans():
+    with _plans_lock:
+        _plans.clear()
+        for name in _stats:
+            _stats[name] = 0
@@ -0,0 +1,216 @@
+import json
+import re
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from .. import config
+from ..database.data_version import data_version_key
+from ..utils.logger import logger
+from .sql_result_store import put_result, result_frame, shape_result
+
+# Total size of the cached results kept per worker process, least recently used are dropped
+RESULT_CACHE_BYTES = config.get("sql_agent.result_cache_bytes", 16_000_000)
+# Larger results are returned but not cached
+MAX_CACHED_RESULT_BYTES = config.get("sql_agent.max_cached_result_bytes", 1_000_000)
+
+# Tables whose writes bump a data_versions counter, and the name of that counter. Queries
+# reading any other table cannot be invalidated and are never cached.
+VERSIONED_TABLES = {
+    "sales": "sales",
+    "customers": "customers",
+    "inventory": "inventory",
+    "products": "products",
+    "sales_daily_rollup": "sales_rollup",
+    "sales_daily_totals": "sales_rollup",
+}
+# Monthly partitions of sales are written through sales and share its counter
+_SALES_PARTITION = re.compile(r"sales_y\d{4}m\d{2}")
+# Functions whose value changes without any write; current_date is cached per day
+VOLATILE_FUNCTIONS = {
+    "now",
+    "current_time",
+    "current_timestamp",
+    "localtime",
+    "localtimestamp",
+    "clock_timestamp",
+    "statement_timestamp",
+    "transaction_timestamp",
+    "timeofday",
+    "random",
+}
+# Keywords of statements that write, e.g. a data-modifying CTE or SELECT INTO
+WRITE_KEYWORDS = {"insert", "update", "delete", "merge", "truncate", "into", "create", "drop"}
+
+# String literals, quoted identifiers and comments, the parts of SQL not to read as keywords
+SQL_TOKENS = re.compile(
+    r"(?P<literal>'(?:[^']|'')*')"
+    r'|(?P<identifier>"(?:[^"]|"")*")'
+    r"|(?P<comment>--[^\n]*|/\*.*?\*/)",
+    re.S,
+)
+_WORDS = re.compile(r"[A-Za-z_][A-Za-z0-9_$]*")
+
+# (canonical SQL, day for current_date) -> {"version", "result", "size"}, least recent first
+_results = OrderedDict()
+_results_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "uncacheable": 0, "evictions": 0, "bytes": 0}
+
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    Lower-case the SQL and collapse its whitespace outside string literals and quoted
+    identifiers, drop comments and trailing semicolons, so that the same query written
+    differently gets the same key.
+    """
+    parts = []
+    code = ""  # SQL since the last literal, comments replaced by spaces
+    position = 0
+    for match in SQL_TOKENS.finditer(sql):
+        code += sql[position : match.start()] + " "
+        if match.lastgroup != "comment":
+            parts += [re.sub(r"\s+", " ", code[:-1].lower()), match.group()]
+            code = ""
+        position = match.end()
+    parts.append(re.sub(r"\s+", " ", (code + sql[position:]).lower()))
+    return "".join(parts).strip().rstrip("; ")
+
+
+def _words(canonical: str) -> set:
+    """Identifiers and keywords of the SQL, string literals left out."""
+    without_literals = SQL_TOKENS.sub(
+        lambda match: match.group() if match.lastgroup == "identifier" else " ", canonical
+    )
+    return set(_WORDS.findall(without_literals))
+
+
+def version_counters(canonical: str, table_names) -> list | None:
+    """
+    The data_versions counters a read-only query depends on, or None if the query must not
+    be cached: it is not a SELECT, may write, calls a volatile function or reads an
+    unversioned table.
+    """
+    if not canonical.startswith(("select", "with")):
+        return None
+    words = _words(canonical)
+    if words & (VOLATILE_FUNCTIONS | WRITE_KEYWORDS):
+        return None
+
+    counters = set()
+    for word in words:
+        if _SALES_PARTITION.fullmatch(word):
+            counters.add("sales")
+        elif word in table_names:
+            if word not in VERSIONED_TABLES:
+                return None
+            counters.add(VERSIONED_TABLES[word])
+    return sorted(counters)
+
+
+def query_frame(sql_db, query: str):
+    """
+    Run a query on the database of the toolkit's SQLDatabase and return its rows as a
+    DataFrame, or the error as a string like SQLDatabase.run_no_throw does. Unlike run, the
+    connection is never committed, and on Postgres the query runs in a read-only
+    transaction, so anything that slips past validation cannot write.
+    """
+    try:
+        with sql_db._engine.connect() as connection:
+            if connection.dialect.name == "postgresql":
+                connection.execute(text("SET TRANSACTION READ ONLY"))
+            result = connection.execute(text(query))
+            return result_frame(result.keys(), result.fetchall())
+    except SQLAlchemyError as e:
+        return f"Error: {e}"
+
+
+def run_cached_query(sql_db, query: str):
+    """
+    Run a query through the SQLDatabase of the toolkit, or return the result of the same
+    query cached while none of its tables has been written to since.
+    Returns:
+        DataFrame | str: the rows of the query, or the error
+    """
+    canonical = canonicalize_sql(query)
+    counters = version_counters(canonical, set(sql_db.get_usable_table_names()))
+    if counters is None:
+        with _results_lock:
+            _stats["uncacheable"] += 1
+        return query_frame(sql_db, query)
+
+    key = (canonical, date.today().isoformat() if "current_date" in _words(canonical) else "")
+    try:
+        # Read before running the query: a write in between makes the stored version older
+        # than the result, which only costs a miss, never a stale hit
+        with sql_db._engine.connect() as connection:
+            version = data_version_key(counters, connection) if counters else ""
+    except Exception as e:
+        logger.warning(f"Data versions unavailable, running the query uncached: {e}")
+        return query_frame(sql_db, query)
+
+    with _results_lock:
+        entry = _results.get(key)
+        if entry is not None and entry["version"] == version:
+            _results.move_to_end(key)
+            _stats["hits"] += 1
+            return entry["result"]
+        _stats["misses"] += 1
+
+    result = query_frame(sql_db, query)
+    if not isinstance(result, str):
+        _store(key, version, result)
+    return result
+
+
+def _store(key, version: str, result):
+    size = int(result.memory_usage(index=True, deep=True).sum())
+    if size > MAX_CACHED_RESULT_BYTES:
+        return
+    with _results_lock:
+        previous = _results.pop(key, None)
+        if previous is not None:
+            _stats["bytes"] -= previous["size"]
+        _results[key] = {"version": version, "result": result, "size": size}
+        _stats["bytes"] += size
+        while _stats["bytes"] > RESULT_CACHE_BYTES:
+            _, evicted = _results.popitem(last=False)
+            _stats["bytes"] -= evicted["size"]
+            _stats["evictions"] += 1
+
+
+def result_cache_stats() -> dict:
+    with _results_lock:
+        return {**_stats, "size": len(_results), "max_bytes": RESULT_CACHE_BYTES}
+
+
+def clear_result_cache():
+    with _results_lock:
+        _results.clear()
+        for name in _stats:
+            _stats[name] = 0
+
+
+class CachedQuerySQLDatabaseTool(QuerySQLDatabaseTool):
+    """
+    The toolkit's sql_db_query tool, answering repeated queries from the result cache.
+    The full result stays in the result store; the model gets it shaped by shape_result.
+    """
+
+    description: str = (
+        "Execute a SQL query against the database and get back the result as JSON: row_count, "
+        "columns and the data per column. Results longer than a few dozen rows are truncated "
+        "to their head and tail rows plus a summary of every column. The handle refers to the "
+        "full result, pass it to other tools instead of copying rows; a result too large to "
+        "keep has no handle and a message instead. If the query is not correct, an error "
+        "message will be returned."
+    )
+
+    def _run(self, query: str, run_manager=None):
+        result = run_cached_query(self.db, query)
+        if isinstance(result, str):
+            return result
+        return json.dumps(shape_result(result, put_result(result)))
@@ -0,0 +1,192 @@
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from .. import config
+
+# Results with at most this many rows are returned to the model whole
+PREVIEW_ROWS = config.get("sql_agent.result_preview_rows", 50)
+# Rows from the start and end of a longer result returned next to its column summaries
+HEAD_ROWS = config.get("sql_agent.result_head_rows", 20)
+TAIL_ROWS = config.get("sql_agent.result_tail_rows", 5)
+# Memory for full results per worker process, and how long a handle stays valid
+STORE_BYTES = config.get("sql_agent.result_store_bytes", 64_000_000)
+STORE_TTL_SECONDS = config.get("sql_agent.result_ttl_seconds", 3600)
+HANDLE_PREFIX = "sqlres_"
+TOO_LARGE_MESSAGE = (
+    "Result too large to keep, so it has no handle. Aggregate or filter it in SQL "
+    "to get a smaller result that other tools can use."
+)
+
+# handle -> {"frame", "size", "stored_at"}, least recently used first
+_store = OrderedDict()
+# id(frame) -> handle of every stored frame, the store keeps the frames alive
+_handles_by_frame = {}
+_store_lock = threading.Lock()
+_stored_bytes = 0
+
+
+def result_frame(columns, rows) -> pd.DataFrame:
+    """A DataFrame of query rows, with numeric columns as floats rather than Decimals."""
+    frame = pd.DataFrame.from_records(list(rows), columns=list(columns))
+    for name in frame.columns[frame.dtypes == object]:
+        values = frame[name].dropna()
+        if len(values) and values.map(lambda value: isinstance(value, Decimal)).all():
+            frame[name] = frame[name].astype(float)
+    return frame
+
+
+def _json_value(value):
+    if value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        return _json_value(value.item())
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def column_values(frame: pd.DataFrame) -> dict:
+    """Column-oriented JSON-safe values: {column: [values]}."""
+    return {
+        str(name): [_json_value(value) for value in frame[name].astype(object).tolist()]
+        for name in frame.columns
+    }
+
+
+def _summary(values: pd.Series) -> dict:
+    values = values.dropna()
+    if not len(values):
+        return {"nulls_only": True}
+    if pd.api.types.is_bool_dtype(values):
+        return {"true": int(values.sum()), "false": int((~values).sum())}
+    if pd.api.types.is_numeric_dtype(values):
+        return {
+            "min": _json_value(values.min()),
+            "max": _json_value(values.max()),
+            "mean": round(float(values.mean()), 4),
+            "sum": _json_value(values.sum()),
+        }
+    try:
+        return {
+            "min": _json_value(values.min()),
+            "max": _json_value(values.max()),
+            "distinct": int(values.nunique()),
+        }
+    except TypeError:  # mixed types cannot be ordered
+        return {"distinct": int(values.astype(str).nunique())}
+
+
+def shape_result(frame: pd.DataFrame, handle: str | None) -> dict:
+    """
+    The result of a query as returned to the model: column-oriented, with the row count and
+    the handle of the full result. Longer results are capped to their first and last rows
+    plus a summary of every column (min, max, mean and sum of numbers, min, max and distinct
+    count of others), so the size does not grow with the number of rows.
+    A result that put_result could not keep gets a message instead of its handle.
+    """
+    shaped = {"handle": handle, "row_count": len(frame), "columns": [str(c) for c in frame.columns]}
+    if handle is None:
+        shaped["message"] = TOO_LARGE_MESSAGE
+    if len(frame) <= PREVIEW_ROWS:
+        shaped["data"] = column_values(frame)
+        return shaped
+
+    shaped["truncated"] = True
+    shaped["head"] = column_values(frame.head(HEAD_ROWS))
+    shaped["tail"] = column_values(frame.tail(TAIL_ROWS))
+    shaped["summary"] = {str(name): _summary(frame[name]) for name in frame.columns}
+    return shaped
+
+
+def _expire(now: float):
+    global _stored_bytes
+    while _store:
+        handle, entry = next(iter(_store.items()))
+        if _stored_bytes <= STORE_BYTES and now - entry["stored_at"] < STORE_TTL_SECONDS:
+            break
+        del _store[handle]
+        del _handles_by_frame[id(entry["frame"])]
+        _stored_bytes -= entry["size"]
+
+
+def put_result(frame: pd.DataFrame) -> str | None:
+    """
+    Keep a full query result in this worker process and return its handle.
+    The same frame, e.g. a result served from the query cache, keeps its handle.
+    Returns None for a frame larger than STORE_BYTES, which would be evicted at once.
+    """
+    global _stored_bytes
+    now = time.monotonic()
+    with _store_lock:
+        handle = _handles_by_frame.get(id(frame))
+        if handle is not None:
+            _store[handle]["stored_at"] = now
+            _store.move_to_end(handle)
+            return handle
+
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        if size > STORE_BYTES:
+            return None
+
+        handle = f"{HANDLE_PREFIX}{uuid.uuid4().hex[:16]}"
+        _store[handle] = {"frame": frame, "size": size, "stored_at": now}
+        _handles_by_frame[id(frame)] = handle
+        _stored_bytes += size
+        _expire(now)
+    return handle
+
+
+def get_result(handle: str) -> pd.DataFrame | None:
+    """The full result behind a handle, or None if it is unknown or has expired."""
+    with _store_lock:
+        _expire(time.monotonic())
+        entry = _store.get(handle)
+        if entry is None:
+            return None
+        # Handles expire STORE_TTL_SECONDS after their last use
+        entry["stored_at"] = time.monotonic()
+        _store.move_to_end(handle)
+        return entry["frame"]
+
+
+def require_result(handle: str, columns=()) -> pd.DataFrame:
+    """
+    The full result behind a handle, for tools that are handed a handle by the model.
+    Raises ValueError with a message for the model if the handle has expired
+    or the result lacks one of the given columns.
+    """
+    frame = get_result(handle)
+    if frame is None:
+        raise ValueError(f"Result {handle} has expired, query the data again")
+    missing = [column for column in columns if column not in frame.columns]
+    if missing:
+        raise ValueError(
+            f"Result {handle} has no {', '.join(missing)} column, it has "
+            f"{', '.join(map(str, frame.columns))}. Query the data again with "
+            f"{', '.join(missing)} among the selected columns"
+        )
+    return frame
+
+
+def is_result_handle(value) -> bool:
+    return isinstance(value, str) and value.strip().startswith(HANDLE_PREFIX)
+
+
+def clear_result_store():
+    global _stored_bytes
+    with _store_lock:
+        _store.clear()
+        _handles_by_frame.clear()
+        _stored_bytes = 0
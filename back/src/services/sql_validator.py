@@ -0,0 +1,202 @@
+import re
+
+from .. import config
+from .sql_result_cache import SQL_TOKENS, WRITE_KEYWORDS
+
+# Rows returned by an agent query at most, a LIMIT is added or lowered to this
+MAX_QUERY_ROWS = config.get("sql_agent.max_query_rows", 10_000)
+
+# Keywords that never appear in a read-only query of the agent
+FORBIDDEN_KEYWORDS = WRITE_KEYWORDS | {
+    "alter",
+    "grant",
+    "revoke",
+    "copy",
+    "call",
+    "lock",
+    "share",
+    "vacuum",
+    "reindex",
+    "cluster",
+    "refresh",
+    "listen",
+    "notify",
+    "prepare",
+    "execute",
+}
+# Functions with effects outside the query. nextval, setval and pg_terminate_backend take
+# effect even when the transaction is rolled back, and session settings and advisory locks
+# would outlive the query on a pooled connection.
+SIDE_EFFECT_FUNCTIONS = {
+    "nextval",
+    "setval",
+    "set_config",
+    "pg_sleep",
+    "pg_sleep_for",
+    "pg_sleep_until",
+    "pg_terminate_backend",
+    "pg_cancel_backend",
+    "pg_reload_conf",
+    "pg_rotate_logfile",
+    "pg_switch_wal",
+    "pg_create_restore_point",
+    "pg_notify",
+    "pg_logical_emit_message",
+    "pg_read_file",
+    "pg_read_binary_file",
+    "pg_ls_dir",
+    "pg_stat_file",
+    "query_to_xml",
+    "query_to_xml_and_xmlschema",
+    "dblink",
+    "dblink_exec",
+}
+# Families of such functions: large objects and advisory locks
+SIDE_EFFECT_PREFIXES = ("lo_", "pg_advisory_", "pg_try_advisory_", "dblink_")
+_FUNCTION_CALL = re.compile(r"(?<![\w$])([a-z_][a-z0-9_$]*)\s*\(")
+# Functions taking FROM inside their parentheses, e.g. EXTRACT(YEAR FROM date)
+_FROM_FUNCTIONS = re.compile(r"\b(?:extract|substring|trim|overlay|position)\s*\([^()]*\)")
+_IDENTIFIER = r'(?:"[^"]+"|[a-z_][a-z0-9_$]*)'
+# Table after FROM or JOIN, not a function call, and the word after it, which may be an alias
+_TABLE_REFERENCE = re.compile(
+    rf"\b(?:from|join)\s+(?:only\s+)?((?:{_IDENTIFIER}\.)?{_IDENTIFIER})(?![\w$])(?!\s*\()"
+    rf"(?=(?:\s+(?:as\s+)?({_IDENTIFIER}))?)"
+)
+_CTE_NAME = re.compile(rf"(?:\bwith\s+(?:recursive\s+)?|,\s*)({_IDENTIFIER})\s+as\s*\(")
+_COLUMN_REFERENCE = re.compile(rf"(?<![\w.$])({_IDENTIFIER})\.({_IDENTIFIER})")
+_TOP_LEVEL_LIMIT = re.compile(r"\blimit\s+(\d+|all)\b|\bfetch\s+(?:first|next)\b")
+# Words following a table name that are clauses, not its alias
+_CLAUSE_WORDS = {
+    "where",
+    "group",
+    "order",
+    "limit",
+    "join",
+    "inner",
+    "left",
+    "right",
+    "full",
+    "cross",
+    "natural",
+    "on",
+    "using",
+    "union",
+    "intersect",
+    "except",
+    "having",
+    "window",
+    "offset",
+    "fetch",
+    "lateral",
+    "tablesample",
+}
+
+
+def _name(identifier: str) -> str:
+    return identifier[1:-1] if identifier.startswith('"') else identifier
+
+
+def _mask(sql: str) -> str:
+    """Lower-case the SQL with literals blanked and comments removed, keeping every offset."""
+
+    def blank(match):
+        if match.lastgroup == "identifier":
+            return match.group()
+        if match.lastgroup == "literal":
+            return "'" + " " * (len(match.group()) - 2) + "'"
+        return " " * len(match.group())
+
+    return SQL_TOKENS.sub(blank, sql).lower()
+
+
+def _top_level(masked: str) -> str:
+    """The masked SQL with everything inside parentheses blanked."""
+    chars = list(masked)
+    depth = 0
+    for i, char in enumerate(masked):
+        if char == ")":
+            depth -= 1
+        if depth > 0:
+            chars[i] = " "
+        if char == "(":
+            depth += 1
+    return "".join(chars)
+
+
+def _table_problems(masked: str, tables: dict) -> list:
+    """Unknown tables in FROM and JOIN, and qualified columns missing from their table."""
+    problems = []
+    scanned = _FROM_FUNCTIONS.sub(lambda match: " " * len(match.group()), masked)
+    ctes = {_name(name) for name in _CTE_NAME.findall(scanned)}
+    known = {name.lower(): name for name in tables}
+    aliases = {}
+    for reference, alias in _TABLE_REFERENCE.findall(scanned):
+        parts = [_name(part) for part in re.findall(_IDENTIFIER, reference)]
+        table = parts[-1]
+        if table in ctes and len(parts) == 1:
+            continue
+        if table not in known or (len(parts) == 2 and parts[0] != "public"):
+            problems.append(f"Unknown table {reference}")
+            continue
+        aliases[table] = known[table]
+        if alias and _name(alias) not in _CLAUSE_WORDS:
+            aliases[_name(alias)] = known[table]
+
+    for qualifier, column in _COLUMN_REFERENCE.findall(scanned):
+        table = aliases.get(_name(qualifier))
+        # Columns of subqueries, CTEs and other schemas are not checked
+        if table is None:
+            continue
+        names = {name.lower(): name for name in tables[table]}
+        if _name(column) not in names:
+            problems.append(f"Unknown column {column} in table {table}")
+    return problems
+
+
+def validate_sql(sql: str, tables: dict | None = None):
+    """
+    Statically check a query written by the agent before it runs, without an LLM call.
+    The query must be a single read-only SELECT without side-effecting function calls,
+    its tables must exist and its columns
+    qualified with a table or alias must exist in that table. Only what can be read off the
+    tokens is checked, unqualified columns are left to the database. A missing LIMIT is
+    added, and a LIMIT above MAX_QUERY_ROWS is lowered.
+    Args:
+        sql (str): the query
+        tables (dict | None): {table: column names} the query may use, None skips name checks
+    Returns:
+        (str, list[str]): the query to run, or None, and the problems found
+    """
+    sql = sql.strip().rstrip(";").rstrip()
+    masked = _mask(sql)
+    problems = []
+
+    if ";" in masked:
+        problems.append("Only a single statement can be run")
+    words = set(re.findall(r"[a-z_][a-z0-9_$]*", masked))
+    first = re.match(r"\s*\(*\s*([a-z]+)", masked)
+    if first is None or first.group(1) not in ("select", "with"):
+        problems.append("Only SELECT queries can be run")
+    forbidden = sorted(words & FORBIDDEN_KEYWORDS)
+    if forbidden:
+        problems.append(f"Query is not read-only: {', '.join(forbidden).upper()}")
+    calls = sorted(
+        {
+            name
+            for name in _FUNCTION_CALL.findall(masked)
+            if name in SIDE_EFFECT_FUNCTIONS or name.startswith(SIDE_EFFECT_PREFIXES)
+        }
+    )
+    if calls:
+        problems.append(f"Query calls functions with side effects: {', '.join(calls)}")
+    if tables and not problems:
+        problems += _table_problems(masked, tables)
+    if problems:
+        return None, problems
+
+    limit = _TOP_LEVEL_LIMIT.search(_top_level(masked))
+    if limit is None:
+        sql = f"{sql}\nLIMIT {MAX_QUERY_ROWS}"
+    elif limit.group(1) and (limit.group(1) == "all" or int(limit.group(1)) > MAX_QUERY_ROWS):
+        sql = f"{sql[: limit.start(1)]}{MAX_QUERY_ROWS}{sql[limit.end(1) :]}"
+    return sql, []
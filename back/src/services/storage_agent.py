@@ -1,37 +1,112 @@
+from datetime import datetime, time
+
+import pandas as pd
 from dotenv import load_dotenv
-from langchain.messages import AIMessage, HumanMessage
+from langchain.agents import create_agent
+from langchain.messages import HumanMessage
 from langchain.tools import tool
-from langgraph.graph import END, START, MessagesState, StateGraph
 
+from ..database.inventory_history import inventory_at, inventory_levels
+from ..database.product_dimension import get_product_dimension, resolve_product_id
 from .sql_agent import sql_agent_tool
 
 load_dotenv()
 
+# Longest range of daily levels returned at once, to keep tool results small
+MAX_LEVEL_DAYS = 92
 
-def call_sql_agent(state: MessagesState):
-    """Call SQL agent once without LLM decision making."""
-    user_message = state["messages"][0].content
-
-    result = sql_agent_tool.invoke(user_message)
-
-    return {"messages": [AIMessage(content=result)]}
-
-
-def build_storage_agent():
-    """Simple graph: call SQL agent once and go to end."""
-    workflow = StateGraph(MessagesState)
 
-    workflow.add_node("call_sql", call_sql_agent)
+def _parse_time(value: str) -> datetime:
+    """A date means the end of that day, a timestamp is used as is."""
+    parsed = pd.Timestamp(value).to_pydatetime()
+    if len(value.strip()) <= 10:
+        parsed = datetime.combine(parsed.date(), time.max)
+    return parsed
 
-    workflow.add_edge(START, "call_sql")
-    workflow.add_edge("call_sql", END)
 
-    compiled = workflow.compile()
-    compiled.name = "storage_agent"
-    return compiled
+def inventory_levels_report(
+    product: str | None = None,
+    at: str | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> dict:
+    """
+    Inventory of one product at a point in time (product and at), or the end-of-day
+    inventory of one or all products for each day of start_date..end_date.
+    """
+    products = get_product_dimension()
+    product_id = None
+    if product:
+        product_id = resolve_product_id(product)
+        if product_id is None:
+            return {"error": f"Unknown product: {product}"}
+
+    try:
+        if at:
+            if product_id is None:
+                return {"error": "product is required with at"}
+            when = _parse_time(at)
+            return {
+                "product": products[product_id]["name"],
+                "at": when.isoformat(timespec="seconds"),
+                "amount": inventory_at(product_id, when),
+            }
+
+        if not start_date or not end_date:
+            return {"error": "Either at or start_date and end_date are required"}
+        start, end = pd.Timestamp(start_date).date(), pd.Timestamp(end_date).date()
+    except ValueError as e:
+        return {"error": f"Invalid date: {e}"}
+
+    if (end - start).days + 1 > MAX_LEVEL_DAYS:
+        return {"error": f"At most {MAX_LEVEL_DAYS} days of levels can be requested at once"}
+
+    try:
+        levels = inventory_levels(start, end)
+    except ValueError as e:
+        return {"error": str(e)}
+    if product_id is not None:
+        levels = levels[[product_id]]
+    return {
+        "days": [day.strftime("%Y-%m-%d") for day in levels.index],
+        "levels": {
+            products.get(pid, {}).get("name", str(pid)): levels[pid].tolist()
+            for pid in levels.columns
+        },
+    }
 
 
-storage_react_agent = build_storage_agent()
+@tool
+def inventory_levels_tool(
+    product: str | None = None,
+    at: str | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> dict:
+    """
+    Returns stock levels at any past or present time, computed from the inventory history.
+    - Stock of one product at a time: give product (name or id) and at (YYYY-MM-DD for the
+      end of that day, or YYYY-MM-DDTHH:MM).
+    - Daily stock over a period: give start_date and end_date (YYYY-MM-DD), and optionally a
+      product. Returns the end-of-day level of each day, at most 92 days.
+    """
+    return inventory_levels_report(product, at, start_date, end_date)
+
+
+storage_react_agent = create_agent(
+    name="storage_agent",
+    model="openai:gpt-4o-mini",
+    tools=[inventory_levels_tool, sql_agent_tool],
+    system_prompt=(
+        "You are a storage and inventory assistant.\n"
+        "Decision rules:\n"
+        "1. If the user asks for stock or inventory levels at a date or time, or how stock"
+        " developed over a period, call the inventory_levels_tool. Never estimate past stock"
+        " levels yourself.\n"
+        "2. For any other question about products or current storage, use the sql_agent_tool.\n"
+        "3. Answer briefly with the numbers returned by the tools."
+    ),
+)
 
 
 @tool
@@ -1,37 +1,80 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
+import numpy as np
 import pandas as pd
 from dateutil.relativedelta import relativedelta
 
-from ..database.sales import (
-    query_sales,
-    query_timeperiod_sales,
-    query_timeperiod_transactions,
-    query_transactions,
-)
+from ..database.sales import query_daily_series
+from .sales_cube import current_sales_cube
+from .snapshot_store import get_shared_snapshot
 
+# Postgres date_part() equivalents for bucketing the daily series in pandas
+TIME_INTERVAL_ACCESSORS = {
+    "day": lambda ts: ts.dt.day,
+    "week": lambda ts: ts.dt.isocalendar().week,
+    "month": lambda ts: ts.dt.month,
+    "quarter": lambda ts: ts.dt.quarter,
+    "year": lambda ts: ts.dt.year,
+}
 
-def fetch_dashboard_data() -> dict:
+
+def is_closed_period(as_of: date) -> bool:
+    """
+    True when every day up to as_of is over, with a day of margin so that a database running
+    in another time zone agrees. Sales of such days only change through corrections,
+    which bump the sales_history data version.
+    """
+    return as_of < datetime.today().date() - timedelta(days=1)
+
+
+def check_as_of(as_of: date) -> None:
+    """
+    Raises ValueError unless as_of is today or the last day of a past month, so that clients
+    cannot create a stored snapshot for every day they ask for.
+    """
+    today = datetime.today().date()
+    if as_of > today:
+        raise ValueError("as_of cannot be in the future")
+    if as_of != today and (as_of + timedelta(days=1)).day != 1:
+        raise ValueError("as_of must be today or the last day of a month")
+
+
+def fetch_dashboard_data(as_of: date | None = None) -> dict:
     """
     Used to fetch dashboard data to the api-layer.
+    Served from snapshots shared by all workers:
+    - today (as_of None): rebuilt when sales change or the day changes
+    - a closed month: built once and kept until sales of past days are corrected
+    - the month that ended yesterday: rebuilt when sales change
+    Args:
+        as_of: the day the dashboard is computed for, defaults to today; otherwise
+            the last day of a month
     Returns:
         dict: A dictionary containing dashboard data
     """
-    sales = create_sales_data()
-
-    return sales
+    if as_of is not None:
+        check_as_of(as_of)
+    if as_of is None or as_of == datetime.today().date():
+        return get_shared_snapshot("dashboard", ["sales"], create_sales_data, daily=True)
+
+    tables = ["sales_history"] if is_closed_period(as_of) else ["sales"]
+    return get_shared_snapshot(
+        f"dashboard:{as_of.isoformat()}", tables, lambda: create_sales_data(as_of)
+    )
 
 
-def get_quarter_dates() -> dict:
+def get_quarter_dates(as_of: date | None = None) -> dict:
     """
     Returns a dictionary with start and end dates for current, previous,
     and previous-previous quarters.
 
+    Args:
+        as_of: the day whose quarter is the current one, defaults to today
     Returns:
         dict: Dictionary with quarter ranges as tuples of (start_date, end_date) strings
     """
     # Parse input date
-    date = datetime.today()
+    date = datetime.today() if as_of is None else as_of
 
     # Determine current quarter
     current_quarter = (date.month - 1) // 3 + 1
@@ -64,44 +107,87 @@ def get_quarter_dates() -> dict:
     }
 
 
-def create_weekly_graph_data(start: str, end: str, datatype: str, time_interval: str) -> list:
+def slice_period(df: pd.DataFrame, start: str | None, end: str | None) -> pd.DataFrame:
+    """
+    Returns the rows of a timestamp-sorted daily series between start and end (inclusive).
+    Uses binary search on the sorted timestamps instead of building a boolean mask.
+    """
+    timestamps = df.timestamp.to_numpy()
+    lo = 0 if start is None else timestamps.searchsorted(np.datetime64(start), side="left")
+    hi = len(df) if end is None else timestamps.searchsorted(np.datetime64(end), side="right")
+    return df.iloc[lo:hi]
+
+
+def bucket_sums(
+    df: pd.DataFrame, start: str, end: str, datatypes: list, time_interval: str
+) -> pd.DataFrame:
+    """
+    Sums the given columns of the daily series per time interval bucket between start and end.
+    Empty buckets are left out, like in a GROUP BY over date_part().
+    """
+    if time_interval not in TIME_INTERVAL_ACCESSORS:
+        raise ValueError(f"Unsupported time interval: {time_interval}")
+
+    window = slice_period(df, start, end)
+    buckets = TIME_INTERVAL_ACCESSORS[time_interval](window.timestamp)
+    return window[datatypes].groupby(buckets).sum()
+
+
+def to_graph_list(values: pd.Series, datatype: str) -> list:
+    if datatype == "revenue":
+        return [round(float(value), 2) for value in values]
+    return [int(value) for value in values]
+
+
+def create_graph_data(
+    df: pd.DataFrame, start: str, end: str, datatype: str, time_interval: str
+) -> list:
     """
     Creates a list of data, used to create datagraphs.
+    Buckets the daily series in memory instead of querying the database per graph.
     Args:
+            df (pd.DataFrame): Daily series with a timestamp column, sorted by timestamp
             start (str) : Start date of the graph dataset
             end (str): End date of the graph dataset
-            datatype (str): Type of data to retrieve, based on query column names
+            datatype (str): Type of data to retrieve, based on df column names
             time_interval (str): the time interval of the data, e.g. day, week, month or year
     Returns:
             list: List containing data points for a graph
     """
-    graph_data = []
-    if datatype == "transactions":
-        query_data = query_timeperiod_transactions(start, end, time_interval)
-    else:
-        query_data = query_timeperiod_sales(start, end, time_interval)
+    graph_data = bucket_sums(df, start, end, [datatype], time_interval)
+    return to_graph_list(graph_data[datatype], datatype)
 
-    for row in query_data:
-        graph_data.append(getattr(row, datatype))
 
-    return graph_data
+def growth(current: int, previous: int) -> float:
+    return round((current / previous) - 1, 2)
 
 
-def build_dataset(df: pd.DataFrame, datatype: str) -> dict:
+def as_of_datetime(as_of: date | None) -> datetime:
+    if as_of is None:
+        return datetime.today()
+    return datetime.combine(as_of, datetime.min.time())
+
+
+def build_datasets(df: pd.DataFrame, datatypes: list, as_of: date | None = None) -> dict:
     """
-    Builds the datasets for dashboard data
+    Builds the datasets for dashboard data for several columns at once.
+    Every time slice and graph bucketing is computed once and shared by all columns.
     Args:
-        df: a pd.DataFrame object
-        datatype: A column name from the df from which dataset is to be created
+        df: a pd.DataFrame object sorted by timestamp
+        datatypes: Column names from the df from which datasets are to be created
+        as_of: the day the datasets are computed for, defaults to today
     Returns:
-        dict: Returns a dict containing current quarter, previous quarter and YTD totals,
-         growth % and graph data.
+        dict: Dict keyed by column name, each containing current quarter, previous quarter
+         and YTD totals, growth % and graph data.
     """
     # Set times
-    quarters = get_quarter_dates()
-    today = datetime.today()
+    today = as_of_datetime(as_of)
+    quarters = get_quarter_dates(today)
     todays_date = today.strftime("%Y-%m-%d")
-    end_of_previous_year = str(today.year - 1) + "-12-31"
+    start_of_year = str(today.year) + "-01-01"
+
+    # Nothing after the as-of day counts, whatever range the series covers
+    df = slice_period(df, None, todays_date)
 
     # Calculate a comparable time slice of the previous quarter for growth % comparison
     time_into_quarter = (today - datetime.strptime(quarters["current"][0], "%Y-%m-%d")).days
@@ -119,89 +205,110 @@ def build_dataset(df: pd.DataFrame, datatype: str) -> dict:
         datetime(today.year - 1, 1, 1) + timedelta(days=time_into_year), "%Y-%m-%d"
     )
 
-    # Create timeslices from dataframe
-    current_quarter = df[
-        (df.timestamp >= quarters["current"][0]) & (df.timestamp <= quarters["current"][1])
-    ]
-
-    prev_q_comparable = df[
-        (df.timestamp >= quarters["previous"][0]) & (df.timestamp <= prev_q_comp_length)
-    ]
-    previous_quarter = df[
-        (df.timestamp >= quarters["previous"][0]) & (df.timestamp <= quarters["previous"][1])
-    ]
-
-    previous_previous_quarter = df[
-        (df.timestamp >= quarters["previous_previous"][0])
-        & (df.timestamp <= quarters["previous_previous"][1])
-    ]
-
-    this_year = df[(df.timestamp > end_of_previous_year)]
-    last_year_comparable = df[df.timestamp <= prev_year_comp_length]
-
-    # Calc totals for datatype per time period
-    current_q_total = int(current_quarter[datatype].sum())
-    # Just used for current period growth % calc
-    prev_q_comparable_total = int(prev_q_comparable[datatype].sum())
-
-    previous_q_total = int(previous_quarter[datatype].sum())
-    previous_previous_q_total = int(previous_previous_quarter[datatype].sum())
-
-    this_year_total = int(this_year[datatype].sum())
-    last_year_comparable_total = int(last_year_comparable[datatype].sum())
-
-    # total growth per time period
-    qurrent_q_r_growth = round((current_q_total / prev_q_comparable_total) - 1, 2)
-    previous_q_r_growth = round((previous_q_total / previous_previous_q_total) - 1, 2)
-    ytd_growth = round((this_year_total / last_year_comparable_total) - 1, 2)
+    # Calc totals for all datatypes per time period
+    periods = {
+        "current_quarter": (quarters["current"][0], quarters["current"][1]),
+        # Just used for current period growth % calc
+        "prev_q_comparable": (quarters["previous"][0], prev_q_comp_length),
+        "previous_quarter": (quarters["previous"][0], quarters["previous"][1]),
+        "previous_previous_quarter": (
+            quarters["previous_previous"][0],
+            quarters["previous_previous"][1],
+        ),
+        "this_year": (start_of_year, None),
+        "last_year_comparable": (None, prev_year_comp_length),
+    }
+    totals = {
+        name: slice_period(df, start, end)[datatypes].sum()
+        for name, (start, end) in periods.items()
+    }
 
     # Create graph data
-    current_graph_data = create_weekly_graph_data(
-        quarters["current"][0], quarters["current"][1], datatype, "week"
-    )
-    previous_graph_data = create_weekly_graph_data(
-        quarters["previous"][0], quarters["previous"][1], datatype, "week"
+    current_graph_data = bucket_sums(
+        df, quarters["current"][0], quarters["current"][1], datatypes, "week"
     )
-    ytd_graph_data = create_weekly_graph_data(
-        str(today.year) + "-01-01", todays_date, datatype, "month"
+    previous_graph_data = bucket_sums(
+        df, quarters["previous"][0], quarters["previous"][1], datatypes, "week"
     )
+    ytd_graph_data = bucket_sums(df, start_of_year, todays_date, datatypes, "month")
 
-    return {
-        "current_quarter": {"amount": current_q_total, "growth": qurrent_q_r_growth},
-        "previous_quarter": {"amount": previous_q_total, "growth": previous_q_r_growth},
-        "ytd": {"amount": this_year_total, "growth": ytd_growth},
-        "raw_graph_data": {
-            "current_quarter": current_graph_data,
-            "previous_quarter": previous_graph_data,
-            "ytd": ytd_graph_data,
-        },
-    }
+    result = {}
+    for datatype in datatypes:
+        # Revenue is summed as floats, so a total of 99.9999... is rounded, not truncated
+        total = {
+            name: round(float(period_totals[datatype])) for name, period_totals in totals.items()
+        }
+
+        result[datatype] = {
+            "current_quarter": {
+                "amount": total["current_quarter"],
+                "growth": growth(total["current_quarter"], total["prev_q_comparable"]),
+            },
+            "previous_quarter": {
+                "amount": total["previous_quarter"],
+                "growth": growth(total["previous_quarter"], total["previous_previous_quarter"]),
+            },
+            "ytd": {
+                "amount": total["this_year"],
+                "growth": growth(total["this_year"], total["last_year_comparable"]),
+            },
+            "raw_graph_data": {
+                "current_quarter": to_graph_list(current_graph_data[datatype], datatype),
+                "previous_quarter": to_graph_list(previous_graph_data[datatype], datatype),
+                "ytd": to_graph_list(ytd_graph_data[datatype], datatype),
+            },
+        }
 
+    return result
 
-def create_sales_data() -> dict:
+
+def build_dataset(df: pd.DataFrame, datatype: str) -> dict:
+    """
+    Builds the datasets for dashboard data
+    Args:
+        df: a pd.DataFrame object sorted by timestamp
+        datatype: A column name from the df from which dataset is to be created
+    Returns:
+        dict: Returns a dict containing current quarter, previous quarter and YTD totals,
+         growth % and graph data.
+    """
+    return build_datasets(df, [datatype])[datatype]
+
+
+def create_sales_data(as_of: date | None = None) -> dict:
     """
     Used to create a full dashboard dataset from sales data
+    Args:
+            as_of: the day the dashboard is computed for, defaults to today
     Returns:
             dict: Dict containing data for revenue, sales and transactions
     """
     # Set time stuff
-    today = datetime.today()
+    today = as_of_datetime(as_of)
     todays_date = today.strftime("%Y-%m-%d")
     last_year = str(today.year - 1) + "-01-01"
 
-    # Retrieve raw query data from database
-    raw_sales_query = query_sales(last_year, todays_date)
-    raw_transactions_query = query_transactions(last_year, todays_date)
+    # Retrieve the whole daily series from the shared cube, or with one query
+    cube = current_sales_cube()
+    if cube is not None:
+        df = cube.daily_frame(last_year, todays_date)
+    else:
+        raw_series_query = query_daily_series(last_year, todays_date)
+
+        # Set data into DF
+        df = pd.DataFrame.from_records(
+            raw_series_query, columns=["timestamp", "quantity", "revenue", "transactions"]
+        )
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df = df.astype({"quantity": "int64", "revenue": "float64", "transactions": "int64"})
 
-    # Set data into DF
-    df = pd.DataFrame.from_records(raw_sales_query, columns=["timestamp", "quantity", "revenue"])
-    tdf = pd.DataFrame.from_records(raw_transactions_query, columns=["timestamp", "transactions"])
+    datasets = build_datasets(df, ["revenue", "quantity", "transactions"], today)
 
     # Set data:
     result = {}
 
-    result["revenue"] = build_dataset(df, "revenue")
-    result["sales"] = build_dataset(df, "quantity")
-    result["transactions"] = build_dataset(tdf, "transactions")
+    result["revenue"] = datasets["revenue"]
+    result["sales"] = datasets["quantity"]
+    result["transactions"] = datasets["transactions"]
 
     return result
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+def lttb_indices(values, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: pick the points of an evenly spaced series that keep its
+    visual shape. The first and last point are always kept, and from every bucket in between
+    the point forming the largest triangle with the previous pick and the next bucket's mean.
+    Args:
+        values: the series values
+        points (int): number of points to keep
+    Returns:
+        np.ndarray: sorted indices of the kept points
+    """
+    y = np.asarray(values, dtype=float)
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float)
+    every = (n - 2) / (points - 2)
+    bounds = np.floor(np.arange(points - 1) * every).astype(int) + 1
+    bounds[-1] = n - 1
+
+    indices = np.empty(points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(points - 2):
+        lo, hi = bounds[bucket], bounds[bucket + 1]
+        if bucket + 2 < len(bounds):
+            next_lo, next_hi = bounds[bucket + 1], bounds[bucket + 2]
+        else:
+            next_lo, next_hi = n - 1, n
+        mean_x, mean_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+
+        area = np.abs(
+            (x[previous] - mean_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (mean_y - y[previous])
+        )
+        previous = lo + int(area.argmax())
+        indices[bucket + 1] = previous
+    return indices
+
+
+def min_max_indices(values, points: int) -> np.ndarray:
+    """
+    Keep the minimum and maximum of each of points // 2 equal buckets, so every spike survives.
+    Args:
+        values: the series values
+        points (int): number of points to keep at most
+    Returns:
+        np.ndarray: sorted indices of the kept points
+    """
+    y = np.asarray(values, dtype=float)
+    n = len(y)
+    if points >= n or points < 2:
+        return np.arange(n)
+
+    indices = []
+    for bucket in np.array_split(np.arange(n), points // 2):
+        indices.extend({bucket[y[bucket].argmin()], bucket[y[bucket].argmax()]})
+    return np.array(sorted(indices), dtype=np.int64)
+
+
+DOWNSAMPLE_METHODS = {"lttb": lttb_indices, "minmax": min_max_indices}
+
+
+def downsample_indices(values, points: int, method: str = "lttb") -> np.ndarray:
+    """Indices of at most points values of an evenly spaced series, see DOWNSAMPLE_METHODS."""
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"method must be one of {', '.join(DOWNSAMPLE_METHODS)}")
+    return DOWNSAMPLE_METHODS[method](values, points)
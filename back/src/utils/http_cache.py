@@ -0,0 +1,133 @@
+import hashlib
+from datetime import date, datetime
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import g, make_response, redirect, request
+
+from ..database.data_version import fetch_data_versions
+from ..utils.logger import logger
+
+# Query argument pinning a response to the data versions it was built from
+VERSION_ARG = "v"
+IMMUTABLE_MAX_AGE = 31536000
+
+
+def make_etag(versions: dict, *parts) -> str:
+    """
+    Build a strong ETag from a data version vector and any extra request-specific parts.
+    """
+    vector = ",".join(f"{table}:{versions[table]['version']}" for table in sorted(versions))
+    payload = "|".join([vector, *(str(p) for p in parts)])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def version_token(versions: dict) -> str:
+    """The value of the version argument for a data version vector, e.g. "12"."""
+    return "-".join(str(versions[table]["version"]) for table in sorted(versions))
+
+
+def versioned_path(token: str) -> str:
+    """The current request's path and arguments with the version argument set to token."""
+    args = request.args.to_dict(flat=False)
+    args[VERSION_ARG] = [token]
+    return f"{request.path}?{urlencode(args, doseq=True)}"
+
+
+def request_validators(versions: dict, daily: bool = False):
+    """
+    ETag and Last-Modified (or None) of the current request for a data version vector,
+    both moving on at midnight for daily payloads.
+    """
+    parts = [request.full_path]
+    modified_times = [v["updated_at"] for v in versions.values() if v["updated_at"]]
+    if daily:
+        today = date.today()
+        parts.append(today.isoformat())
+        modified_times.append(datetime.combine(today, datetime.min.time()))
+
+    last_modified = max(modified_times).replace(microsecond=0) if modified_times else None
+    return make_etag(versions, *parts), last_modified
+
+
+def conditional_on(*tables, daily: bool = False, policy=None):
+    """
+    Decorator for GET endpoints whose payload only depends on the request arguments
+    and on the contents of the given tables.
+
+    Answers with 304 Not Modified, without calling the view, when the client's
+    If-None-Match or If-Modified-Since still matches the current data versions.
+    Successful responses get an ETag and Last-Modified header.
+
+    For pinned requests the URL may carry the current data versions in a "v" argument:
+    a matching version is served as immutable, a mismatched one is redirected to the
+    current version, and without one the response points at its versioned URL in
+    Content-Location and is revalidated like any other.
+
+    Args:
+        tables: table names whose data_versions counters the payload depends on
+        daily: set when the payload also depends on today's date (e.g. "current quarter"),
+            so cached responses expire at midnight
+        policy: optional callable returning (tables, daily, pinned) for the current request,
+            overriding the arguments above; pinned marks a payload that only changes
+            when the tables do, never with the date
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request_tables, request_daily, pinned = tables, daily, False
+            if policy is not None:
+                request_tables, request_daily, pinned = policy()
+
+            try:
+                versions = fetch_data_versions(request_tables)
+            except Exception as e:
+                logger.warning(f"Could not read data versions, serving uncached: {e}")
+                return view(*args, **kwargs)
+
+            token = version_token(versions) if pinned and not request_daily else None
+            requested = request.args.get(VERSION_ARG)
+            if token is not None and requested is not None and requested != token:
+                response = redirect(versioned_path(token))
+                response.cache_control.no_cache = True
+                return response
+
+            etag, last_modified = request_validators(versions, request_daily)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = (
+                    last_modified is not None
+                    and request.if_modified_since is not None
+                    and request.if_modified_since.replace(tzinfo=None) >= last_modified
+                )
+
+            if not_modified:
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                # Stale snapshots must not be stored under the current version's ETag
+                if response.status_code != 200 or g.get("stale_response"):
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            if token is not None and requested is not None:
+                # A correction bumps the version and so moves the payload to another URL
+                response.cache_control.public = True
+                response.cache_control.max_age = IMMUTABLE_MAX_AGE
+                response.cache_control.immutable = True
+                return response
+
+            if token is not None:
+                response.headers["Content-Location"] = versioned_path(token)
+            # Let clients keep the payload but always revalidate it
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
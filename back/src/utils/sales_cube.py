@@ -0,0 +1,321 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+
+from .. import config
+from ..database.data_version import fetch_data_versions
+from ..database.sales import query_rollup_cells
+from .logger import logger
+
+MEASURES = ("quantity", "revenue", "transactions")
+CUBE_ENABLED = config.get("cube.enabled", False)
+CUBE_PATH = Path(config.get("cube.path", "/tmp/dtwin-sales-cube"))
+META_FILE = "meta.json"
+
+# Bucket starts of SalesCube.rollup, as numpy datetime64 units
+ROLLUP_UNITS = {"day": "D", "month": "M", "year": "Y"}
+
+
+class SalesCube:
+    """
+    Read-only product x day view of the daily sales rollup, memory-mapped from one generation
+    file shared by every worker process. Quantity and transactions are counts and revenue is
+    stored in cents, so sums are exact; revenue is returned in euros.
+    A basket with several products counts as a transaction of each of them, so the
+    transactions of all products per day are kept separately in day_transactions.
+    """
+
+    def __init__(self, directory: Path, meta: dict):
+        self.file = directory / meta["file"]
+        self.generation = meta["generation"]
+        self.cursor = meta["cursor"]
+        self.first_day = np.datetime64(meta["first_day"], "D")
+        self.product_ids = np.asarray(meta["product_ids"], dtype=np.int64)
+        # Shape (measure, product, day)
+        self.data = np.load(self.file, mmap_mode="r")
+        # Shape (day,), the transactions of all products per day
+        self.day_transactions = np.load(directory / meta["day_file"], mmap_mode="r")
+
+    @property
+    def days(self) -> np.ndarray:
+        return self.first_day + np.arange(self.data.shape[2])
+
+    def _day_window(self, start=None, end=None) -> slice:
+        n = self.data.shape[2]
+        lo = 0 if start is None else int((np.datetime64(start, "D") - self.first_day).astype(int))
+        hi = n if end is None else int((np.datetime64(end, "D") - self.first_day).astype(int)) + 1
+        return slice(min(max(lo, 0), n), min(max(hi, 0), n))
+
+    def _product_rows(self, product_ids) -> np.ndarray:
+        if product_ids is None:
+            return np.arange(len(self.product_ids))
+        product_ids = np.atleast_1d(np.asarray(product_ids, dtype=np.int64))
+        rows = np.searchsorted(self.product_ids, product_ids)
+        known = (rows < len(self.product_ids)) & (
+            self.product_ids[np.minimum(rows, len(self.product_ids) - 1)] == product_ids
+        )
+        if not known.all():
+            raise KeyError(f"Unknown product ids: {product_ids[~known].tolist()}")
+        return rows
+
+    @staticmethod
+    def _scale(measure: str, values):
+        return values / 100 if measure == "revenue" else values
+
+    def select(self, measure: str, start=None, end=None, product_ids=None) -> np.ndarray:
+        """Product x day values of start..end (inclusive), one row per requested product."""
+        window = self._day_window(start, end)
+        rows = self._product_rows(product_ids)
+        return self._scale(measure, self.data[MEASURES.index(measure), rows, window])
+
+    def _daily_values(self, measure: str, window: slice, rows=slice(None)) -> np.ndarray:
+        if measure == "transactions":
+            return np.asarray(self.day_transactions[window])
+        return self.data[MEASURES.index(measure), rows, window].sum(axis=0)
+
+    def daily(self, measure: str, start=None, end=None, product_ids=None) -> np.ndarray:
+        """
+        Per-day totals over the given products (all by default). Transactions are only
+        available over all products, a basket can hold several of the given products.
+        """
+        if measure == "transactions" and product_ids is not None:
+            raise ValueError("Transactions can only be totalled over all products")
+        window = self._day_window(start, end)
+        return self._scale(
+            measure, self._daily_values(measure, window, self._product_rows(product_ids))
+        )
+
+    def totals(self, measure: str, start=None, end=None) -> np.ndarray:
+        """Per-product totals over start..end, in the order of product_ids."""
+        values = self.data[MEASURES.index(measure), :, self._day_window(start, end)]
+        return self._scale(measure, values.sum(axis=1))
+
+    def product_series(self, product_id: int, measure: str, start=None, end=None):
+        """Daily values of one product."""
+        return self.select(measure, start, end, [product_id])[0]
+
+    def rollup(self, measure: str, start=None, end=None, granularity: str = "month"):
+        """
+        Totals of all products per day, month or year bucket.
+        Returns:
+            (bucket starts as datetime64[D], totals) for the buckets overlapping start..end
+        """
+        if granularity not in ROLLUP_UNITS:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        window = self._day_window(start, end)
+        days = self.days[window]
+        if not len(days):
+            return days, self.daily(measure, start, end)
+
+        buckets = days.astype(f"datetime64[{ROLLUP_UNITS[granularity]}]")
+        edges = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        values = self._daily_values(measure, window)
+        return buckets[edges].astype("datetime64[D]"), self._scale(
+            measure, np.add.reduceat(values, edges)
+        )
+
+    def daily_frame(self, start=None, end=None) -> pd.DataFrame:
+        """
+        Daily series of start..end like query_daily_series: timestamp, quantity, revenue and
+        transactions, leaving out the days without sales.
+        """
+        window = self._day_window(start, end)
+        totals = self.data[:, :, window].sum(axis=1)
+        transactions = np.asarray(self.day_transactions[window])
+        sold = transactions > 0
+        return pd.DataFrame(
+            {
+                "timestamp": self.days[window][sold].astype("datetime64[ns]"),
+                "quantity": totals[MEASURES.index("quantity")][sold],
+                "revenue": totals[MEASURES.index("revenue")][sold] / 100,
+                "transactions": transactions[sold],
+            }
+        )
+
+
+# This process' view of the newest generation
+_current = None
+_current_lock = threading.Lock()
+# Held while this process refreshes the cube in the background
+_refreshing = threading.Lock()
+
+
+def _read_meta(directory: Path) -> dict | None:
+    try:
+        with open(directory / META_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def open_sales_cube(directory: Path = CUBE_PATH) -> SalesCube | None:
+    """Return the newest published generation of the cube, or None if it was never built."""
+    global _current  # pylint: disable=global-statement
+    meta = _read_meta(directory)
+    if meta is None:
+        return None
+    with _current_lock:
+        if _current is None or _current.file != directory / meta["file"]:
+            _current = SalesCube(directory, meta)
+        return _current
+
+
+@contextmanager
+def _writer_lock(directory: Path):
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "lock", "w", encoding="utf-8") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write_array(path: Path, data: np.ndarray):
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.int64, shape=data.shape)
+    out[...] = data
+    out.flush()
+    del out
+
+
+def _publish(directory: Path, meta: dict, data: np.ndarray, day_transactions: np.ndarray):
+    """Write a new generation and atomically make it the current one."""
+    _write_array(directory / meta["file"], data)
+    _write_array(directory / meta["day_file"], day_transactions)
+
+    tmp = directory / f"{META_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, directory / META_FILE)
+
+    # Processes still mapping an old generation keep reading it until they reopen
+    for old in [*directory.glob("cube-*.npy"), *directory.glob("days-*.npy")]:
+        if old.name not in (meta["file"], meta["day_file"]):
+            old.unlink(missing_ok=True)
+
+
+def _cell_columns(cells):
+    if not cells:
+        return np.empty(0, "datetime64[D]"), np.empty(0, np.int64), np.empty((3, 0), np.int64)
+    return (
+        np.array([c.day for c in cells], dtype="datetime64[D]"),
+        np.array([c.product_id for c in cells], dtype=np.int64),
+        np.array(
+            [
+                [c.quantity for c in cells],
+                [c.revenue_cents for c in cells],
+                [c.transactions for c in cells],
+            ],
+            dtype=np.int64,
+        ),
+    )
+
+
+def refresh_sales_cube(directory: Path = CUBE_PATH) -> SalesCube:
+    """
+    Bring the cube up to date with the daily rollup and publish it as a new generation.
+    Only the days changed since the cube's cursor are read from the database; the cube is
+    rebuilt from scratch on first use or after the sales history was replaced.
+    One process refreshes at a time, the others wait and reuse its result.
+    """
+    with _writer_lock(directory):
+        current = open_sales_cube(directory)
+        changes = query_rollup_cells(current.cursor if current else 0)
+        if current is not None and not changes["reset"] and changes["cursor"] == current.cursor:
+            return current
+
+        days, products, values = _cell_columns(changes["cells"])
+        transaction_days = np.array(
+            [row.day for row in changes["day_transactions"]], dtype="datetime64[D]"
+        )
+        incremental = current is not None and changes["days"] is not None
+        changed_days = np.array(changes["days"] or [], dtype="datetime64[D]")
+
+        # Dimensions grow to cover new products and days, up to today
+        day_bounds = [np.datetime64(date.today(), "D"), *days[:1], *days[-1:]]
+        product_ids = np.unique(products)
+        if incremental:
+            day_bounds += [current.first_day, current.days[-1]] if current.data.shape[2] else []
+            day_bounds += [changed_days.min(), changed_days.max()] if len(changed_days) else []
+            product_ids = np.union1d(current.product_ids, product_ids)
+        first_day = min(day_bounds)
+        n_days = int((max(day_bounds) - first_day).astype(int)) + 1
+        data = np.zeros((len(MEASURES), len(product_ids), n_days), dtype=np.int64)
+        day_transactions = np.zeros(n_days, dtype=np.int64)
+
+        if incremental:
+            rows = np.searchsorted(product_ids, current.product_ids)
+            offset = int((current.first_day - first_day).astype(int))
+            data[:, rows, offset : offset + current.data.shape[2]] = current.data
+            day_transactions[offset : offset + current.data.shape[2]] = current.day_transactions
+            data[:, :, (changed_days - first_day).astype(int)] = 0
+            day_transactions[(changed_days - first_day).astype(int)] = 0
+
+        data[:, np.searchsorted(product_ids, products), (days - first_day).astype(int)] = values
+        day_transactions[(transaction_days - first_day).astype(int)] = [
+            row.transactions for row in changes["day_transactions"]
+        ]
+
+        generation = (current.generation if current else 0) + 1
+        meta = {
+            "generation": generation,
+            "file": f"cube-{generation}.npy",
+            "day_file": f"days-{generation}.npy",
+            "cursor": changes["cursor"],
+            "first_day": str(first_day),
+            "product_ids": product_ids.tolist(),
+        }
+        _publish(directory, meta, data, day_transactions)
+        logger.info(
+            f"Sales cube generation {generation}: {data.shape[1]} products x {data.shape[2]} days,"
+            f" {len(changes['cells'])} cells read"
+        )
+        return open_sales_cube(directory)
+
+
+def _refresh_in_background(app):
+    try:
+        with app.app_context():
+            refresh_sales_cube()
+    except Exception as e:
+        logger.warning(f"Sales cube refresh failed: {e}")
+    finally:
+        _refreshing.release()
+
+
+def current_sales_cube() -> SalesCube | None:
+    """
+    Return the cube if it is up to date with the daily rollup. Costs one data version lookup.
+    A stale or missing cube is refreshed in a background thread, never inside the request,
+    and None is returned meanwhile.
+    Returns None when the cube is disabled, stale or cannot be built, callers then query SQL.
+    """
+    if not CUBE_ENABLED:
+        return None
+    try:
+        cube = open_sales_cube()
+        version = fetch_data_versions(["sales_rollup"]).get("sales_rollup", {}).get("version", 0)
+        if cube is not None and cube.cursor == version:
+            return cube
+        if _refreshing.acquire(blocking=False):  # pylint: disable=consider-using-with
+            try:
+                threading.Thread(
+                    target=_refresh_in_background,
+                    args=(current_app._get_current_object(),),  # pylint: disable=protected-access
+                    daemon=True,
+                ).start()
+            except Exception:
+                _refreshing.release()
+                raise
+        return None
+    except Exception as e:
+        logger.warning(f"Sales cube unavailable, querying the database instead: {e}")
+        return None
@@ -0,0 +1,118 @@
+import threading
+from datetime import date
+
+from flask import current_app, g, has_request_context
+
+from .. import config
+from ..database.data_version import data_version_key
+from ..database.snapshot_db import get_snapshot, lock_snapshot, prune_snapshots, save_snapshot
+from ..extensions import db
+from .logger import logger
+
+# Snapshots kept per family of keys like "dashboard:<as_of>", least recently built are dropped
+MAX_VARIANTS = config.get("snapshots.max_variants", 60)
+
+# Keys with a background refresh running in this process
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def snapshot_version(tables, daily: bool = False) -> str:
+    """
+    Version string a snapshot is valid for: the data versions of the tables it is built from,
+    plus today's date for payloads that depend on the calendar.
+    """
+    version = data_version_key(tables)
+    if daily:
+        version += "|" + date.today().isoformat()
+    return version
+
+
+def rebuild_snapshot(key: str, data_version: str, build, wait: bool = True):
+    """
+    Rebuild and store a snapshot under the single-writer lock of its key.
+    A key "<family>:<variant>" also drops the oldest snapshots of its family beyond MAX_VARIANTS.
+    Args:
+        key: snapshot key
+        data_version: version string the new snapshot is built for
+        build: callable returning the JSON-serializable payload
+        wait: wait for a concurrent rebuild to finish instead of giving up
+    Returns:
+        The payload, or None if wait is False and another worker holds the lock.
+    """
+    try:
+        if not lock_snapshot(key, wait=wait):
+            db.session.rollback()
+            return None
+
+        # Another worker may have stored this version while we waited for the lock
+        snapshot = get_snapshot(key)
+        if snapshot is not None and snapshot["data_version"] == data_version:
+            db.session.commit()
+            return snapshot["payload"]
+
+        payload = build()
+        save_snapshot(key, payload, data_version)
+        family, separator, _ = key.partition(":")
+        if separator:
+            prune_snapshots(family + separator, MAX_VARIANTS)
+        db.session.commit()
+        return payload
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _refresh_in_background(app, key: str, data_version: str, build):
+    with app.app_context():
+        try:
+            rebuild_snapshot(key, data_version, build, wait=False)
+        except Exception as e:
+            logger.error(f"Background refresh of snapshot '{key}' failed: {e}")
+        finally:
+            db.session.remove()
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+
+def schedule_refresh(key: str, data_version: str, build):
+    """Start a background rebuild of key unless this process is already rebuilding it."""
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    threading.Thread(
+        target=_refresh_in_background, args=(app, key, data_version, build), daemon=True
+    ).start()
+
+
+def get_shared_snapshot(key: str, tables, build, daily: bool = False):
+    """
+    Return the payload of a snapshot shared by all workers, with stale-while-revalidate semantics.
+
+    - Current snapshot: returned as is.
+    - Outdated snapshot: returned as is while one worker rebuilds it in the background.
+      The request is flagged in flask.g so HTTP caching does not store the stale payload.
+    - No snapshot: built synchronously by one worker; the others wait for it and reuse it.
+
+    Falls back to calling build() directly if the snapshot tables cannot be read.
+    """
+    try:
+        data_version = snapshot_version(tables, daily)
+        snapshot = get_snapshot(key)
+    except Exception as e:
+        logger.warning(f"Snapshot store unavailable, building '{key}' directly: {e}")
+        return build()
+
+    if snapshot is None:
+        return rebuild_snapshot(key, data_version, build, wait=True)
+
+    if snapshot["data_version"] != data_version:
+        schedule_refresh(key, data_version, build)
+        if has_request_context():
+            g.stale_response = True
+
+    return snapshot["payload"]
@@ -0,0 +1,139 @@
+import threading
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import chart_service
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+SEPTEMBER = (date(2025, 9, 1), date(2025, 9, 30))
+
+
+@pytest.fixture
+def charts(monkeypatch):
+    """Chart service with an empty cache, a fixed data version and a counting daily query."""
+    state = {"version": "sales:1", "windows": []}
+
+    def query_daily_revenue(start, end):
+        state["windows"].append((start, end))
+        days = (end - start).days + 1
+        return [
+            SimpleNamespace(
+                date=datetime.combine(start + timedelta(days=day), datetime.min.time()),
+                revenue=100.0 * (day % 30),
+                average_7d=50.0,
+                has_sales=True,
+            )
+            for day in range(days)
+        ]
+
+    chart_service.clear_chart_cache()
+    monkeypatch.setattr(chart_service, "data_version_key", lambda tables: state["version"])
+    monkeypatch.setattr(chart_service, "query_daily_revenue", query_daily_revenue)
+    yield state
+    chart_service.clear_chart_cache()
+
+
+def test_month_window_covers_exactly_the_month():
+    assert chart_service.month_window("2024-02") == (date(2024, 2, 1), date(2024, 2, 29))
+
+    with pytest.raises(ValueError):
+        chart_service.month_window("not a month")
+
+
+def test_render_revenue_chart_returns_png():
+    dates = [datetime(2025, 9, day) for day in range(1, 4)]
+
+    image = chart_service.render_revenue_chart(dates, [1.0, 2.0, 3.0], [1.0, 1.5, 2.0], "bar")
+
+    assert image.startswith(PNG_SIGNATURE)
+
+
+def test_revenue_chart_queries_only_the_requested_month(charts):
+    image = chart_service.revenue_chart_png(*SEPTEMBER)
+
+    assert image.startswith(PNG_SIGNATURE)
+    assert charts["windows"] == [(date(2025, 9, 1), date(2025, 9, 30))]
+
+
+def test_long_ranges_are_downsampled_before_drawing(charts, monkeypatch):
+    drawn = []
+    render = chart_service.render_revenue_chart
+
+    def counting_render(dates, revenue, average, graph_type):
+        drawn.append(len(dates))
+        return render(dates, revenue, average, graph_type)
+
+    monkeypatch.setattr(chart_service, "render_revenue_chart", counting_render)
+
+    chart_service.revenue_chart_png(date(2020, 1, 1), date(2025, 12, 31), points=200)
+
+    assert drawn == [200]
+
+
+def test_revenue_chart_without_sales_is_none(charts, monkeypatch):
+    day = SimpleNamespace(date=datetime(2025, 9, 1), revenue=0, average_7d=0, has_sales=False)
+    monkeypatch.setattr(chart_service, "query_daily_revenue", lambda start, end: [day])
+
+    assert chart_service.revenue_chart_png(*SEPTEMBER) is None
+
+
+def test_revenue_chart_is_cached_until_sales_change(charts):
+    first = chart_service.revenue_chart_png(*SEPTEMBER)
+    assert chart_service.revenue_chart_png(*SEPTEMBER) == first
+    assert len(charts["windows"]) == 1
+
+    chart_service.revenue_chart_png(*SEPTEMBER, "bar")
+    assert len(charts["windows"]) == 2
+
+    charts["version"] = "sales:2"
+    chart_service.revenue_chart_png(*SEPTEMBER)
+    assert len(charts["windows"]) == 3
+
+
+def test_concurrent_requests_share_one_render(charts, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    render = chart_service.render_revenue_chart
+
+    def slow_render(*args):
+        started.set()
+        release.wait(5)
+        return render(*args)
+
+    monkeypatch.setattr(chart_service, "render_revenue_chart", slow_render)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(chart_service.revenue_chart_png(*SEPTEMBER)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == 4
+    assert len(set(results)) == 1
+    assert len(charts["windows"]) == 1
+
+
+def test_failed_render_is_not_cached(charts, monkeypatch):
+    def failing_query(start, end):
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(chart_service, "query_daily_revenue", failing_query)
+    with pytest.raises(RuntimeError):
+        chart_service.revenue_chart_png(*SEPTEMBER)
+
+    monkeypatch.undo()
+    monkeypatch.setattr(chart_service, "data_version_key", lambda tables: charts["version"])
+    monkeypatch.setattr(chart_service, "query_daily_revenue", lambda start, end: [])
+    assert chart_service.revenue_chart_png(*SEPTEMBER) is None
+
+
+def test_revenue_chart_rejects_unknown_graph_type(charts):
+    with pytest.raises(ValueError):
+        chart_service.revenue_chart_png(*SEPTEMBER, "pie")
@@ -324,3 +324,21 @@ def test_extract_metrics_generic_failure(agent):
 
     res = agent._extract_key_metrics(AngryObject(), "sales")
     assert "error" in res
+
+
+def test_base_data_items_get_product_names(agent):
+    products = {3: {"name": "Mango", "price": 2.5}}
+    with (
+        patch.object(agent, "_get_base_data") as mock_get,
+        patch("src.services.counterfactual_agent.get_product_dimension", return_value=products),
+    ):
+        mock_get.return_value = {
+            "data": [{"product_id": 3, "amount": 10}, {"product_id": 99, "amount": 1}]
+        }
+        response = agent.handle_counterfactual_request(
+            {"base_query": "inventory", "analysis_type": "storage", "modifications": {}}
+        )
+
+    assert response["status"] == "success"
+    assert mock_get.return_value["data"][0]["product_name"] == "Mango"
+    assert "product_name" not in mock_get.return_value["data"][1]
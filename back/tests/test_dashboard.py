@@ -0,0 +1,198 @@
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from ..src.utils import dashboard
+
+
+class FixedDatetime(datetime):
+    @classmethod
+    def today(cls):
+        return cls(2025, 5, 15)
+
+
+@pytest.fixture(autouse=True)
+def fixed_today(monkeypatch):
+    monkeypatch.setattr(dashboard, "datetime", FixedDatetime)
+
+
+@pytest.fixture(autouse=True)
+def without_sales_cube(monkeypatch):
+    monkeypatch.setattr(dashboard, "current_sales_cube", lambda: None)
+
+
+def make_rows(start="2024-01-01", end="2025-05-15"):
+    """One row per day: quantity 2, revenue 10.5 and one transaction."""
+    rows = []
+    day = datetime.strptime(start, "%Y-%m-%d")
+    last = datetime.strptime(end, "%Y-%m-%d")
+    while day <= last:
+        rows.append((day, 2, 10.5, 1))
+        day += timedelta(days=1)
+    return rows
+
+
+def make_df(rows):
+    df = pd.DataFrame.from_records(
+        rows, columns=["timestamp", "quantity", "revenue", "transactions"]
+    )
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df
+
+
+def test_fetch_dashboard_data_runs_one_query(monkeypatch):
+    calls = []
+
+    def fake_query_daily_series(start, end):
+        calls.append((start, end))
+        return make_rows()
+
+    monkeypatch.setattr(dashboard, "query_daily_series", fake_query_daily_series)
+    monkeypatch.setattr(
+        dashboard, "get_shared_snapshot", lambda key, tables, build, daily=False: build()
+    )
+
+    data = dashboard.fetch_dashboard_data()
+
+    assert calls == [("2024-01-01", "2025-05-15")]
+    assert set(data) == {"revenue", "sales", "transactions"}
+    for dataset in data.values():
+        assert set(dataset) == {"current_quarter", "previous_quarter", "ytd", "raw_graph_data"}
+        assert set(dataset["raw_graph_data"]) == {"current_quarter", "previous_quarter", "ytd"}
+
+
+def test_build_dataset_totals_and_growth():
+    df = make_df(make_rows())
+
+    result = dashboard.build_dataset(df, "transactions")
+
+    # 2025-04-01 .. 2025-05-15 is 45 days, the comparable slice 2025-01-01 .. 2025-02-14 is 45
+    assert result["current_quarter"] == {"amount": 45, "growth": 0.0}
+    # Q1 2025 has 90 days, Q4 2024 has 92
+    assert result["previous_quarter"] == {"amount": 90, "growth": round(90 / 92 - 1, 2)}
+    # 2025-01-01 .. 2025-05-15 is 135 days, 2024-01-01 .. 2024-05-14 is 135 days
+    assert result["ytd"] == {"amount": 135, "growth": 0.0}
+
+
+def test_build_dataset_rounds_revenue_totals():
+    rows = [(day, 2, 9.99, 1) for day, _, _, _ in make_rows()]
+    df = make_df(rows)
+
+    result = dashboard.build_dataset(df, "revenue")
+
+    # 45 * 9.99 is 449.55, which truncation would turn into 449
+    assert result["current_quarter"]["amount"] == 450
+    assert isinstance(result["current_quarter"]["amount"], int)
+
+
+def test_build_datasets_matches_single_column_builds():
+    df = make_df(make_rows())
+
+    combined = dashboard.build_datasets(df, ["revenue", "quantity"])
+
+    assert combined["revenue"] == dashboard.build_dataset(df, "revenue")
+    assert combined["quantity"] == dashboard.build_dataset(df, "quantity")
+
+
+def test_create_graph_data_buckets_by_interval():
+    df = make_df(make_rows("2025-01-01", "2025-03-31"))
+
+    monthly = dashboard.create_graph_data(df, "2025-01-01", "2025-03-31", "revenue", "month")
+    assert monthly == [325.5, 294.0, 325.5]
+
+    weekly = dashboard.create_graph_data(df, "2025-01-01", "2025-01-31", "quantity", "week")
+    # 2025-01-01 is a Wednesday in ISO week 1, so the first bucket has five days
+    assert weekly[0] == 10
+    assert all(isinstance(value, int) for value in weekly)
+
+
+def test_create_graph_data_leaves_out_empty_buckets():
+    rows = make_rows("2025-01-01", "2025-01-31") + make_rows("2025-03-01", "2025-03-31")
+    df = make_df(rows)
+
+    monthly = dashboard.create_graph_data(df, "2025-01-01", "2025-03-31", "transactions", "month")
+    assert monthly == [31, 31]
+
+
+def test_create_graph_data_rejects_unknown_interval():
+    df = make_df(make_rows("2025-01-01", "2025-01-31"))
+
+    with pytest.raises(ValueError):
+        dashboard.create_graph_data(df, "2025-01-01", "2025-01-31", "revenue", "fortnight")
+
+
+def test_create_sales_data_as_of_queries_up_to_that_day(monkeypatch):
+    calls = []
+
+    def fake_query_daily_series(start, end):
+        calls.append((start, end))
+        return make_rows("2023-01-01", "2024-03-01")
+
+    monkeypatch.setattr(dashboard, "query_daily_series", fake_query_daily_series)
+
+    dashboard.create_sales_data(as_of=date(2024, 3, 1))
+
+    assert calls == [("2023-01-01", "2024-03-01")]
+
+
+def test_build_datasets_as_of_matches_building_on_that_day():
+    df = make_df(make_rows())
+
+    # FixedDatetime makes "today" 2025-05-15
+    assert dashboard.build_datasets(df, ["revenue"], as_of=date(2025, 5, 15)) == (
+        dashboard.build_datasets(df, ["revenue"])
+    )
+    earlier = dashboard.build_datasets(df, ["transactions"], as_of=date(2025, 2, 10))
+    # 2025-01-01 .. 2025-02-10 is 41 days
+    assert earlier["transactions"]["current_quarter"]["amount"] == 41
+
+
+@pytest.mark.parametrize(
+    "as_of, key, tables, daily",
+    [
+        (None, "dashboard", ["sales"], True),
+        (date(2025, 5, 15), "dashboard", ["sales"], True),
+        (date(2025, 3, 31), "dashboard:2025-03-31", ["sales_history"], False),
+    ],
+)
+def test_fetch_dashboard_data_snapshot_per_as_of(monkeypatch, as_of, key, tables, daily):
+    snapshots = []
+    monkeypatch.setattr(
+        dashboard,
+        "get_shared_snapshot",
+        lambda key, tables, build, daily=False: snapshots.append((key, tables, daily)),
+    )
+
+    dashboard.fetch_dashboard_data(as_of)
+
+    assert snapshots == [(key, tables, daily)]
+
+
+@pytest.mark.parametrize("as_of", [date(2025, 5, 16), date(2025, 5, 14), date(2025, 3, 15)])
+def test_fetch_dashboard_data_rejects_other_as_of_days(monkeypatch, as_of):
+    monkeypatch.setattr(dashboard, "get_shared_snapshot", MagicMock())
+
+    with pytest.raises(ValueError):
+        dashboard.fetch_dashboard_data(as_of)
+    dashboard.get_shared_snapshot.assert_not_called()
+
+
+def test_month_that_ended_yesterday_is_not_closed(monkeypatch):
+    class FirstOfMonth(datetime):
+        @classmethod
+        def today(cls):
+            return cls(2025, 6, 1)
+
+    monkeypatch.setattr(dashboard, "datetime", FirstOfMonth)
+    snapshots = []
+    monkeypatch.setattr(
+        dashboard,
+        "get_shared_snapshot",
+        lambda key, tables, build, daily=False: snapshots.append((key, tables, daily)),
+    )
+
+    dashboard.fetch_dashboard_data(date(2025, 5, 31))
+
+    assert snapshots == [("dashboard:2025-05-31", ["sales"], False)]
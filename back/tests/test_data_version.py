@@ -0,0 +1,39 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+
+@patch("src.database.data_version.db")
+def test_fetch_data_versions_maps_rows(mock_db):
+    from src.database.data_version import fetch_data_versions
+
+    updated = datetime(2025, 1, 1)
+    mock_db.session.execute.return_value.mappings.return_value.all.return_value = [
+        {"table_name": "sales", "version": 7, "updated_at": updated}
+    ]
+
+    assert fetch_data_versions(["sales"]) == {"sales": {"version": 7, "updated_at": updated}}
+
+
+@patch("src.database.data_version.db")
+def test_data_version_key_is_sorted_and_defaults_missing_tables(mock_db):
+    from src.database.data_version import data_version_key
+
+    mock_db.session.execute.return_value.mappings.return_value.all.return_value = [
+        {"table_name": "sales", "version": 3, "updated_at": None}
+    ]
+
+    assert data_version_key(["sales", "customers"]) == "customers:0,sales:3"
+
+
+@patch("src.database.data_version.db")
+def test_fetch_data_versions_rolls_back_on_error(mock_db):
+    from src.database.data_version import fetch_data_versions
+
+    mock_db.session.execute.side_effect = Exception("SQL failed")
+
+    with pytest.raises(Exception):
+        fetch_data_versions(["sales"])
+
+    mock_db.session.rollback.assert_called_once()
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from src.utils.downsample import downsample_indices, lttb_indices, min_max_indices
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    values = np.sin(np.linspace(0, 20, 2000))
+    values[1234] = 10.0
+
+    indices = lttb_indices(values, 100)
+
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 1999
+    assert np.all(np.diff(indices) > 0)
+    assert 1234 in indices
+
+
+def test_lttb_returns_short_series_unchanged():
+    assert list(lttb_indices([3, 1, 2], 10)) == [0, 1, 2]
+
+
+def test_min_max_keeps_extremes_of_every_bucket():
+    values = np.arange(100, dtype=float)
+    values[37] = -5.0
+
+    indices = min_max_indices(values, 10)
+
+    assert len(indices) <= 10
+    assert np.all(np.diff(indices) > 0)
+    assert 37 in indices and 99 in indices
+
+
+def test_downsample_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        downsample_indices([1, 2, 3], 2, method="average")
@@ -0,0 +1,170 @@
+import io
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.index import app
+from src.routes import export_route
+
+PRODUCTS = {1: {"name": "Milk", "price": 1.5}}
+
+
+def sales_frame(*hours):
+    return pd.DataFrame(
+        {
+            "date": [datetime(2025, 1, 1, hour) for hour in hours],
+            "product_id": [1] * len(hours),
+            "quantity": [2] * len(hours),
+            "transaction_id": [f"t{hour}" for hour in hours],
+            "amount": [3.0] * len(hours),
+        }
+    )
+
+
+@pytest.fixture()
+def client():
+    app.config.update(TESTING=True, LOGIN_DISABLED=True)
+    yield app.test_client()
+    app.config.update(LOGIN_DISABLED=False)
+
+
+@pytest.fixture()
+def exported(monkeypatch):
+    """Sales source yielding two chunks, recording the arguments it was called with."""
+    calls = []
+
+    def iter_sales_frames(start, end, product_id, chunk_size):
+        calls.append((start, end, product_id))
+        yield sales_frame(9, 10)
+        yield sales_frame(11)
+
+    monkeypatch.setitem(
+        export_route.EXPORT_SOURCES, "sales", (iter_sales_frames, export_route.empty_sales_frame)
+    )
+    monkeypatch.setattr(export_route, "get_product_dimension", lambda: PRODUCTS)
+    monkeypatch.setattr(
+        export_route, "resolve_product_id", lambda product: 1 if product == "milk" else None
+    )
+    return calls
+
+
+def test_export_requires_login():
+    app.config.update(TESTING=True, LOGIN_DISABLED=False)
+    resp = app.test_client().get("/api/export/sales?start_date=2025-01-01&end_date=2025-01-31")
+    assert resp.status_code == 401
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "start_date=2025-01-01",
+        "start_date=2025-01-31&end_date=2025-01-01",
+        "start_date=2025-01-01&end_date=2025-01-31&format=xlsx",
+        "start_date=2025-01-01&end_date=2025-01-31&source=orders",
+        "start_date=2025-01-01&end_date=2025-01-31&product=bread",
+    ],
+)
+def test_export_rejects_invalid_arguments(client, exported, query):
+    resp = client.get(f"/api/export/sales?{query}")
+    assert resp.status_code == 400
+    assert "error" in resp.get_json()
+    assert not exported
+
+
+def test_export_streams_csv_with_one_header(client, exported):
+    resp = client.get("/api/export/sales?start_date=2025-01-01&end_date=2025-01-31&product=milk")
+
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/csv"
+    assert 'filename="sales_2025-01-01_2025-01-31.csv"' in resp.headers["Content-Disposition"]
+    lines = resp.get_data(as_text=True).splitlines()
+    assert lines[0] == "date,product_id,product_name,quantity,transaction_id,amount"
+    assert len(lines) == 4
+    assert exported == [(datetime(2025, 1, 1), datetime(2025, 1, 31, 23, 59, 59), 1)]
+
+
+def test_export_streams_ndjson(client, exported):
+    resp = client.get("/api/export/sales?start_date=2025-01-01&end_date=2025-01-31&format=ndjson")
+
+    assert resp.status_code == 200
+    records = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [record["transaction_id"] for record in records] == ["t9", "t10", "t11"]
+    assert records[0]["product_name"] == "Milk"
+    assert records[0]["date"].startswith("2025-01-01T09:00:00")
+
+
+def test_export_of_empty_range_is_only_the_header(client, monkeypatch, exported):
+    monkeypatch.setitem(
+        export_route.EXPORT_SOURCES,
+        "sales",
+        (lambda *args: iter([]), export_route.empty_sales_frame),
+    )
+
+    resp = client.get("/api/export/sales?start_date=2025-01-01&end_date=2025-01-31")
+
+    assert resp.status_code == 200
+    assert resp.get_data(as_text=True).splitlines() == [
+        "date,product_id,product_name,quantity,transaction_id,amount"
+    ]
+
+
+def test_export_query_failure_truncates_the_stream(client, monkeypatch, exported):
+    def failing(*args):
+        yield sales_frame(9)
+        raise RuntimeError("database down")
+
+    monkeypatch.setitem(
+        export_route.EXPORT_SOURCES, "sales", (failing, export_route.empty_sales_frame)
+    )
+
+    resp = client.get("/api/export/sales?start_date=2025-01-01&end_date=2025-01-31")
+
+    assert resp.status_code == 200
+    with pytest.raises(RuntimeError):
+        resp.get_data()
+
+
+def test_export_dimension_failure_returns_500(client, monkeypatch, exported):
+    def failing():
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(export_route, "get_product_dimension", failing)
+
+    resp = client.get("/api/export/sales?start_date=2025-01-01&end_date=2025-01-31")
+
+    assert resp.status_code == 500
+    assert "database down" in resp.get_json()["error"]
+
+
+def test_parquet_without_pyarrow_is_not_implemented(client, monkeypatch, exported):
+    monkeypatch.setattr(export_route, "pq", None)
+
+    resp = client.get("/api/export/sales?start_date=2025-01-01&end_date=2025-01-31&format=parquet")
+
+    assert resp.status_code == 501
+
+
+def test_parquet_schema_does_not_depend_on_the_first_chunk(client, monkeypatch, exported):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    def iter_sales_frames(start, end, product_id, chunk_size):
+        unknown = sales_frame(9).assign(product_id=2, amount=None)
+        yield unknown  # product_name and amount are all null
+        yield sales_frame(10)
+
+    monkeypatch.setitem(
+        export_route.EXPORT_SOURCES, "sales", (iter_sales_frames, export_route.empty_sales_frame)
+    )
+
+    resp = client.get("/api/export/sales?start_date=2025-01-01&end_date=2025-01-31&format=parquet")
+
+    table = pq.read_table(io.BytesIO(resp.data))
+    assert str(table.schema.field("product_name").type) == "string"
+    assert table.column("product_name").to_pylist() == [None, "Milk"]
+    assert table.column("amount").to_pylist() == [None, 3.0]
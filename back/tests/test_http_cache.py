@@ -0,0 +1,207 @@
+from datetime import datetime
+
+import pytest
+from flask import Flask, g, jsonify
+
+from ..src.utils import http_cache
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    state = {"sales": {"version": 1, "updated_at": datetime(2025, 1, 1, 12, 0, 0)}}
+    monkeypatch.setattr(http_cache, "fetch_data_versions", lambda tables: dict(state))
+    return state
+
+
+@pytest.fixture
+def client_and_calls(versions):
+    app = Flask(__name__)
+    calls = []
+
+    @app.get("/data")
+    @http_cache.conditional_on("sales")
+    def data():
+        calls.append(1)
+        return jsonify({"ok": True})
+
+    @app.get("/broken")
+    @http_cache.conditional_on("sales")
+    def broken():
+        return jsonify({"error": "boom"}), 500
+
+    return app.test_client(), calls
+
+
+def test_response_has_validators(client_and_calls):
+    client, calls = client_and_calls
+
+    resp = client.get("/data")
+
+    assert resp.status_code == 200
+    assert resp.headers["ETag"]
+    assert resp.headers["Last-Modified"] == "Wed, 01 Jan 2025 12:00:00 GMT"
+    assert "no-cache" in resp.headers["Cache-Control"]
+    assert len(calls) == 1
+
+
+def test_matching_etag_returns_304_without_calling_view(client_and_calls):
+    client, calls = client_and_calls
+    etag = client.get("/data").headers["ETag"]
+
+    resp = client.get("/data", headers={"If-None-Match": etag})
+
+    assert resp.status_code == 304
+    assert resp.data == b""
+    assert len(calls) == 1
+
+
+def test_if_modified_since_returns_304(client_and_calls):
+    client, calls = client_and_calls
+
+    resp = client.get("/data", headers={"If-Modified-Since": "Wed, 01 Jan 2025 12:00:00 GMT"})
+
+    assert resp.status_code == 304
+    assert not calls
+
+
+def test_version_bump_invalidates_etag(client_and_calls, versions):
+    client, calls = client_and_calls
+    etag = client.get("/data").headers["ETag"]
+
+    versions["sales"] = {"version": 2, "updated_at": datetime(2025, 1, 2)}
+    resp = client.get("/data", headers={"If-None-Match": etag})
+
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+    assert len(calls) == 2
+
+
+def test_etag_depends_on_query_string(client_and_calls):
+    client, _ = client_and_calls
+
+    first = client.get("/data?start_date=2025-01-01").headers["ETag"]
+    second = client.get("/data?start_date=2025-02-01").headers["ETag"]
+
+    assert first != second
+
+
+def test_error_responses_are_not_cached(client_and_calls):
+    client, _ = client_and_calls
+
+    resp = client.get("/broken")
+
+    assert resp.status_code == 500
+    assert "ETag" not in resp.headers
+
+
+def test_unreadable_versions_serve_uncached(monkeypatch):
+    def failing_fetch(tables):
+        raise RuntimeError("no table")
+
+    monkeypatch.setattr(http_cache, "fetch_data_versions", failing_fetch)
+    app = Flask(__name__)
+
+    @app.get("/data")
+    @http_cache.conditional_on("sales")
+    def data():
+        return jsonify({"ok": True})
+
+    resp = app.test_client().get("/data")
+
+    assert resp.status_code == 200
+    assert "ETag" not in resp.headers
+
+
+def test_stale_snapshot_responses_get_no_validators(versions):
+    app = Flask(__name__)
+
+    @app.get("/data")
+    @http_cache.conditional_on("sales")
+    def data():
+        g.stale_response = True
+        return jsonify({"ok": True})
+
+    resp = app.test_client().get("/data")
+
+    assert resp.status_code == 200
+    assert "ETag" not in resp.headers
+
+
+def test_policy_selects_tables(monkeypatch):
+    requested = []
+
+    def fetch(tables):
+        requested.append(tuple(tables))
+        return {"sales_history": {"version": 3, "updated_at": datetime(2025, 1, 1)}}
+
+    monkeypatch.setattr(http_cache, "fetch_data_versions", fetch)
+    app = Flask(__name__)
+
+    @app.get("/data")
+    @http_cache.conditional_on(
+        "sales", daily=True, policy=lambda: (("sales_history",), False, False)
+    )
+    def data():
+        return jsonify({"ok": True})
+
+    resp = app.test_client().get("/data")
+
+    assert requested == [("sales_history",)]
+    assert resp.headers["ETag"]
+    # Corrections of past sales must still reach the client
+    assert resp.headers["Cache-Control"] == "no-cache"
+
+
+@pytest.fixture
+def pinned_client(monkeypatch):
+    state = {"sales_history": {"version": 3, "updated_at": datetime(2025, 1, 1)}}
+    monkeypatch.setattr(http_cache, "fetch_data_versions", lambda tables: dict(state))
+    app = Flask(__name__)
+
+    @app.get("/data")
+    @http_cache.conditional_on("sales", policy=lambda: (("sales_history",), False, True))
+    def data():
+        return jsonify({"ok": True})
+
+    return app.test_client(), state
+
+
+def test_pinned_response_without_version_points_at_versioned_url(pinned_client):
+    client, _ = pinned_client
+
+    resp = client.get("/data?as_of=2024-12-31")
+
+    assert resp.headers["Cache-Control"] == "no-cache"
+    assert resp.headers["Content-Location"] == "/data?as_of=2024-12-31&v=3"
+
+
+def test_pinned_response_with_current_version_is_immutable(pinned_client):
+    client, _ = pinned_client
+
+    resp = client.get("/data?as_of=2024-12-31&v=3")
+
+    assert resp.status_code == 200
+    assert resp.headers["ETag"]
+    cache_control = resp.cache_control
+    assert cache_control.public and cache_control.immutable
+    assert cache_control.max_age == 31536000
+
+
+def test_pinned_response_with_outdated_version_redirects(pinned_client):
+    client, state = pinned_client
+    state["sales_history"] = {"version": 4, "updated_at": datetime(2025, 1, 2)}
+
+    resp = client.get("/data?as_of=2024-12-31&v=3")
+
+    assert resp.status_code == 302
+    assert resp.headers["Location"] == "/data?as_of=2024-12-31&v=4"
+    assert resp.headers["Cache-Control"] == "no-cache"
+
+
+def test_unpinned_responses_ignore_version(client_and_calls):
+    client, _ = client_and_calls
+
+    resp = client.get("/data?v=999")
+
+    assert resp.status_code == 200
+    assert resp.headers["Cache-Control"] == "no-cache"
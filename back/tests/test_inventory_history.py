@@ -0,0 +1,76 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+
+def history_rows(*rows):
+    return [SimpleNamespace(day=day, product_id=pid, amount=amount) for day, pid, amount in rows]
+
+
+@patch("src.database.inventory_history.db")
+def test_inventory_at_looks_up_one_product_from_nearest_snapshot(mock_db):
+    from src.database.inventory_history import inventory_at
+
+    mock_db.session.execute.return_value.all.return_value = [
+        SimpleNamespace(product_id=3, amount=42)
+    ]
+
+    assert inventory_at(3, datetime(2025, 3, 1, 12)) == 42
+
+    sql, params = mock_db.session.execute.call_args[0]
+    assert params == {"at": datetime(2025, 3, 1, 12), "product_ids": [3]}
+    assert "inventory_snapshots" in str(sql)
+    assert "product_id = ANY(:product_ids)" in str(sql)
+
+
+@patch("src.database.inventory_history.db")
+def test_inventory_at_unknown_product_is_none(mock_db):
+    from src.database.inventory_history import inventory_at
+
+    mock_db.session.execute.return_value.all.return_value = []
+
+    assert inventory_at(99, datetime(2025, 3, 1)) is None
+
+
+@patch("src.database.inventory_history.inventory_levels_at")
+@patch("src.database.inventory_history.db")
+def test_inventory_levels_walks_back_from_the_end_of_the_range(mock_db, mock_levels_at):
+    from src.database.inventory_history import inventory_levels
+
+    mock_levels_at.return_value = {1: 10, 2: 20}
+    mock_db.session.execute.return_value.all.return_value = history_rows(
+        (date(2025, 3, 2), 1, -3),
+        (date(2025, 3, 3), 1, -2),
+        (date(2025, 3, 3), 2, 5),
+        (date(2025, 3, 3), 7, -1),
+    )
+
+    levels = inventory_levels(date(2025, 3, 1), date(2025, 3, 3))
+
+    assert levels[1].tolist() == [15, 12, 10]
+    assert levels[2].tolist() == [15, 15, 20]
+    assert list(levels.columns) == [1, 2]
+    assert levels.index[0] == datetime(2025, 3, 1)
+
+
+def test_inventory_levels_rejects_reversed_range():
+    from src.database.inventory_history import inventory_levels
+
+    with pytest.raises(ValueError):
+        inventory_levels(date(2025, 3, 2), date(2025, 3, 1))
+
+
+@patch("src.database.inventory_history.db")
+def test_take_inventory_snapshot_locks_inventory_before_reading_it(mock_db):
+    from src.database.inventory_history import take_inventory_snapshot
+
+    mock_db.session.execute.return_value.rowcount = 30
+
+    assert take_inventory_snapshot() == 30
+
+    lock, snapshot = [str(call[0][0]) for call in mock_db.session.execute.call_args_list]
+    assert "ORDER BY id FOR SHARE" in lock
+    assert "INSERT INTO inventory_snapshots" in snapshot
+    mock_db.session.commit.assert_called_once()
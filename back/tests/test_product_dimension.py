@@ -0,0 +1,65 @@
+from unittest.mock import patch
+
+import pytest
+
+from src.database import product_dimension
+
+PRODUCTS = {
+    1: {"name": "Apple", "price": 1.5},
+    2: {"name": "Blood Orange", "price": 3.0},
+}
+
+
+@pytest.fixture
+def dimension():
+    """Product dimension with counting version and product queries."""
+    product_dimension.clear_product_dimension()
+    state = {"version": "products:1"}
+    with (
+        patch.object(
+            product_dimension, "data_version_key", side_effect=lambda tables: state["version"]
+        ) as versions,
+        patch.object(product_dimension, "query_product_dimension", return_value=PRODUCTS) as query,
+    ):
+        state["versions"], state["query"] = versions, query
+        yield state
+    product_dimension.clear_product_dimension()
+
+
+def test_dimension_is_loaded_once_per_data_version(dimension):
+    assert product_dimension.get_product_dimension() == PRODUCTS
+    assert product_dimension.get_product_dimension(max_age=0) == PRODUCTS
+    assert dimension["query"].call_count == 1
+
+    dimension["version"] = "products:2"
+    product_dimension.get_product_dimension(max_age=0)
+    assert dimension["query"].call_count == 2
+
+
+def test_version_is_not_checked_again_within_max_age(dimension):
+    product_dimension.get_product_dimension()
+    product_dimension.get_product_dimension(max_age=60)
+
+    assert dimension["versions"].call_count == 1
+    # Inventory is written on every sale and must not reload the dimension
+    dimension["versions"].assert_called_with(["products"])
+
+
+def test_resolve_product_by_id_or_name(dimension):
+    assert product_dimension.resolve_product_id(2) == 2
+    assert product_dimension.resolve_product_id("1") == 1
+    assert product_dimension.resolve_product_id(" blood orange ") == 2
+    assert product_dimension.resolve_product_id("Kiwi") is None
+    assert product_dimension.resolve_product_id(42) is None
+    assert product_dimension.product_name(1) == "Apple"
+
+
+@patch("src.database.product_dimension.db")
+def test_query_product_dimension_reads_only_products(mock_db):
+    mock_db.session.execute.return_value.mappings.return_value.all.return_value = [
+        {"id": 1, "name": "Apple", "price": 1.5}
+    ]
+
+    assert product_dimension.query_product_dimension() == {1: {"name": "Apple", "price": 1.5}}
+    sql = mock_db.session.execute.call_args[0][0]
+    assert "inventory" not in str(sql)
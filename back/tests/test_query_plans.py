@@ -0,0 +1,235 @@
+"""
+EXPLAIN regression tests for the time-range queries.
+
+These run against a real, migrated Postgres database given in TEST_PLAN_DATABASE_URL and are
+skipped otherwise. A large history is seeded inside a transaction that is rolled back
+afterwards, each query function is run while its SQL is captured, and the test fails if the
+plan of any captured statement falls back to a sequential scan of a large table, or reads
+monthly sales partitions outside of the queried range.
+"""
+
+import os
+from datetime import datetime
+
+import pytest
+from flask import Flask
+from sqlalchemy import event, text
+
+from ..src.database.sales_partitions import PARTITION_NAME
+from ..src.extensions import db
+
+PLAN_DATABASE_URL = os.getenv("TEST_PLAN_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not PLAN_DATABASE_URL, reason="TEST_PLAN_DATABASE_URL (a migrated Postgres) is not set"
+)
+
+# Scans of the monthly partitions of sales count as scans of sales
+LARGE_TABLES = {"sales", "sales_daily_rollup", "sales_daily_totals"}
+IN_RANGE_PARTITIONS = {"sales_y2024m06"}
+# Queries reading every raw sale of June, for which a sequential scan of the June partition
+# is the best plan. Any other partition, or a filtered read, must still use an index.
+WHOLE_PARTITION_QUERIES = {"query_time_buckets(hour)", "SalesTool._fetch_sales_data"}
+
+SEED_PRODUCTS = 50
+SEED_START = "2015-01-01"
+SEED_END = "2024-12-31"
+
+
+@pytest.fixture(scope="module")
+def plan_session():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = PLAN_DATABASE_URL
+    db.init_app(app)
+
+    with app.app_context():
+        db.session.execute(
+            text("SELECT ensure_sales_partitions(CAST(:start AS date), CAST(:end AS date));"),
+            {"start": SEED_START, "end": SEED_END},
+        )
+        db.session.execute(
+            text(
+                """
+                INSERT INTO products (name, price)
+                SELECT 'plan test ' || g, 1 + g % 9 FROM generate_series(1, :n) g;
+                """
+            ),
+            {"n": SEED_PRODUCTS},
+        )
+        # 10 years x 50 products = ~180k sales rows
+        db.session.execute(
+            text(
+                """
+                INSERT INTO sales (transaction_id, product_id, quantity, date, amount)
+                SELECT md5(p.id::text || d::text), p.id, 1 + (random() * 10)::int, d, 10
+                FROM generate_series(
+                    CAST(:start AS timestamp), CAST(:end AS timestamp), interval '1 day'
+                ) d
+                CROSS JOIN (SELECT id FROM products WHERE name LIKE 'plan test %') p;
+                """
+            ),
+            {"start": SEED_START, "end": SEED_END},
+        )
+        for table in LARGE_TABLES:
+            db.session.execute(text(f"ANALYZE {table};"))
+
+        product_id = db.session.execute(
+            text("SELECT min(id) FROM products WHERE name LIKE 'plan test %';")
+        ).scalar()
+
+        yield product_id
+
+        db.session.rollback()
+        db.session.remove()
+
+
+def capture_statements(func):
+    """Run func and return the (statement, parameters) pairs it sent to the database."""
+    statements = []
+
+    def before_cursor_execute(_conn, _cursor, statement, parameters, _context, _executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        func()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def explain(statement, parameters) -> dict:
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        return cursor.fetchone()[0][0]["Plan"]
+    finally:
+        cursor.close()
+
+
+def seq_scanned_tables(plan: dict, allowed_partitions=frozenset()) -> set:
+    found = set()
+    if plan.get("Node Type") == "Seq Scan":
+        name = plan.get("Relation Name", "")
+        if not PARTITION_NAME.match(name):
+            found.add(name)
+        elif name not in allowed_partitions:
+            found.add("sales")
+    for child in plan.get("Plans", []):
+        found |= seq_scanned_tables(child, allowed_partitions)
+    return found
+
+
+def scanned_partitions(plan: dict) -> set:
+    found = set()
+    if PARTITION_NAME.match(plan.get("Relation Name", "")):
+        found.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found |= scanned_partitions(child)
+    return found
+
+
+def query_functions(product_id):
+    from ..src.database import sales
+    from ..src.services.sales_agent import SalesTool
+
+    start, end = "2024-06-01", "2024-06-30"
+    return {
+        "fetch_sales_data": lambda: sales.fetch_sales_data(
+            datetime(2024, 6, 1), datetime(2024, 6, 30, 23, 59, 59)
+        ),
+        "fetch_sales_data_ranges": lambda: sales.fetch_sales_data_ranges(
+            {"june": (start, end), "h1": ("2024-01-01", end)}
+        ),
+        "query_sales": lambda: sales.query_sales(start, end),
+        "query_transactions": lambda: sales.query_transactions(start, end),
+        "query_timeperiod_sales": lambda: sales.query_timeperiod_sales(start, end, "week"),
+        "query_timeperiod_transactions": lambda: sales.query_timeperiod_transactions(
+            start, end, "week"
+        ),
+        "query_daily_series": lambda: sales.query_daily_series(start, end),
+        "query_daily_revenue": lambda: sales.query_daily_revenue(start, end),
+        "query_time_buckets(week)": lambda: sales.query_time_buckets(start, end, "week"),
+        "query_time_buckets(hour)": lambda: sales.query_time_buckets(start, end, "hour"),
+        "SalesTool._fetch_sales_data": lambda: SalesTool()._fetch_sales_data(start, end),
+        "SalesTool._fetch_sales_data(product)": lambda: SalesTool()._fetch_sales_data(
+            start, end, product=product_id
+        ),
+        "SalesTool.generate_sales_report": lambda: SalesTool().generate_sales_report(
+            start, end, group_by="week"
+        ),
+    }
+
+
+QUERY_NAMES = [
+    "fetch_sales_data",
+    "fetch_sales_data_ranges",
+    "query_sales",
+    "query_transactions",
+    "query_timeperiod_sales",
+    "query_timeperiod_transactions",
+    "query_daily_series",
+    "query_daily_revenue",
+    "query_time_buckets(week)",
+    "query_time_buckets(hour)",
+    "SalesTool._fetch_sales_data",
+    "SalesTool._fetch_sales_data(product)",
+    "SalesTool.generate_sales_report",
+]
+
+
+@pytest.mark.parametrize("name", QUERY_NAMES)
+def test_query_does_not_seq_scan_large_tables(plan_session, name):
+    func = query_functions(plan_session)[name]
+
+    statements = capture_statements(func)
+    assert statements, f"{name} did not run any SQL"
+
+    allowed = IN_RANGE_PARTITIONS if name in WHOLE_PARTITION_QUERIES else frozenset()
+    for statement, parameters in statements:
+        scanned = seq_scanned_tables(explain(statement, parameters), allowed) & LARGE_TABLES
+        assert not scanned, f"{name} sequentially scans {scanned}:\n{statement}"
+
+
+# The kind of SQL the SQL agent is prompted to write against sales
+AGENT_QUERIES = [
+    """
+    SELECT date, SUM(quantity) AS items_sold, SUM(amount) AS revenue
+    FROM sales
+    WHERE date >= '2024-06-01' AND date < '2024-07-01'
+    GROUP BY date ORDER BY date;
+    """,
+    """
+    SELECT p.name, SUM(s.amount) AS revenue, MAX(s.date) AS last_sale
+    FROM sales s JOIN products p ON p.id = s.product_id
+    WHERE s.date BETWEEN '2024-06-01' AND '2024-06-30 23:59:59'
+    GROUP BY p.name ORDER BY revenue DESC LIMIT 5;
+    """,
+]
+
+
+@pytest.mark.parametrize("name", QUERY_NAMES)
+def test_query_only_reads_partitions_in_range(plan_session, name):
+    func = query_functions(plan_session)[name]
+
+    for statement, parameters in capture_statements(func):
+        partitions = scanned_partitions(explain(statement, parameters))
+        outside = partitions - IN_RANGE_PARTITIONS
+        assert not outside, f"{name} reads {len(outside)} partitions outside June 2024"
+
+
+@pytest.mark.parametrize("statement", AGENT_QUERIES)
+def test_agent_style_query_is_pruned(plan_session, statement):
+    partitions = scanned_partitions(explain(statement, None))
+
+    assert partitions == IN_RANGE_PARTITIONS
+
+
+def test_short_range_query_uses_the_date_index(plan_session):
+    statement = """
+        SELECT date, SUM(quantity) AS items_sold
+        FROM sales
+        WHERE date >= '2024-06-10' AND date < '2024-06-13'
+        GROUP BY date;
+    """
+    assert not seq_scanned_tables(explain(statement, None)) & LARGE_TABLES
@@ -2,6 +2,7 @@ import base64
 import sys
 import warnings
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import MagicMock
 
 import pandas as pd
@@ -31,11 +32,39 @@ def mock_sales_data():
     return df
 
 
+def fake_sales_report(df):
+    """Stand-in for query_sales_report: one row per period start, like the SQL query returns."""
+    freqs = {"year": "YS", "month": "MS", "week": "W-MON", "day": "D"}
+
+    def query(start, end, group_by):
+        if group_by not in freqs:
+            raise ValueError("Invalid group_by value (must be 'year', 'month', 'week', or 'day')")
+        rows = []
+        periods = df["date"].dt.to_period(freqs[group_by][0]).dt.start_time
+        for period, group in df.groupby(periods):
+            units = group.groupby("product")["items_sold"].sum()
+            rows.append(
+                SimpleNamespace(
+                    period=period.to_pydatetime(),
+                    total_revenue=group["revenue"].sum(),
+                    total_items_sold=group["items_sold"].sum(),
+                    best_selling_product=units.idxmax(),
+                    best_selling_product_units=units.max(),
+                )
+            )
+        return rows
+
+    return query
+
+
 @pytest.fixture
-def sales_tool(mock_sales_data):
-    """Patch _fetch_sales_data to return mock dataframe"""
+def sales_tool(mock_sales_data, monkeypatch):
+    """Patch _fetch_sales_data and the report query to use the mock dataframe"""
     tool = SalesTool()
     tool._fetch_sales_data = MagicMock(return_value=mock_sales_data)
+    monkeypatch.setattr(
+        "src.services.sales_agent.query_sales_report", fake_sales_report(mock_sales_data)
+    )
     return tool
 
 
@@ -58,6 +87,18 @@ def patch_sales_tool_fetch(monkeypatch):
     monkeypatch.setattr(
         module.sales_agent_instance.tool, "_fetch_sales_data", lambda *a, **kw: mock_df
     )
+    monkeypatch.setattr(module, "query_sales_report", fake_sales_report(mock_df))
+
+    from ..src.services import chart_service
+
+    daily = [
+        SimpleNamespace(date=row.date, revenue=row.revenue, average_7d=row.revenue, has_sales=True)
+        for row in mock_df.itertuples()
+    ]
+    for charts in (chart_service, sys.modules["src.services.chart_service"]):
+        charts.clear_chart_cache()
+        monkeypatch.setattr(charts, "data_version_key", lambda tables: "sales:1")
+        monkeypatch.setattr(charts, "query_daily_revenue", lambda start, end: daily)
 
 
 def test_generate_sales_report(sales_tool):
@@ -90,50 +131,58 @@ def test_generate_sales_report_groupby_variants(sales_tool):
 
 
 def test_fetch_sales_data_filters(monkeypatch):
-    """Ensure _fetch_sales_data applies filters correctly"""
-    # Mock db.session.query to simulate SQLAlchemy calls
-    fake_query = MagicMock()
-    fake_query.filter.return_value = fake_query
-    fake_query.all.return_value = [
-        MagicMock(
-            _asdict=lambda: {
-                "date": pd.Timestamp("2025-09-01"),
-                "product": "A",
-                "items_sold": 10,
-                "revenue": 100.0,
+    """Ensure _fetch_sales_data passes the filters to the loader and renames its columns"""
+    fake_load = MagicMock(
+        return_value=pd.DataFrame(
+            {
+                "date": [pd.Timestamp("2025-09-01")],
+                "product_id": [1],
+                "quantity": [10],
+                "transaction_id": ["t1"],
+                "amount": [100.0],
             }
         )
-    ]
-
-    fake_db = MagicMock()
-    fake_db.session.query.return_value = fake_query
-    monkeypatch.setattr("src.services.sales_agent.db", fake_db)
-
-    from src.services.sales_agent import Sale
+    )
+    monkeypatch.setattr("src.services.sales_agent.load_sales_frame", fake_load)
+    monkeypatch.setattr(
+        "src.services.sales_agent.resolve_product_id", lambda product: {"Apple": 1}[product]
+    )
 
     tool = SalesTool()
-    df = tool._fetch_sales_data("2025-09-01", "2025-09-05", product="A")
-
-    assert not df.empty
-    assert "date" in df.columns
-    assert df.iloc[0]["product"] == "A"
+    df = tool._fetch_sales_data("2025-09-01", "2025-09-05", product="Apple")
+
+    start, end = fake_load.call_args[0]
+    assert start == pd.Timestamp("2025-09-01")
+    assert end == pd.Timestamp("2025-09-05 23:59:59")
+    assert fake_load.call_args[1] == {"product_id": 1}
+    assert list(df.columns) == ["date", "product", "items_sold", "revenue", "month"]
+    assert df.iloc[0]["product"] == 1
     assert df["month"].dtype.name.startswith("period")
 
 
 def test_fetch_sales_data_no_rows(monkeypatch):
     """_fetch_sales_data should handle empty results"""
-    fake_query = MagicMock()
-    fake_query.filter.return_value = fake_query
-    fake_query.all.return_value = []
-    fake_db = MagicMock()
-    fake_db.session.query.return_value = fake_query
-    monkeypatch.setattr("src.services.sales_agent.db", fake_db)
+    from src.database.sales_frames import empty_sales_frame
+
+    monkeypatch.setattr(
+        "src.services.sales_agent.load_sales_frame", lambda *a, **kw: empty_sales_frame()
+    )
 
     tool = SalesTool()
     df = tool._fetch_sales_data()
     assert df.empty
 
 
+def test_fetch_sales_data_unknown_product_skips_query(monkeypatch):
+    monkeypatch.setattr("src.services.sales_agent.resolve_product_id", lambda product: None)
+    monkeypatch.setattr(
+        "src.services.sales_agent.load_sales_frame", lambda *a, **kw: pytest.fail("queried")
+    )
+
+    df = SalesTool()._fetch_sales_data(product="Kiwi")
+    assert df.empty
+
+
 def test_create_sales_graph_success(sales_tool):
     agent = SalesAgent(sales_tool)
     month = "2025-09"
@@ -151,9 +200,9 @@ def test_create_sales_graph_success(sales_tool):
         pytest.fail(f"Failed to decode base64 image data: {e}")  # pragma: no cover
 
 
-def test_create_sales_graph_invalid_month():
+def test_create_sales_graph_invalid_month(monkeypatch):
+    monkeypatch.setattr("src.services.chart_service.query_daily_revenue", lambda start, end: [])
     tool = SalesTool()
-    tool._fetch_sales_data = MagicMock(return_value=pd.DataFrame())
     agent = SalesAgent(tool)
 
     result = agent.handle_request({"task": "create_graph", "month": "3000-01"})
@@ -194,6 +243,17 @@ def test_create_sales_graph_bar_chart(sales_tool):
         pytest.fail(f"Failed to decode base64 image data: {e}")  # pragma: no cover
 
 
+def test_create_sales_graph_for_date_range(sales_tool):
+    agent = SalesAgent(sales_tool)
+
+    result = agent.handle_request(
+        {"task": "create_graph", "start_date": "2023-01-01", "end_date": "2025-09-30"}
+    )
+
+    assert result["type"] == "image"
+    assert base64.b64decode(result["data"])
+
+
 def test_sales_tool_generate_report_calculations(sales_tool):
     """Test that generate_sales_report calculates correct aggregations"""
     report = sales_tool.generate_sales_report()
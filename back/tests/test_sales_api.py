@@ -84,3 +84,158 @@ def test_sales_exception_rolls_back_and_returns_500(client, monkeypatch):
     data = resp.get_json()
     assert data["error"] == "DB error"
     assert getattr(fake_db, "rolled", False)
+
+
+def test_sales_ranges_batch(client, monkeypatch):
+    """Should answer all named ranges from one fetch_sales_data_ranges call"""
+    from src.routes import sales
+
+    calls = []
+
+    def fake_fetch_sales_data_ranges(ranges):
+        calls.append(ranges)
+        return {name: {"revenue": 1.0, "sales": 1, "transactions": 1} for name in ranges}
+
+    monkeypatch.setattr(sales, "fetch_sales_data_ranges", fake_fetch_sales_data_ranges)
+
+    resp = client.get(
+        "/api/sales-data?range=current:2025-04-01:2025-06-30&range=ytd:2025-01-01:2025-05-15"
+    )
+    assert resp.status_code == 200
+    assert set(resp.json["ranges"]) == {"current", "ytd"}
+    assert calls == [
+        {
+            "current": (datetime(2025, 4, 1).date(), datetime(2025, 6, 30).date()),
+            "ytd": (datetime(2025, 1, 1).date(), datetime(2025, 5, 15).date()),
+        }
+    ]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "range=current:2025-04-01",
+        "range=current:2025-06-30:2025-04-01",
+        "range=a:2025-01-01:2025-01-02&range=a:2025-02-01:2025-02-02",
+        "range=:2025-01-01:2025-01-02",
+        "&".join(f"range=r{i}:2025-01-01:2025-01-02" for i in range(21)),
+    ],
+)
+def test_sales_ranges_invalid_returns_400(client, monkeypatch, query):
+    from src.routes import sales
+
+    monkeypatch.setattr(sales, "fetch_sales_data_ranges", lambda ranges: pytest.fail("queried"))
+
+    resp = client.get(f"/api/sales-data?{query}")
+    assert resp.status_code == 400
+    assert "error" in resp.json
+
+
+def test_sales_timeseries_serializes_buckets(client, monkeypatch):
+    from src.routes import sales
+
+    row = types.SimpleNamespace(
+        bucket=datetime(2025, 1, 1), quantity=5, revenue=10.554, transactions=2, customers=3
+    )
+    monkeypatch.setattr(sales, "query_time_buckets", lambda start, end, granularity: [row])
+
+    resp = client.get(
+        "/api/sales-timeseries?start_date=2025-01-01&end_date=2025-03-31&granularity=month"
+    )
+    assert resp.status_code == 200
+    assert resp.json == {
+        "granularity": "month",
+        "buckets": [
+            {
+                "bucket": "2025-01-01T00:00:00",
+                "quantity": 5,
+                "revenue": 10.55,
+                "transactions": 2,
+                "customers": 3,
+            }
+        ],
+    }
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "start_date=2025-01-01",
+        "start_date=2025-01-01&end_date=2025-01-31&granularity=fortnight",
+        "start_date=2025-01-31&end_date=2025-01-01",
+        "start_date=2020-01-01&end_date=2025-01-01&granularity=hour",
+        "start_date=2025-01-01&end_date=2025-01-31&points=2",
+        "start_date=2025-01-01&end_date=2025-01-31&points=many",
+        "start_date=2025-01-01&end_date=2025-01-31&points=10&method=average",
+    ],
+)
+def test_sales_timeseries_invalid_returns_400(client, query):
+    resp = client.get(f"/api/sales-timeseries?{query}")
+    assert resp.status_code == 400
+
+
+def test_sales_timeseries_downsamples_to_points(client, monkeypatch):
+    from src.routes import sales
+
+    rows = [
+        types.SimpleNamespace(
+            bucket=datetime(2024, 1, 1) + timedelta(days=day),
+            quantity=1,
+            revenue=100.0 if day == 500 else 1.0,
+            transactions=1,
+            customers=1,
+        )
+        for day in range(1000)
+    ]
+    monkeypatch.setattr(sales, "query_time_buckets", lambda start, end, granularity: rows)
+
+    resp = client.get("/api/sales-timeseries?start_date=2024-01-01&end_date=2026-09-26&points=50")
+
+    buckets = resp.json["buckets"]
+    assert resp.status_code == 200
+    assert len(buckets) == 50
+    assert buckets[0]["bucket"] == "2024-01-01T00:00:00"
+    assert buckets[-1]["bucket"] == "2026-09-26T00:00:00"
+    assert max(bucket["revenue"] for bucket in buckets) == 100.0
+
+
+def test_sales_changes_returns_cursor_and_buckets(client, monkeypatch):
+    from src.routes import sales
+
+    calls = []
+    row = types.SimpleNamespace(
+        bucket=datetime(2025, 3, 3), quantity=4, revenue=8.5, transactions=2
+    )
+
+    def fake_query_sales_changes(since, granularity):
+        calls.append((since, granularity))
+        return {"cursor": 9, "reset": False, "buckets": [row]}
+
+    monkeypatch.setattr(sales, "query_sales_changes", fake_query_sales_changes)
+
+    resp = client.get("/api/sales-changes?since=7&granularity=week")
+
+    assert resp.status_code == 200
+    assert calls == [(7, "week")]
+    assert resp.json == {
+        "cursor": 9,
+        "reset": False,
+        "granularity": "week",
+        "buckets": [
+            {"bucket": "2025-03-03T00:00:00", "quantity": 4, "revenue": 8.5, "transactions": 2}
+        ],
+    }
+
+
+@pytest.mark.parametrize("query", ["since=abc", "since=-1", "granularity=hour"])
+def test_sales_changes_invalid_returns_400(client, monkeypatch, query):
+    from src.routes import sales
+
+    def fake_query_sales_changes(since, granularity):
+        if granularity == "hour":
+            raise ValueError("Unsupported granularity: hour")
+        pytest.fail("queried")
+
+    monkeypatch.setattr(sales, "query_sales_changes", fake_query_sales_changes)
+
+    assert client.get(f"/api/sales-changes?{query}").status_code == 400
@@ -0,0 +1,214 @@
+import threading
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from src.utils import sales_cube
+
+
+def cell(day, product_id, quantity, revenue_cents, transactions=1):
+    return SimpleNamespace(
+        day=date.fromisoformat(day),
+        product_id=product_id,
+        quantity=quantity,
+        revenue_cents=revenue_cents,
+        transactions=transactions,
+    )
+
+
+def day_transactions(day, transactions):
+    return SimpleNamespace(day=date.fromisoformat(day), transactions=transactions)
+
+
+@pytest.fixture
+def rollup(monkeypatch, tmp_path):
+    """Fake change log: each call returns the next prepared result and records the cursor."""
+    state = {"results": [], "since": []}
+
+    def query_rollup_cells(since=0):
+        state["since"].append(since)
+        return state["results"].pop(0)
+
+    monkeypatch.setattr(sales_cube, "query_rollup_cells", query_rollup_cells)
+    monkeypatch.setattr(sales_cube, "_current", None)
+    state["path"] = tmp_path
+    return state
+
+
+def full_build(rollup):
+    rollup["results"].append(
+        {
+            "cursor": 5,
+            "reset": False,
+            "days": None,
+            "cells": [
+                cell("2025-01-30", 2, 4, 1050),
+                cell("2025-01-31", 1, 1, 199, 1),
+                cell("2025-02-01", 2, 3, 300, 2),
+            ],
+            "day_transactions": [
+                day_transactions("2025-01-30", 1),
+                day_transactions("2025-01-31", 1),
+                day_transactions("2025-02-01", 2),
+            ],
+        }
+    )
+    return sales_cube.refresh_sales_cube(rollup["path"])
+
+
+def test_full_build_lays_out_products_by_days(rollup):
+    cube = full_build(rollup)
+
+    assert cube.cursor == 5
+    assert cube.product_ids.tolist() == [1, 2]
+    assert cube.days[0] == np.datetime64("2025-01-30")
+    assert cube.days[-1] == np.datetime64(date.today())
+    assert cube.select("quantity", "2025-01-30", "2025-02-01").tolist() == [[0, 1, 0], [4, 0, 3]]
+    assert cube.daily("revenue", "2025-01-30", "2025-02-01").tolist() == [10.5, 1.99, 3.0]
+    assert cube.totals("transactions").tolist() == [1, 3]
+    assert cube.product_series(2, "revenue", "2025-02-01", "2025-02-01").tolist() == [3.0]
+
+
+def test_rollup_sums_per_calendar_bucket(rollup):
+    cube = full_build(rollup)
+
+    buckets, totals = cube.rollup("revenue", "2025-01-01", "2025-02-28", "month")
+
+    assert buckets.tolist() == [date(2025, 1, 1), date(2025, 2, 1)]
+    assert totals.tolist() == [12.49, 3.0]
+
+
+def test_daily_frame_leaves_out_days_without_sales(rollup):
+    cube = full_build(rollup)
+
+    df = cube.daily_frame("2025-01-29", "2025-02-03")
+
+    assert df["timestamp"].dt.day.tolist() == [30, 31, 1]
+    assert df["revenue"].tolist() == [10.5, 1.99, 3.0]
+
+
+def test_basket_of_two_products_is_one_transaction(rollup):
+    rollup["results"].append(
+        {
+            "cursor": 1,
+            "reset": False,
+            "days": None,
+            # One basket holding products 1 and 2
+            "cells": [cell("2025-01-30", 1, 1, 100), cell("2025-01-30", 2, 1, 200)],
+            "day_transactions": [day_transactions("2025-01-30", 1)],
+        }
+    )
+    cube = sales_cube.refresh_sales_cube(rollup["path"])
+
+    assert cube.totals("transactions").tolist() == [1, 1]
+    assert cube.daily("transactions", "2025-01-30", "2025-01-30").tolist() == [1]
+    assert cube.rollup("transactions", "2025-01-01", "2025-01-31")[1].tolist() == [1]
+    assert cube.daily_frame("2025-01-30", "2025-01-30")["transactions"].tolist() == [1]
+    with pytest.raises(ValueError):
+        cube.daily("transactions", product_ids=[1, 2])
+
+
+def test_unknown_product_raises(rollup):
+    cube = full_build(rollup)
+
+    with pytest.raises(KeyError):
+        cube.product_series(99, "quantity")
+
+
+def test_incremental_refresh_rewrites_only_changed_days(rollup):
+    first = full_build(rollup)
+    rollup["results"].append(
+        {
+            "cursor": 7,
+            "reset": False,
+            # 2025-01-30 lost its sales, 2025-02-01 changed and product 3 appeared
+            "days": [date(2025, 1, 30), date(2025, 2, 1)],
+            "cells": [cell("2025-02-01", 3, 6, 600)],
+            "day_transactions": [day_transactions("2025-02-01", 1)],
+        }
+    )
+
+    cube = sales_cube.refresh_sales_cube(rollup["path"])
+
+    assert rollup["since"] == [0, 5]
+    assert cube.generation == first.generation + 1
+    assert cube.cursor == 7
+    assert cube.product_ids.tolist() == [1, 2, 3]
+    assert cube.select("quantity", "2025-01-30", "2025-02-01").tolist() == [
+        [0, 1, 0],
+        [0, 0, 0],
+        [0, 0, 6],
+    ]
+    assert cube.daily("transactions", "2025-01-30", "2025-02-01").tolist() == [0, 1, 1]
+    assert len(list(rollup["path"].glob("cube-*.npy"))) == 1
+    assert len(list(rollup["path"].glob("days-*.npy"))) == 1
+
+
+def test_refresh_without_changes_keeps_generation(rollup):
+    first = full_build(rollup)
+    rollup["results"].append(
+        {"cursor": 5, "reset": False, "days": [], "cells": [], "day_transactions": []}
+    )
+
+    assert sales_cube.refresh_sales_cube(rollup["path"]).generation == first.generation
+
+
+def test_reset_rebuilds_from_scratch(rollup):
+    full_build(rollup)
+    rollup["results"].append(
+        {
+            "cursor": 9,
+            "reset": True,
+            "days": None,
+            "cells": [cell("2025-03-01", 1, 2, 200)],
+            "day_transactions": [day_transactions("2025-03-01", 1)],
+        }
+    )
+
+    cube = sales_cube.refresh_sales_cube(rollup["path"])
+
+    assert cube.days[0] == np.datetime64("2025-03-01")
+    assert cube.totals("quantity").tolist() == [2]
+
+
+def test_other_processes_pick_up_new_generations(rollup, monkeypatch):
+    full_build(rollup)
+    monkeypatch.setattr(sales_cube, "_current", None)
+
+    cube = sales_cube.open_sales_cube(rollup["path"])
+
+    assert cube.generation == 1
+    assert not cube.data.flags.writeable
+
+
+def test_stale_cube_is_refreshed_in_the_background(monkeypatch):
+    refreshed = threading.Event()
+    monkeypatch.setattr(sales_cube, "CUBE_ENABLED", True)
+    monkeypatch.setattr(
+        sales_cube, "fetch_data_versions", lambda tables: {"sales_rollup": {"version": 6}}
+    )
+    monkeypatch.setattr(sales_cube, "refresh_sales_cube", refreshed.set)
+    stale = SimpleNamespace(cursor=5)
+    monkeypatch.setattr(sales_cube, "open_sales_cube", lambda: stale)
+
+    with Flask(__name__).app_context():
+        # The request queries SQL instead of waiting for the refresh
+        assert sales_cube.current_sales_cube() is None
+    assert refreshed.wait(5)
+
+    stale.cursor = 6
+    with Flask(__name__).app_context():
+        assert sales_cube.current_sales_cube() is stale
+
+
+def test_current_sales_cube_falls_back_when_unavailable(monkeypatch):
+    def unavailable(tables):
+        raise RuntimeError("no database")
+
+    monkeypatch.setattr(sales_cube, "CUBE_ENABLED", True)
+    monkeypatch.setattr(sales_cube, "fetch_data_versions", unavailable)
+
+    assert sales_cube.current_sales_cube() is None
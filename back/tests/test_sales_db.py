@@ -46,3 +46,240 @@ def test_fetch_sales_data_raises_and_rolls_back(mock_db):
         fetch_sales_data(datetime(2024, 1, 1), datetime(2024, 1, 2))
 
     mock_db.session.rollback.assert_called_once()
+
+
+@patch("src.database.sales.db")
+def test_sales_queries_read_from_daily_totals(mock_db):
+    """All sales query functions should aggregate the daily totals, not raw sales rows."""
+    from src.database import sales
+
+    mock_db.session.execute.return_value.mappings.return_value.first.return_value = {}
+    mock_db.session.execute.return_value.fetchall.return_value = []
+
+    sales.fetch_sales_data("2024-01-01", "2024-01-31")
+    sales.query_sales("2024-01-01", "2024-01-31")
+    sales.query_transactions("2024-01-01", "2024-01-31")
+    sales.query_timeperiod_sales("2024-01-01", "2024-01-31", "week")
+    sales.query_timeperiod_transactions("2024-01-01", "2024-01-31", "month")
+
+    assert mock_db.session.execute.call_count == 5
+    for call in mock_db.session.execute.call_args_list:
+        sql = str(call.args[0])
+        assert "FROM sales_daily_totals" in " ".join(sql.split())
+
+
+@patch("src.database.sales.db")
+def test_fetch_sales_data_ranges_runs_one_statement(mock_db):
+    """All ranges should be aggregated by a single FILTER query and mapped back by name."""
+    from src.database.sales import fetch_sales_data_ranges
+
+    mock_db.session.execute.return_value.mappings.return_value.first.return_value = {
+        "revenue_0": 100.5,
+        "sales_0": 10,
+        "transactions_0": 2,
+        "revenue_1": None,
+        "sales_1": None,
+        "transactions_1": None,
+    }
+
+    result = fetch_sales_data_ranges(
+        {"current": ("2025-04-01", "2025-06-30"), "previous": ("2025-01-01", "2025-03-31")}
+    )
+
+    assert result == {
+        "current": {"revenue": 100.5, "sales": 10, "transactions": 2},
+        "previous": {"revenue": 0.0, "sales": 0, "transactions": 0},
+    }
+    mock_db.session.execute.assert_called_once()
+    sql, params = mock_db.session.execute.call_args[0]
+    assert "FILTER (WHERE" in str(sql)
+    assert params == {
+        "start_0": "2025-04-01",
+        "end_0": "2025-06-30",
+        "start_1": "2025-01-01",
+        "end_1": "2025-03-31",
+    }
+
+
+@patch("src.database.sales.db")
+def test_fetch_sales_data_ranges_without_ranges_skips_query(mock_db):
+    from src.database.sales import fetch_sales_data_ranges
+
+    assert fetch_sales_data_ranges({}) == {}
+    mock_db.session.execute.assert_not_called()
+
+
+@patch("src.database.sales.db")
+def test_query_time_buckets_reads_daily_totals_for_whole_days(mock_db):
+    from src.database.sales import query_time_buckets
+
+    mock_db.session.execute.return_value.fetchall.return_value = ["row"]
+
+    assert query_time_buckets("2025-01-01", "2025-03-31", "quarter") == ["row"]
+
+    sql, params = mock_db.session.execute.call_args[0]
+    assert "FROM sales_daily_totals" in str(sql)
+    assert "generate_series" in str(sql)
+    assert params["granularity"] == "quarter"
+    assert params["step"] == "3 months"
+
+
+@patch("src.database.sales.db")
+def test_query_time_buckets_reads_raw_sales_for_hours(mock_db):
+    from src.database.sales import query_time_buckets
+
+    query_time_buckets("2025-01-01", "2025-01-01", "hour")
+
+    sql, _ = mock_db.session.execute.call_args[0]
+    assert "FROM sales_daily_rollup" not in str(sql)
+    assert "FROM sales\n" in str(sql)
+
+
+@patch("src.database.sales.db")
+def test_query_time_buckets_rejects_unknown_granularity(mock_db):
+    from src.database.sales import query_time_buckets
+
+    with pytest.raises(ValueError):
+        query_time_buckets("2025-01-01", "2025-01-31", "fortnight")
+
+    mock_db.session.execute.assert_not_called()
+
+
+@patch("src.database.sales.db")
+def test_query_sales_changes_reads_cursor_then_buckets(mock_db):
+    from src.database.sales import query_sales_changes
+
+    mock_db.session.execute.return_value.mappings.return_value.first.return_value = {
+        "cursor": 12,
+        "reset": False,
+    }
+    mock_db.session.execute.return_value.fetchall.return_value = ["bucket"]
+
+    result = query_sales_changes(10, "week")
+
+    assert result == {"cursor": 12, "reset": False, "buckets": ["bucket"]}
+    _, params = mock_db.session.execute.call_args[0]
+    assert params == {"since": 10, "cursor": 12, "granularity": "week", "step": "1 week"}
+
+
+@patch("src.database.sales.db")
+def test_query_sales_changes_unknown_cursor_forces_full_resync(mock_db):
+    from src.database.sales import query_sales_changes
+
+    mock_db.session.execute.return_value.mappings.return_value.first.return_value = {
+        "cursor": 3,
+        "reset": False,
+    }
+
+    result = query_sales_changes(50)
+
+    assert result["reset"] is True
+    _, params = mock_db.session.execute.call_args[0]
+    assert params["since"] == 0
+
+
+@patch("src.database.sales.db")
+def test_query_sales_changes_rejects_hourly_buckets(mock_db):
+    from src.database.sales import query_sales_changes
+
+    with pytest.raises(ValueError):
+        query_sales_changes(0, "hour")
+
+    mock_db.session.execute.assert_not_called()
+
+
+@patch("src.database.sales.db")
+def test_query_sales_report_ranks_products_in_one_statement(mock_db):
+    from src.database.sales import query_sales_report
+
+    mock_db.session.execute.return_value.fetchall.return_value = ["period"]
+
+    assert query_sales_report("2025-01-01", "2025-03-31", "week") == ["period"]
+
+    mock_db.session.execute.assert_called_once()
+    sql, params = mock_db.session.execute.call_args[0]
+    assert "ROW_NUMBER() OVER" in str(sql)
+    assert "JOIN products" in str(sql)
+    assert "day >= CAST(:start_date AS date)" in str(sql)
+    assert params == {"start_date": "2025-01-01", "end_date": "2025-03-31", "group_by": "week"}
+
+
+@patch("src.database.sales.db")
+def test_query_sales_report_without_range_reads_every_day(mock_db):
+    from src.database.sales import query_sales_report
+
+    query_sales_report(None, None, "month")
+
+    sql, _ = mock_db.session.execute.call_args[0]
+    assert "WHERE day" not in str(sql)
+
+
+@patch("src.database.sales.db")
+def test_query_sales_report_rejects_unknown_group(mock_db):
+    from src.database.sales import query_sales_report
+
+    with pytest.raises(ValueError):
+        query_sales_report("2025-01-01", "2025-01-31", "nonsense")
+
+    mock_db.session.execute.assert_not_called()
+
+
+@patch("src.database.sales.db")
+def test_query_daily_revenue_averages_in_sql_with_lookback(mock_db):
+    from src.database.sales import query_daily_revenue
+
+    mock_db.session.execute.return_value.fetchall.return_value = ["day"]
+
+    assert query_daily_revenue("2025-09-01", "2025-09-30") == ["day"]
+
+    sql, params = mock_db.session.execute.call_args[0]
+    assert "ROWS BETWEEN 6 PRECEDING AND CURRENT ROW" in str(sql)
+    assert "CAST(:start_date AS date) - 6" in str(sql)
+    assert params == {"start_date": "2025-09-01", "end_date": "2025-09-30"}
+
+
+@patch("src.database.sales.db")
+def test_query_rollup_cells_reads_only_changed_days(mock_db):
+    from src.database.sales import query_rollup_cells
+
+    mock_db.session.execute.return_value.mappings.return_value.first.return_value = {
+        "cursor": 12,
+        "reset": False,
+    }
+    mock_db.session.execute.return_value.fetchall.side_effect = [
+        [MagicMock(day="2025-03-03")],
+        ["cell"],
+        ["day"],
+    ]
+
+    result = query_rollup_cells(10)
+
+    assert result == {
+        "cursor": 12,
+        "reset": False,
+        "days": ["2025-03-03"],
+        "cells": ["cell"],
+        "day_transactions": ["day"],
+    }
+    cells_call, totals_call = mock_db.session.execute.call_args_list[-2:]
+    assert "JOIN sales_daily_rollup" in str(cells_call[0][0])
+    assert "JOIN sales_daily_totals" in str(totals_call[0][0])
+    assert totals_call[0][1] == {"since": 10, "cursor": 12}
+
+
+@patch("src.database.sales.db")
+def test_query_rollup_cells_from_scratch_reads_every_cell(mock_db):
+    from src.database.sales import query_rollup_cells
+
+    mock_db.session.execute.return_value.mappings.return_value.first.return_value = {
+        "cursor": 3,
+        "reset": False,
+    }
+    mock_db.session.execute.return_value.fetchall.return_value = ["cell"]
+
+    result = query_rollup_cells(50)
+
+    assert result["reset"] is True
+    assert result["days"] is None
+    sql = mock_db.session.execute.call_args[0][0]
+    assert "sales_rollup_changes" not in str(sql)
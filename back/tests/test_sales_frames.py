@@ -0,0 +1,107 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pytest
+
+ROWS = [
+    (datetime(2025, 1, 1, 9), 1, 2, "t1", 10.5),
+    (datetime(2025, 1, 1, 10), 2, 1, "t2", None),
+    (datetime(2025, 1, 2, 11), 1, 3, "t3", 7.25),
+]
+
+
+def streamed(mock_db, *chunks):
+    result = MagicMock()
+    result.partitions.return_value = iter(chunks)
+    mock_db.session.execute.return_value = result
+    return result
+
+
+@patch("src.database.sales_frames.db")
+def test_iter_sales_frames_yields_typed_chunks_from_server_side_cursor(mock_db):
+    from src.database.sales_frames import iter_sales_frames
+
+    result = streamed(mock_db, ROWS[:2], ROWS[2:])
+
+    frames = list(iter_sales_frames(datetime(2025, 1, 1), None, product_id=1, chunk_size=2))
+
+    assert [len(frame) for frame in frames] == [2, 1]
+    assert frames[0]["date"].dtype == "datetime64[ns]"
+    assert frames[0]["product_id"].dtype == "int64"
+    assert frames[0]["amount"].dtype == "float64"
+    assert pd.isna(frames[0]["amount"][1])
+    result.partitions.assert_called_once_with(2)
+    result.close.assert_called_once()
+
+    sql, params = mock_db.session.execute.call_args[0]
+    options = mock_db.session.execute.call_args[1]["execution_options"]
+    assert options == {"stream_results": True, "yield_per": 2}
+    assert "date >= :start_date" in str(sql)
+    assert "date <= :end_date" not in str(sql)
+    assert "product_id = :product_id" in str(sql)
+    assert params["product_id"] == 1
+
+
+@patch("src.database.sales_frames.db")
+def test_load_sales_frame_in_cents(mock_db):
+    from src.database.sales_frames import load_sales_frame
+
+    streamed(mock_db, [row[:4] + (1050,) for row in ROWS[:1]], [ROWS[1][:4] + (None,)])
+
+    df = load_sales_frame(amount="cents")
+
+    assert list(df["amount"]) == [1050, pd.NA]
+    assert str(df["amount"].dtype) == "Int64"
+    sql, _ = mock_db.session.execute.call_args[0]
+    assert "round(amount * 100)" in str(sql)
+
+
+@patch("src.database.sales_frames.db")
+def test_load_sales_frame_without_rows_keeps_dtypes(mock_db):
+    from src.database.sales_frames import empty_sales_frame, load_sales_frame
+
+    streamed(mock_db)
+
+    df = load_sales_frame()
+
+    assert df.empty
+    pd.testing.assert_series_equal(df.dtypes, empty_sales_frame().dtypes)
+
+
+@patch("src.database.sales_frames.db")
+def test_iter_sales_frames_rejects_unknown_amount(mock_db):
+    from src.database.sales_frames import iter_sales_frames
+
+    with pytest.raises(ValueError):
+        next(iter_sales_frames(amount="decimal"))
+
+    mock_db.session.execute.assert_not_called()
+
+
+@patch("src.database.sales_frames.db")
+def test_iter_sales_frames_rolls_back_on_error(mock_db):
+    from src.database.sales_frames import iter_sales_frames
+
+    mock_db.session.execute.side_effect = RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        list(iter_sales_frames())
+
+    mock_db.session.rollback.assert_called_once()
+
+
+@patch("src.database.sales_frames.db")
+def test_iter_rollup_frames_streams_daily_rollup(mock_db):
+    from src.database.sales_frames import empty_rollup_frame, iter_rollup_frames
+
+    streamed(mock_db, [(datetime(2025, 1, 1).date(), 1, 5, 12.5, 2)])
+
+    frames = list(iter_rollup_frames(None, datetime(2025, 1, 31).date(), chunk_size=10))
+
+    assert len(frames) == 1
+    assert frames[0].dtypes.to_dict() == empty_rollup_frame().dtypes.to_dict()
+    assert frames[0]["revenue"].tolist() == [12.5]
+    sql = mock_db.session.execute.call_args[0][0]
+    assert "FROM sales_daily_rollup" in str(sql)
+    assert "day <= :end_date" in str(sql)
@@ -0,0 +1,211 @@
+import sys
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.database.sales_ingest import (
+    IdempotencyKeyConflict,
+    batch_checksum,
+    ingest_sales_batch,
+    parse_sales_batch,
+    validate_sales_batch,
+)
+from src.index import app
+from src.routes import ingest_route
+
+PRICES = {1: 1.5, 2: 2.5}
+CSV = b"product_id,quantity,date,amount,transaction_id\n1,2,2025-01-01,3.00,t1\n2,1,2025-01-02T10:00:00Z,,\n"
+
+
+def test_parse_sales_batch_reads_csv_and_ndjson():
+    assert len(parse_sales_batch(CSV, "csv")) == 2
+
+    ndjson = b'{"product_id": 1, "quantity": 2, "date": "2025-01-01"}\n'
+    assert parse_sales_batch(ndjson, "ndjson")["quantity"].tolist() == [2]
+
+
+@pytest.mark.parametrize(
+    "content, batch_format",
+    [
+        (CSV, "xml"),
+        (b"product_id,quantity\n1,2\n", "csv"),
+        (b"product_id,quantity,date\n", "csv"),
+        (b"{not json", "ndjson"),
+    ],
+)
+def test_parse_sales_batch_rejects_invalid_batches(content, batch_format):
+    with pytest.raises(ValueError):
+        parse_sales_batch(content, batch_format)
+
+
+def test_validate_sales_batch_normalizes_rows():
+    rows, errors = validate_sales_batch(parse_sales_batch(CSV), PRICES)
+
+    assert errors == []
+    assert rows["product_id"].tolist() == [1, 2]
+    assert rows["amount"].tolist() == [3.0, 2.5]
+    assert rows["transaction_id"][0] == "t1"
+    assert len(rows["transaction_id"][1]) == 36
+    assert str(rows["date"][1]) == "2025-01-02 10:00:00"
+
+
+def test_validate_sales_batch_reports_every_invalid_row():
+    content = (
+        b"product_id,quantity,date,amount\n"
+        b"1,2,2025-01-01,3\n"
+        b"9,1,2025-01-01,\n"
+        b"1,-1,not a date,\n"
+        b"2,2,2025-01-01,4.50\n"
+    )
+
+    rows, errors = validate_sales_batch(parse_sales_batch(content), PRICES)
+
+    assert rows is None
+    assert errors == [
+        {"row": 2, "errors": ["unknown product_id"]},
+        {
+            "row": 3,
+            "errors": [
+                "quantity must be a non-negative integer",
+                "date must be an ISO 8601 date or timestamp",
+            ],
+        },
+        {"row": 4, "errors": ["amount must match quantity * price within 0.01"]},
+    ]
+
+
+def test_validate_sales_batch_rejects_dates_outside_the_partition_window():
+    content = (
+        b"product_id,quantity,date\n"
+        b"1,1,2024-12-31T23:59:59\n"
+        b"1,1,2025-01-01\n"
+        b"1,1,2025-06-30T23:59:59\n"
+        b"1,1,2025-07-01\n"
+    )
+    window = (date(2025, 1, 1), date(2025, 7, 1))
+
+    rows, errors = validate_sales_batch(parse_sales_batch(content), PRICES, window)
+
+    message = "date must be on or after 2025-01-01 and before 2025-07-01"
+    assert errors == [{"row": 1, "errors": [message]}, {"row": 4, "errors": [message]}]
+
+
+@patch("src.database.sales_ingest._copy_rows")
+@patch("src.database.sales_ingest.db")
+def test_ingest_sales_batch_claims_key_and_copies_in_one_transaction(mock_db, mock_copy):
+    rows, _ = validate_sales_batch(parse_sales_batch(CSV), PRICES)
+    mock_db.session.execute.return_value.scalar.return_value = "batch-1"
+
+    result = ingest_sales_batch(rows, "batch-1", batch_checksum(CSV))
+
+    assert result == {"idempotency_key": "batch-1", "rows": 2, "duplicate": False}
+    claim, batch, upcoming = mock_db.session.execute.call_args_list
+    assert "ON CONFLICT (idempotency_key) DO NOTHING" in str(claim[0][0])
+    assert "ensure_sales_partitions" in str(batch[0][0])
+    assert batch[0][1] == {"start": date(2025, 1, 1), "end": date(2025, 1, 2)}
+    assert upcoming[0][1]["start"] == date.today()
+    mock_copy.assert_called_once_with(rows)
+    mock_db.session.commit.assert_called_once()
+
+
+@patch("src.database.sales_ingest._copy_rows")
+@patch("src.database.sales_ingest.db")
+def test_ingest_sales_batch_retry_is_not_inserted_again(mock_db, mock_copy):
+    rows, _ = validate_sales_batch(parse_sales_batch(CSV), PRICES)
+    mock_db.session.execute.return_value.scalar.return_value = None
+    mock_db.session.execute.return_value.one.return_value = SimpleNamespace(
+        checksum=batch_checksum(CSV), rows=2
+    )
+
+    result = ingest_sales_batch(rows, "batch-1", batch_checksum(CSV))
+
+    assert result["duplicate"] is True
+    mock_copy.assert_not_called()
+    mock_db.session.commit.assert_not_called()
+
+    with pytest.raises(IdempotencyKeyConflict):
+        ingest_sales_batch(rows, "batch-1", batch_checksum(b"other"))
+
+
+@patch("src.database.sales_ingest._copy_rows", side_effect=RuntimeError("copy failed"))
+@patch("src.database.sales_ingest.db")
+def test_ingest_sales_batch_rolls_back_on_failure(mock_db, mock_copy):
+    rows, _ = validate_sales_batch(parse_sales_batch(CSV), PRICES)
+    mock_db.session.execute.return_value.scalar.return_value = "batch-1"
+
+    with pytest.raises(RuntimeError):
+        ingest_sales_batch(rows, "batch-1", batch_checksum(CSV))
+
+    mock_db.session.rollback.assert_called_once()
+    mock_db.session.commit.assert_not_called()
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    app.config.update(TESTING=True, LOGIN_DISABLED=True)
+    monkeypatch.setattr(
+        ingest_route,
+        "get_product_dimension",
+        lambda: {pid: {"name": str(pid), "price": price} for pid, price in PRICES.items()},
+    )
+    yield app.test_client()
+    app.config.update(LOGIN_DISABLED=False)
+
+
+def post_batch(client, content=CSV, key="batch-1", content_type="text/csv"):
+    headers = {"Idempotency-Key": key} if key else {}
+    return client.post(
+        "/api/sales/ingest", data=content, headers=headers, content_type=content_type
+    )
+
+
+def test_ingest_route_requires_an_idempotency_key(client):
+    assert post_batch(client, key=None).status_code == 400
+
+
+def test_ingest_route_rejects_invalid_rows_without_inserting(client, monkeypatch):
+    ingest = MagicMock()
+    monkeypatch.setattr(ingest_route, "ingest_sales_batch", ingest)
+
+    resp = post_batch(client, b"product_id,quantity,date\n9,1,2025-01-01\n")
+
+    assert resp.status_code == 400
+    assert resp.get_json()["errors"] == [{"row": 1, "errors": ["unknown product_id"]}]
+    ingest.assert_not_called()
+
+
+def test_ingest_route_returns_201_then_200_for_a_retry(client, monkeypatch):
+    seen = {}
+
+    def ingest(rows, key, checksum):
+        duplicate = key in seen
+        seen.setdefault(key, len(rows))
+        return {"idempotency_key": key, "rows": seen[key], "duplicate": duplicate}
+
+    monkeypatch.setattr(ingest_route, "ingest_sales_batch", ingest)
+
+    first = post_batch(client)
+    retry = post_batch(client)
+    ndjson = post_batch(
+        client,
+        b'{"product_id": 1, "quantity": 1, "date": "2025-01-01"}\n',
+        key="batch-2",
+        content_type="application/x-ndjson",
+    )
+
+    assert (first.status_code, retry.status_code, ndjson.status_code) == (201, 200, 201)
+    assert retry.get_json() == {"idempotency_key": "batch-1", "rows": 2, "duplicate": True}
+
+
+def test_ingest_route_key_conflict_returns_409(client, monkeypatch):
+    def ingest(rows, key, checksum):
+        raise IdempotencyKeyConflict("used before")
+
+    monkeypatch.setattr(ingest_route, "ingest_sales_batch", ingest)
+
+    assert post_batch(client).status_code == 409
@@ -0,0 +1,100 @@
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+def test_partition_month_parses_monthly_names_only():
+    from src.database.sales_partitions import partition_month
+
+    assert partition_month("sales_y2024m06") == date(2024, 6, 1)
+    assert partition_month("sales_default") is None
+    assert partition_month("sales_y2024m06; DROP TABLE sales") is None
+
+
+@patch("src.database.sales_partitions.db")
+def test_ensure_sales_partitions_commits_and_returns_count(mock_db):
+    from src.database.sales_partitions import ensure_sales_partitions
+
+    mock_db.session.execute.return_value.scalar.return_value = 3
+
+    assert ensure_sales_partitions("2025-01-01", "2025-03-31") == 3
+    mock_db.session.commit.assert_called_once()
+
+
+@patch("src.database.sales_partitions.db")
+def test_list_sales_partitions_sorts_by_month(mock_db):
+    from src.database.sales_partitions import list_sales_partitions
+
+    mock_db.session.execute.return_value.mappings.return_value.all.return_value = [
+        {"name": "sales_y2025m02", "estimated_rows": 10},
+        {"name": "sales_y2024m12", "estimated_rows": 20},
+    ]
+
+    names = [p["name"] for p in list_sales_partitions()]
+
+    assert names == ["sales_y2024m12", "sales_y2025m02"]
+
+
+@patch("src.database.sales_partitions.db")
+def test_detach_rejects_unknown_names(mock_db):
+    from src.database.sales_partitions import detach_sales_partition
+
+    with pytest.raises(ValueError):
+        detach_sales_partition("sales")
+    with pytest.raises(ValueError):
+        detach_sales_partition("sales_y2024m01", archive_schema='x"; DROP SCHEMA public; --')
+
+    mock_db.engine.connect.assert_not_called()
+
+
+@patch("src.database.sales_partitions.detach_sales_partition")
+@patch("src.database.sales_partitions.list_sales_partitions")
+def test_archive_only_detaches_partitions_ending_before_cutoff(mock_list, mock_detach):
+    from src.database.sales_partitions import archive_sales_partitions
+
+    mock_list.return_value = [
+        {"name": "sales_y2024m11", "month": date(2024, 11, 1), "estimated_rows": 1},
+        {"name": "sales_y2024m12", "month": date(2024, 12, 1), "estimated_rows": 1},
+        {"name": "sales_y2025m01", "month": date(2025, 1, 1), "estimated_rows": 1},
+    ]
+
+    archived = archive_sales_partitions(date(2025, 1, 1), "archive")
+
+    assert archived == ["sales_y2024m11", "sales_y2024m12"]
+    mock_detach.assert_any_call("sales_y2024m12", "archive")
+
+
+def test_prepare_sales_partitions_covers_the_batch_and_the_coming_months(monkeypatch):
+    from src.database import sales_partitions
+
+    monkeypatch.setattr(sales_partitions, "MONTHS_AHEAD", 3)
+    connection = MagicMock()
+
+    sales_partitions.prepare_sales_partitions(
+        connection, date(2024, 2, 3), date(2024, 2, 9), today=date(2025, 11, 15)
+    )
+
+    ranges = [call[0][1] for call in connection.execute.call_args_list]
+    assert ranges == [
+        {"start": date(2024, 2, 3), "end": date(2024, 2, 9)},
+        {"start": date(2025, 11, 15), "end": date(2026, 2, 1)},
+    ]
+
+
+@pytest.mark.parametrize(
+    "archive_after, expected_start",
+    [(0, date(2015, 11, 1)), (6, date(2025, 5, 1))],
+)
+def test_partition_window_ends_after_the_months_kept_ready(
+    monkeypatch, archive_after, expected_start
+):
+    from src.database import sales_partitions
+
+    monkeypatch.setattr(sales_partitions, "MONTHS_AHEAD", 3)
+    monkeypatch.setattr(sales_partitions, "MONTHS_BACK", 120)
+    monkeypatch.setattr(sales_partitions, "ARCHIVE_AFTER_MONTHS", archive_after)
+
+    window = sales_partitions.partition_window(date(2025, 11, 15))
+
+    assert window == (expected_start, date(2026, 3, 1))
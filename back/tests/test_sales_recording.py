@@ -0,0 +1,134 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.database.sales_recording import InsufficientInventory, record_sales
+from src.index import app
+from src.routes import ingest_route
+
+SALES = pd.DataFrame(
+    {
+        "transaction_id": ["t1", "t1", "t2"],
+        "product_id": [2, 1, 2],
+        "quantity": [1, 3, 2],
+        "date": [datetime(2025, 1, 1, 10)] * 3,
+        "amount": [2.5, 4.5, 5.0],
+    }
+)
+
+
+def locked_inventory(mock_db, rows):
+    """Make the first statement, the inventory lock, return rows of (id, product_id, amount)."""
+    mock_db.session.execute.return_value.all.return_value = rows
+
+
+@patch("src.database.sales_recording.db")
+def test_record_sales_runs_set_based_statements_in_lock_order(mock_db):
+    locked_inventory(mock_db, [(10, 1, 5), (11, 2, 7)])
+
+    result = record_sales(SALES)
+
+    assert result == {"sales": 3, "revenue": 12.0, "inventory": {1: 2, 2: 4}}
+    statements = [str(call[0][0]) for call in mock_db.session.execute.call_args_list]
+    assert len(statements) == 8
+    assert "ORDER BY i.id" in statements[0] and "FOR UPDATE" in statements[0]
+    assert "ensure_sales_partitions" in statements[1]
+    assert "ensure_sales_partitions" in statements[2]
+    assert "INSERT INTO history" in statements[3]
+    assert "UPDATE inventory_snapshots" in statements[4]
+    # The statements bumping shared data versions run last, next to the counter update
+    assert "UPDATE inventory" in statements[5]
+    assert "INSERT INTO sales" in statements[6]
+    assert "INSERT INTO counter" in statements[7]
+
+    inventory_params = mock_db.session.execute.call_args_list[5][0][1]
+    assert inventory_params == {"inventory_ids": [10, 11], "quantities": [3, 3]}
+    assert mock_db.session.execute.call_args_list[7][0][1]["revenue"] == 12.0
+    mock_db.session.commit.assert_called_once()
+
+
+@patch("src.database.sales_recording.db")
+def test_record_sales_rejects_batches_exceeding_inventory(mock_db):
+    locked_inventory(mock_db, [(10, 1, 5), (11, 2, 2)])
+
+    with pytest.raises(InsufficientInventory) as error:
+        record_sales(SALES)
+
+    assert error.value.shortages == {2: 1}
+    assert mock_db.session.execute.call_count == 1
+    mock_db.session.rollback.assert_called_once()
+    mock_db.session.commit.assert_not_called()
+
+
+@patch("src.database.sales_recording.db")
+def test_record_sales_requires_inventory_rows(mock_db):
+    locked_inventory(mock_db, [(10, 1, 5)])
+
+    with pytest.raises(ValueError, match="without inventory: 2"):
+        record_sales(SALES)
+
+    mock_db.session.commit.assert_not_called()
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    app.config.update(TESTING=True, LOGIN_DISABLED=True)
+    monkeypatch.setattr(
+        ingest_route,
+        "get_product_dimension",
+        lambda: {1: {"name": "Apple", "price": 1.5}},
+    )
+    yield app.test_client()
+    app.config.update(LOGIN_DISABLED=False)
+
+
+def test_record_route_validates_and_records(client, monkeypatch):
+    record = MagicMock(return_value={"sales": 1, "revenue": 3.0, "inventory": {1: 4}})
+    monkeypatch.setattr(ingest_route, "record_sales", record)
+
+    resp = client.post(
+        "/api/sales/record",
+        json={"sales": [{"product_id": 1, "quantity": 2, "date": "2025-01-01"}]},
+    )
+
+    assert resp.status_code == 201
+    rows = record.call_args[0][0]
+    assert rows["amount"].tolist() == [3.0]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {},
+        {"sales": []},
+        {"sales": [{"product_id": 1}]},
+        {"sales": [{"product_id": 9, "quantity": 1, "date": "2025-01-01"}]},
+    ],
+)
+def test_record_route_rejects_invalid_sales(client, monkeypatch, body):
+    record = MagicMock()
+    monkeypatch.setattr(ingest_route, "record_sales", record)
+
+    assert client.post("/api/sales/record", json=body).status_code == 400
+    record.assert_not_called()
+
+
+def test_record_route_reports_shortages(client, monkeypatch):
+    def record(rows):
+        raise InsufficientInventory({1: 3})
+
+    monkeypatch.setattr(ingest_route, "record_sales", record)
+
+    resp = client.post(
+        "/api/sales/record",
+        json={"sales": [{"product_id": 1, "quantity": 8, "date": "2025-01-01"}]},
+    )
+
+    assert resp.status_code == 409
+    assert resp.get_json()["shortages"] == {"1": 3}
@@ -0,0 +1,78 @@
+"""
+Checks of the trigger-maintained daily totals against a real, migrated Postgres database given
+in TEST_PLAN_DATABASE_URL, skipped otherwise. Every test runs in a transaction that is rolled back.
+"""
+
+import os
+
+import pytest
+from flask import Flask
+from sqlalchemy import text
+
+from ..src.database import sales
+from ..src.extensions import db
+
+PLAN_DATABASE_URL = os.getenv("TEST_PLAN_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not PLAN_DATABASE_URL, reason="TEST_PLAN_DATABASE_URL (a migrated Postgres) is not set"
+)
+
+DAY = "2024-06-15"
+
+
+@pytest.fixture()
+def session():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = PLAN_DATABASE_URL
+    db.init_app(app)
+
+    with app.app_context():
+        db.session.execute(text("SELECT ensure_sales_partitions(:day, :day);"), {"day": DAY})
+        yield
+        db.session.rollback()
+        db.session.remove()
+
+
+def test_basket_of_two_products_is_one_transaction(session):
+    products = db.session.execute(
+        text(
+            """
+            INSERT INTO products (name, price) VALUES ('basket a', 1), ('basket b', 2)
+            RETURNING id;
+            """
+        )
+    ).scalars()
+    first, second = sorted(products)
+    # t1 is a basket of both products, t2 a sale of the first product only
+    db.session.execute(
+        text(
+            """
+            INSERT INTO sales (transaction_id, product_id, quantity, date, amount) VALUES
+                ('t1', :first, 1, CAST(:day AS timestamp) + time '10:00', 1),
+                ('t1', :second, 1, CAST(:day AS timestamp) + time '10:00', 2),
+                ('t2', :first, 2, CAST(:day AS timestamp) + time '12:00', 2);
+            """
+        ),
+        {"first": first, "second": second, "day": DAY},
+    )
+    existing = db.session.execute(
+        text("SELECT count(*) FROM sales WHERE date::date = :day AND product_id < :first;"),
+        {"day": DAY, "first": first},
+    ).scalar()
+    if existing:
+        pytest.skip(f"the database already has sales on {DAY}")
+
+    assert sales.fetch_sales_data(DAY, DAY) == {"revenue": 5.0, "sales": 4, "transactions": 2}
+    assert sales.fetch_sales_data_ranges({"day": (DAY, DAY)})["day"]["transactions"] == 2
+    assert [row.transactions for row in sales.query_daily_series(DAY, DAY)] == [2]
+    assert [row.transactions for row in sales.query_transactions(DAY, DAY)] == [2]
+    # Per product, the basket counts for both
+    per_product = db.session.execute(
+        text("SELECT SUM(transactions) FROM sales_daily_rollup WHERE day = :day;"), {"day": DAY}
+    ).scalar()
+    assert per_product == 3
+
+    db.session.execute(text("DELETE FROM sales WHERE transaction_id = 't2';"))
+
+    assert sales.fetch_sales_data(DAY, DAY)["transactions"] == 1
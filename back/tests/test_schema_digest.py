@@ -0,0 +1,114 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.services import schema_digest
+
+
+def column(table, name, data_type):
+    return SimpleNamespace(table_name=table, column_name=name, data_type=data_type)
+
+
+def key(table, name, kind, ref_table=None, ref_column=None):
+    return SimpleNamespace(
+        table_name=table,
+        column_name=name,
+        constraint_type=kind,
+        ref_table=ref_table,
+        ref_column=ref_column,
+    )
+
+
+COLUMNS = [
+    column("products", "id", "integer"),
+    column("products", "name", "character varying"),
+    column("sales", "id", "integer"),
+    column("sales", "product_id", "integer"),
+    column("sales", "date", "timestamp without time zone"),
+    column("sales", "amount", "numeric"),
+]
+KEYS = [
+    key("products", "id", "PRIMARY KEY"),
+    key("sales", "id", "PRIMARY KEY"),
+    key("sales", "date", "PRIMARY KEY"),
+    key("sales", "product_id", "FOREIGN KEY", "products", "id"),
+]
+
+
+class FakeEngine:
+    """Engine answering the fingerprint, column and key queries, counting them."""
+
+    url = "postgresql://test"
+
+    def __init__(self):
+        self.fingerprint = "f1"
+        self.queries = []
+
+    def connect(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params):
+        sql = str(statement)
+        self.queries.append(sql)
+        if "md5" in sql:
+            return SimpleNamespace(scalar=lambda: self.fingerprint)
+        rows = COLUMNS if "ordinal_position" in sql else KEYS
+        return SimpleNamespace(all=lambda: rows)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    schema_digest.clear_schema_digests()
+    yield
+    schema_digest.clear_schema_digests()
+
+
+def test_format_schema_digest_is_compact():
+    assert schema_digest.format_schema_digest(COLUMNS, KEYS) == (
+        "products(id int PK, name varchar)\n"
+        "sales(id int PK, product_id int -> products.id, date timestamp PK, amount numeric)"
+        " -- one row per sale, partitioned by month on date"
+    )
+
+
+def test_digest_is_rebuilt_only_when_the_fingerprint_changes():
+    engine = FakeEngine()
+    digest = schema_digest.get_schema_digest(engine)
+    assert digest["fingerprint"] == "f1"
+    assert digest["tables"] == {
+        "products": ["id", "name"],
+        "sales": ["id", "product_id", "date", "amount"],
+    }
+    assert len(engine.queries) == 3
+
+    # Within max_age nothing is queried, after it only the fingerprint
+    assert schema_digest.get_schema_digest(engine) is digest
+    assert len(engine.queries) == 3
+    assert schema_digest.get_schema_digest(engine, max_age=0) is digest
+    assert len(engine.queries) == 4
+
+    engine.fingerprint = "f2"
+    rebuilt = schema_digest.get_schema_digest(engine, max_age=0)
+    assert rebuilt["fingerprint"] == "f2"
+    assert len(engine.queries) == 7
+
+
+def test_queries_are_limited_to_the_allow_list():
+    engine = FakeEngine()
+    seen = []
+    engine.execute = lambda statement, params: (
+        seen.append(params["tables"]) or FakeEngine.execute(FakeEngine(), statement, params)
+    )
+    schema_digest.get_schema_digest(engine)
+    assert all(tables == schema_digest.SCHEMA_TABLES for tables in seen)
+    assert "users" not in schema_digest.SCHEMA_TABLES and "chat" not in schema_digest.SCHEMA_TABLES
@@ -0,0 +1,105 @@
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask, g
+
+from ..src.utils import snapshot_store
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Replace the snapshot table with a dict and the session with a mock."""
+    snapshots = {}
+    fake_db = MagicMock()
+    monkeypatch.setattr(snapshot_store, "db", fake_db)
+    monkeypatch.setattr(snapshot_store, "snapshot_version", lambda tables, daily=False: "v2")
+    monkeypatch.setattr(snapshot_store, "get_snapshot", snapshots.get)
+    monkeypatch.setattr(snapshot_store, "lock_snapshot", lambda key, wait=True: True)
+    monkeypatch.setattr(
+        snapshot_store,
+        "save_snapshot",
+        lambda key, payload, version: snapshots.__setitem__(
+            key, {"payload": payload, "data_version": version}
+        ),
+    )
+    monkeypatch.setattr(snapshot_store, "prune_snapshots", MagicMock(return_value=0))
+    scheduled = []
+    monkeypatch.setattr(
+        snapshot_store, "schedule_refresh", lambda key, version, build: scheduled.append(key)
+    )
+    return snapshots, scheduled, fake_db
+
+
+def test_cold_snapshot_is_built_and_stored(store):
+    snapshots, scheduled, fake_db = store
+    build = MagicMock(return_value={"a": 1})
+
+    payload = snapshot_store.get_shared_snapshot("dashboard", ["sales"], build)
+
+    assert payload == {"a": 1}
+    assert snapshots["dashboard"]["data_version"] == "v2"
+    build.assert_called_once()
+    fake_db.session.commit.assert_called_once()
+    assert not scheduled
+
+
+def test_rebuild_prunes_the_family_of_variant_keys(store):
+    build = MagicMock(return_value={"a": 1})
+
+    snapshot_store.rebuild_snapshot("dashboard", "v2", build)
+    snapshot_store.prune_snapshots.assert_not_called()
+
+    snapshot_store.rebuild_snapshot("dashboard:2025-03-31", "v2", build)
+    snapshot_store.prune_snapshots.assert_called_once_with(
+        "dashboard:", snapshot_store.MAX_VARIANTS
+    )
+
+
+def test_current_snapshot_is_served_without_building(store):
+    snapshots, scheduled, _ = store
+    snapshots["dashboard"] = {"payload": {"a": 1}, "data_version": "v2"}
+    build = MagicMock()
+
+    assert snapshot_store.get_shared_snapshot("dashboard", ["sales"], build) == {"a": 1}
+    build.assert_not_called()
+    assert not scheduled
+
+
+def test_stale_snapshot_is_served_and_refreshed_in_background(store):
+    snapshots, scheduled, _ = store
+    snapshots["dashboard"] = {"payload": {"a": 0}, "data_version": "v1"}
+    build = MagicMock()
+
+    app = Flask(__name__)
+    with app.test_request_context():
+        assert snapshot_store.get_shared_snapshot("dashboard", ["sales"], build) == {"a": 0}
+        assert g.stale_response is True
+
+    build.assert_not_called()
+    assert scheduled == ["dashboard"]
+
+
+def test_rebuild_reuses_snapshot_stored_while_waiting(store):
+    snapshots, _, _ = store
+    snapshots["dashboard"] = {"payload": {"a": 1}, "data_version": "v2"}
+    build = MagicMock()
+
+    assert snapshot_store.rebuild_snapshot("dashboard", "v2", build) == {"a": 1}
+    build.assert_not_called()
+
+
+def test_rebuild_gives_up_when_lock_is_taken(store, monkeypatch):
+    monkeypatch.setattr(snapshot_store, "lock_snapshot", lambda key, wait=True: False)
+    build = MagicMock()
+
+    assert snapshot_store.rebuild_snapshot("dashboard", "v2", build, wait=False) is None
+    build.assert_not_called()
+
+
+def test_unavailable_store_falls_back_to_build(monkeypatch):
+    def failing_version(tables, daily=False):
+        raise RuntimeError("no data_versions table")
+
+    monkeypatch.setattr(snapshot_store, "snapshot_version", failing_version)
+
+    assert snapshot_store.get_shared_snapshot("dashboard", ["sales"], lambda: {"a": 1}) == {"a": 1}
@@ -2,12 +2,20 @@ import os
 from types import SimpleNamespace
 
 import pytest
+from langchain_core.messages import AIMessage
 
 os.environ.setdefault("OPENAI_API_KEY", "test")
 
 import src.services.sql_agent as sql_agent
 
 
+@pytest.fixture(autouse=True)
+def no_schema(monkeypatch):
+    """Nodes that read the schema digest see an empty one instead of a database."""
+    digest = {"fingerprint": "", "text": "", "tables": {}}
+    monkeypatch.setattr(sql_agent, "_schema_digest", lambda: digest)
+
+
 def test_get_env_or_raise_ok(monkeypatch):
     monkeypatch.setenv("FOO", "bar")
     assert sql_agent._get_env_or_raise("FOO") == "bar"
@@ -28,7 +36,7 @@ def test_should_continue_no_tool_calls():
 def test_should_continue_with_tool_calls():
     state = {"messages": [make_msg(content="hi", tool_calls=[{"foo": "bar"}])]}
     res = sql_agent.should_continue_after_generate(state)
-    assert res == "check_query"
+    assert res == "validate_query"
 
 
 def test_run_sql_agent_invokes_graph(monkeypatch):
@@ -70,7 +78,7 @@ def _patch_llm_and_toolkit(monkeypatch, response_text="ok"):
             return fake_response
 
     class FakeLLM:
-        def bind_tools(self, tools, tool_choice=None):
+        def bind_tools(self, tools, tool_choice=None, parallel_tool_calls=None):
             return FakeBound()
 
     class FakeTool:
@@ -93,9 +101,14 @@ def _patch_llm_and_toolkit(monkeypatch, response_text="ok"):
 
     monkeypatch.setattr(sql_agent, "_make_llm", lambda: FakeLLM())
     monkeypatch.setattr(sql_agent, "_make_toolkit", lambda: FakeToolkit())
+    monkeypatch.setattr(sql_agent, "CachedQuerySQLDatabaseTool", FakeCachedQueryTool)
     return fake_response
 
 
+class FakeCachedQueryTool(SimpleNamespace):
+    name = "sql_db_query"
+
+
 def test_check_query_sets_response_id(monkeypatch):
     fake_resp = _patch_llm_and_toolkit(monkeypatch, response_text="checked query")
 
@@ -126,7 +139,8 @@ def test_generate_query_invokes_llm(monkeypatch):
             return fake_response
 
     class FakeLLM:
-        def bind_tools(self, tools, tool_choice=None):
+        def bind_tools(self, tools, tool_choice=None, parallel_tool_calls=None):
+            captured["tools"] = tools
             return FakeBound()
 
     class FakeTool:
@@ -143,8 +157,10 @@ def test_generate_query_invokes_llm(monkeypatch):
         def get_tools(self):
             return [FakeTool("sql_db_query")]
 
+    toolkit = FakeToolkit()
     monkeypatch.setattr(sql_agent, "_make_llm", lambda: FakeLLM())
-    monkeypatch.setattr(sql_agent, "_make_toolkit", lambda: FakeToolkit())
+    monkeypatch.setattr(sql_agent, "_make_toolkit", lambda: toolkit)
+    monkeypatch.setattr(sql_agent, "CachedQuerySQLDatabaseTool", FakeCachedQueryTool)
 
     state = {"messages": [{"role": "user", "content": "How many users?"}]}
     out = sql_agent.generate_query(state)
@@ -152,6 +168,9 @@ def test_generate_query_invokes_llm(monkeypatch):
     assert out["messages"][0].content == "generated answer"
     assert isinstance(captured.get("msgs"), list)
     assert captured["msgs"][0]["role"] == "system"
+    # The model is bound to the tool the run_query node executes
+    [tool] = captured["tools"]
+    assert isinstance(tool, FakeCachedQueryTool) and tool.db is toolkit.db
 
 
 def test_call_get_schema_forwards_messages(monkeypatch):
@@ -163,7 +182,7 @@ def test_call_get_schema_forwards_messages(monkeypatch):
             return fake_response
 
     class FakeLLM:
-        def bind_tools(self, tools, tool_choice=None):
+        def bind_tools(self, tools, tool_choice=None, parallel_tool_calls=None):
             return FakeBound()
 
     class FakeTool:
@@ -248,3 +267,144 @@ def test_make_llm_and_toolkit_types(monkeypatch):
 
     assert isinstance(llm, ChatOpenAI)
     assert isinstance(toolkit, SQLDatabaseToolkit)
+
+
+def human(content):
+    return SimpleNamespace(type="human", content=content)
+
+
+def tool_result(content, tool_call_id):
+    return SimpleNamespace(type="tool", content=content, tool_call_id=tool_call_id)
+
+
+@pytest.fixture()
+def plans(monkeypatch):
+    stored = {}
+    monkeypatch.setattr(sql_agent, "_schema_fingerprint", lambda: "fp")
+    monkeypatch.setattr(
+        sql_agent, "store_plan", lambda q, fp, sql: stored.setdefault((q, fp), sql) or True
+    )
+    monkeypatch.setattr(sql_agent, "lookup_plan", lambda q, fp: stored.get((q, fp)))
+    monkeypatch.setattr(sql_agent, "evict_plan", lambda q, fp: stored.pop((q, fp), None))
+    return stored
+
+
+def test_lookup_cached_plan_miss_goes_to_generate(plans):
+    state = {"messages": [human("How many sales?"), make_msg("schema")]}
+    assert sql_agent.lookup_cached_plan(state) == {"messages": []}
+    assert sql_agent.should_use_cached_plan(state) == "generate_query"
+
+
+def test_lookup_cached_plan_hit_goes_to_run_query(plans):
+    plans[("How many sales?", "fp")] = "SELECT COUNT(*) FROM sales"
+    state = {"messages": [human("How many sales?"), make_msg("schema")]}
+
+    [message] = sql_agent.lookup_cached_plan(state)["messages"]
+    assert message.tool_calls[0]["name"] == "sql_db_query"
+    assert message.tool_calls[0]["args"] == {"query": "SELECT COUNT(*) FROM sales"}
+    assert sql_agent.should_use_cached_plan({"messages": [message]}) == "run_query"
+
+
+def test_remember_plan_stores_successful_query(plans):
+    call = {"name": "sql_db_query", "args": {"query": "SELECT 1"}, "id": "call-1"}
+    state = {
+        "messages": [
+            human("q"),
+            make_msg(tool_calls=[call]),
+            tool_result("[(1,)]", "call-1"),
+        ]
+    }
+    sql_agent.remember_plan(state)
+    assert plans == {("q", "fp"): "SELECT 1"}
+
+
+def test_remember_plan_skips_errors_and_cached_calls(plans):
+    call = {"name": "sql_db_query", "args": {"query": "SELECT x"}, "id": "call-1"}
+    failed = {"messages": [human("q"), make_msg(tool_calls=[call]), tool_result("Error", "call-1")]}
+    sql_agent.remember_plan(failed)
+
+    cached_id = sql_agent.PLAN_CALL_PREFIX + "1"
+    cached = {"messages": [human("q2"), tool_result("[(1,)]", cached_id)]}
+    sql_agent.remember_plan(cached)
+    assert plans == {}
+
+
+def test_generate_query_evicts_failed_cached_plan(monkeypatch, plans):
+    _patch_llm_and_toolkit(monkeypatch)
+    plans[("q", "fp")] = "SELECT missing"
+    failed = tool_result("Error: column missing", sql_agent.PLAN_CALL_PREFIX + "1")
+
+    sql_agent.generate_query({"messages": [human("q"), failed]})
+    assert plans == {}
+
+
+TABLES = {"products": ["id", "name"]}
+
+
+def query_call(query, name=None):
+    call = {"name": "sql_db_query", "args": {"query": query}, "id": "call-1", "type": "tool_call"}
+    return AIMessage(content="", tool_calls=[call], id="ai-1", name=name)
+
+
+@pytest.fixture()
+def schema(monkeypatch):
+    digest = {"fingerprint": "fp", "text": "products(id int PK, name varchar)", "tables": TABLES}
+    monkeypatch.setattr(sql_agent, "_schema_digest", lambda: digest)
+
+
+def test_validate_query_runs_valid_query_with_limit(schema):
+    state = {"messages": [human("q"), query_call("SELECT p.name FROM products p;")]}
+    [message] = sql_agent.validate_query(state)["messages"]
+
+    assert message.id == "ai-1"
+    assert message.tool_calls[0]["args"]["query"].endswith("\nLIMIT 10000")
+    assert sql_agent.after_validate_query({"messages": [message]}) == "run_query"
+
+
+def test_validate_query_runs_only_the_first_call(schema):
+    message = query_call("SELECT name FROM products")
+    second = {**message.tool_calls[0], "id": "call-2", "args": {"query": "SELECT id FROM products"}}
+    message = message.model_copy(update={"tool_calls": [message.tool_calls[0], second]})
+    [validated] = sql_agent.validate_query({"messages": [human("q"), message]})["messages"]
+
+    assert [call["id"] for call in validated.tool_calls] == ["call-1"]
+
+
+def test_validate_query_sends_failing_query_to_check(schema):
+    state = {"messages": [human("q"), query_call("SELECT p.nme FROM products p")]}
+    assert sql_agent.validate_query(state) == {"messages": []}
+    assert sql_agent.after_validate_query(state) == "check_query"
+
+
+def test_validate_query_rejects_query_failing_after_check(schema):
+    checked = query_call("DELETE FROM products", name=sql_agent.CHECKED)
+    [rejection] = sql_agent.validate_query({"messages": [human("q"), checked]})["messages"]
+
+    assert rejection.tool_call_id == "call-1"
+    assert rejection.content.startswith("Error: query rejected")
+    assert "DELETE" in rejection.content
+    state = {"messages": [human("q"), checked, rejection]}
+    assert sql_agent.after_validate_query(state) == "generate_query"
+
+
+def test_check_query_is_told_the_problems(monkeypatch, schema):
+    seen = {}
+    _patch_llm_and_toolkit(monkeypatch)
+
+    class Bound:
+        def invoke(self, messages):
+            seen["content"] = messages[-1]["content"]
+            return SimpleNamespace(content="", id=None)
+
+    monkeypatch.setattr(
+        sql_agent, "_make_llm", lambda: SimpleNamespace(bind_tools=lambda *a, **k: Bound())
+    )
+    out = sql_agent.check_query({"messages": [query_call("SELECT p.nme FROM products p")]})
+
+    assert "Unknown column nme in table products" in seen["content"]
+    assert out["messages"][0].name == sql_agent.CHECKED
+
+
+def test_get_cached_schema_returns_digest(schema):
+    [message] = sql_agent.get_cached_schema({"messages": []})["messages"]
+    assert message.content.endswith("\nproducts(id int PK, name varchar)")
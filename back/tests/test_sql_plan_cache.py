@@ -0,0 +1,152 @@
+import json
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.index import app
+from src.services import sql_plan_cache
+
+SQL = (
+    "SELECT date, SUM(amount) FROM sales "
+    "WHERE date >= '2025-01-01' AND date <= '2025-01-31' AND product_id = 3 "
+    "GROUP BY date LIMIT 10"
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    sql_plan_cache.clear_plans()
+    yield
+    sql_plan_cache.clear_plans()
+
+
+def test_normalize_question_lifts_values():
+    key, values = sql_plan_cache.normalize_question(
+        "  Revenue of product 3   between 2025-01-01 and 2025-01-31 in 2025-01? "
+    )
+    assert key == "revenue of product {number} between {date} and {date} in {month}"
+    assert values == ["3", "2025-01-01", "2025-01-31", "2025-01"]
+
+
+def test_normalize_question_keeps_numbers_inside_words():
+    key, values = sql_plan_cache.normalize_question("Sales of q4 item x2, 1.5 kg")
+    assert key == "sales of q4 item x2, {number} kg"
+    assert values == ["1.5"]
+
+
+def test_template_round_trip():
+    values = ["3", "2025-01-01", "2025-01-31"]
+    template = sql_plan_cache.make_template(SQL, values)
+    assert "2025" not in template
+    assert "product_id = __p0__" in template
+    assert "LIMIT 10" in template
+    assert sql_plan_cache.render_template(template, values) == SQL
+    assert "'2024-02-01'" in sql_plan_cache.render_template(
+        template, ["5", "2024-02-01", "2024-02-29"]
+    )
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        ["4", "2025-01-01", "2025-01-31"],  # 4 is not in the SQL
+        ["10", "2025-01-01", "2025-01-31"],  # 10 is also the LIMIT of every question
+        ["2025-01-01"],  # the end date was derived from the question
+        ["2025-01-01", "2025-01-01"],
+    ],
+)
+def test_make_template_rejects_ambiguous_sql(values):
+    sql = SQL.replace("LIMIT 10", "LIMIT 10 OFFSET 10")
+    assert sql_plan_cache.make_template(sql, values) is None
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT SUM(quantity) FROM sales_daily_rollup WHERE EXTRACT(YEAR FROM day) = 2026",
+        "SELECT SUM(quantity) FROM sales_daily_rollup WHERE to_char(day, 'YYYY-MM') = '2026-10'",
+    ],
+)
+def test_make_template_rejects_derived_periods(sql):
+    assert sql_plan_cache.make_template(sql, []) is None
+
+
+def test_relative_questions_are_cached_per_day(monkeypatch):
+    sql = "SELECT SUM(quantity) FROM sales_daily_rollup WHERE EXTRACT(MONTH FROM day) = 9"
+    assert sql_plan_cache.store_plan("Total sales last month?", "fp", sql)
+    assert sql_plan_cache.lookup_plan("total sales last month", "fp") == sql
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+
+    monkeypatch.setattr(sql_plan_cache, "date", Tomorrow)
+    assert sql_plan_cache.lookup_plan("total sales last month", "fp") is None
+
+
+def test_store_and_lookup_with_other_values():
+    question = "Daily revenue of product 3 from 2025-01-01 to 2025-01-31"
+    assert sql_plan_cache.lookup_plan(question, "fp") is None
+    assert sql_plan_cache.store_plan(question, "fp", SQL)
+
+    sql = sql_plan_cache.lookup_plan(
+        "daily revenue of product 7 from 2024-03-01 to 2024-03-31?", "fp"
+    )
+    assert "product_id = 7" in sql
+    assert "date >= '2024-03-01' AND date <= '2024-03-31'" in sql
+    # Another schema is another cache
+    assert sql_plan_cache.lookup_plan(question, "other") is None
+
+    stats = sql_plan_cache.plan_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["stores"], stats["size"]) == (1, 2, 1, 1)
+    [plan] = sql_plan_cache.list_plans()
+    assert plan["question"] == "daily revenue of product {number} from {date} to {date}"
+    assert plan["hits"] == 1 and plan["last_hit_at"] is not None
+
+
+def test_uncacheable_sql_is_counted():
+    assert not sql_plan_cache.store_plan("Revenue in 2025-01", "fp", SQL)
+    assert sql_plan_cache.plan_cache_stats()["uncacheable"] == 1
+    assert sql_plan_cache.list_plans() == []
+
+
+def test_least_recently_used_plan_is_evicted(monkeypatch):
+    monkeypatch.setattr(sql_plan_cache, "PLAN_CACHE_SIZE", 2)
+    sql_plan_cache.store_plan("first", "fp", "SELECT 1")
+    sql_plan_cache.store_plan("second", "fp", "SELECT 2")
+    sql_plan_cache.lookup_plan("first", "fp")
+    sql_plan_cache.store_plan("third", "fp", "SELECT 3")
+
+    assert [plan["question"] for plan in sql_plan_cache.list_plans()] == ["third", "first"]
+    assert sql_plan_cache.plan_cache_stats()["evictions"] == 1
+
+    sql_plan_cache.evict_plan("first", "fp")
+    assert sql_plan_cache.lookup_plan("first", "fp") is None
+
+
+def test_route_lists_plans_without_questions_or_sql_and_clears_them():
+    sql_plan_cache.store_plan("top products", "fp", "SELECT name FROM products")
+    app.config.update(TESTING=True, LOGIN_DISABLED=True)
+    try:
+        client = app.test_client()
+        body = client.get("/api/sql-plans").get_json()
+        assert body["stats"]["size"] == 1
+        assert set(body["plans"][0]) == {
+            "id",
+            "schema_fingerprint",
+            "hits",
+            "created_at",
+            "last_hit_at",
+        }
+        assert "top products" not in json.dumps(body) and "SELECT" not in json.dumps(body)
+
+        body = client.delete("/api/sql-plans").get_json()
+        assert body["stats"]["size"] == 0
+        assert sql_plan_cache.list_plans() == []
+    finally:
+        app.config.update(LOGIN_DISABLED=False)
@@ -0,0 +1,194 @@
+import json
+import sys
+from contextlib import nullcontext
+from pathlib import Path
+
+import pytest
+from sqlalchemy.exc import ProgrammingError
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.services import sql_result_cache, sql_result_store
+
+TABLES = ["customers", "history", "inventory", "products", "sales", "sales_daily_rollup"]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def keys(self):
+        return ["id", "name"]
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeSQLDatabase:
+    """Stand-in for the toolkit's SQLDatabase, counting the queries that reach it."""
+
+    dialect = type("Dialect", (), {"name": "sqlite"})()
+
+    def __init__(self, rows=((1, "Milk"),), error=None):
+        self.rows = list(rows)
+        self.error = error
+        self.queries = []
+        self._engine = type("Engine", (), {"connect": lambda engine: nullcontext(self)})()
+
+    def get_usable_table_names(self):
+        return TABLES
+
+    def execute(self, statement):
+        self.queries.append(str(statement))
+        if self.error:
+            raise ProgrammingError(str(statement), {}, Exception(self.error))
+        return FakeResult(self.rows)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    sql_result_cache.clear_result_cache()
+    yield
+    sql_result_cache.clear_result_cache()
+    sql_result_store.clear_result_store()
+
+
+@pytest.fixture()
+def versions(monkeypatch):
+    """Data version counters, editable by the test."""
+    state = {"sales": 1, "products": 1}
+    monkeypatch.setattr(
+        sql_result_cache,
+        "data_version_key",
+        lambda tables, connection: ",".join(f"{t}:{state.get(t, 0)}" for t in tables),
+    )
+    return state
+
+
+def test_canonicalize_sql_keeps_literals():
+    sql = "SELECT  name\n FROM Products -- all of them\nWHERE name = 'Big  Milk' ;"
+    assert (
+        sql_result_cache.canonicalize_sql(sql)
+        == "select name from products where name = 'Big  Milk'"
+    )
+    assert sql_result_cache.canonicalize_sql('select "Name" from products') == (
+        'select "Name" from products'
+    )
+
+
+@pytest.mark.parametrize(
+    "sql, counters",
+    [
+        ("select sum(amount) from sales_y2025m01", ["sales"]),
+        ("select p.name from products p join sales s using (product_id)", ["products", "sales"]),
+        ("select * from sales_daily_rollup where day = 'history'", ["sales_rollup"]),
+        ("select 1", []),
+        ("select * from history", None),
+        ("select * from sales where date > now() - interval '1 day'", None),
+        ("with gone as (delete from sales returning *) select count(*) from gone", None),
+        ("delete from sales", None),
+    ],
+)
+def test_version_counters(sql, counters):
+    assert sql_result_cache.version_counters(sql, set(TABLES)) == counters
+
+
+def test_repeated_query_is_served_from_cache(versions):
+    sql_db = FakeSQLDatabase()
+    first = sql_result_cache.run_cached_query(sql_db, "SELECT name FROM products;")
+    second = sql_result_cache.run_cached_query(sql_db, "select name\n  from products")
+
+    assert first is second
+    assert first.to_dict("list") == {"id": [1], "name": ["Milk"]}
+    assert len(sql_db.queries) == 1
+    stats = sql_result_cache.result_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_write_to_a_queried_table_invalidates(versions):
+    sql_db = FakeSQLDatabase()
+    sql_result_cache.run_cached_query(sql_db, "select name from products")
+    versions["sales"] += 1
+    sql_result_cache.run_cached_query(sql_db, "select name from products")
+    assert len(sql_db.queries) == 1
+
+    versions["products"] += 1
+    sql_result_cache.run_cached_query(sql_db, "select name from products")
+    assert len(sql_db.queries) == 2
+
+
+def test_errors_and_unversioned_tables_are_not_cached(versions):
+    failing = FakeSQLDatabase(error="relation does not exist")
+    result = sql_result_cache.run_cached_query(failing, "select x from products")
+    assert result.startswith("Error:") and "relation does not exist" in result
+    sql_result_cache.run_cached_query(failing, "select x from products")
+    assert len(failing.queries) == 2
+
+    sql_db = FakeSQLDatabase()
+    sql_result_cache.run_cached_query(sql_db, "select * from history")
+    sql_result_cache.run_cached_query(sql_db, "select * from history")
+    assert len(sql_db.queries) == 2
+    assert sql_result_cache.result_cache_stats()["uncacheable"] == 2
+
+
+def test_missing_data_versions_runs_uncached(monkeypatch):
+    def unavailable(tables, connection):
+        raise RuntimeError("no data_versions table")
+
+    monkeypatch.setattr(sql_result_cache, "data_version_key", unavailable)
+    sql_db = FakeSQLDatabase()
+    sql_result_cache.run_cached_query(sql_db, "select name from products")
+    sql_result_cache.run_cached_query(sql_db, "select name from products")
+    assert len(sql_db.queries) == 2
+
+
+def test_cache_is_bounded_by_bytes(monkeypatch, versions):
+    sql_db = FakeSQLDatabase()
+    size = int(
+        sql_result_cache.query_frame(sql_db, "select 1").memory_usage(index=True, deep=True).sum()
+    )
+    sql_db.queries.clear()
+    monkeypatch.setattr(sql_result_cache, "RESULT_CACHE_BYTES", size * 2 + size // 2)
+    monkeypatch.setattr(sql_result_cache, "MAX_CACHED_RESULT_BYTES", size * 2)
+    for i in range(3):
+        sql_result_cache.run_cached_query(sql_db, f"select {i} from products")
+
+    stats = sql_result_cache.result_cache_stats()
+    assert (stats["size"], stats["bytes"], stats["evictions"]) == (2, size * 2, 1)
+    # The oldest query was evicted
+    sql_result_cache.run_cached_query(sql_db, "select 0 from products")
+    assert len(sql_db.queries) == 4
+
+    # A result above MAX_CACHED_RESULT_BYTES is returned but not cached
+    sql_db.rows = [(i, "Milk") for i in range(100)]
+    sql_result_cache.run_cached_query(sql_db, "select 9 from products")
+    assert sql_result_cache.result_cache_stats()["size"] == 2
+
+
+def test_postgres_queries_run_read_only(versions):
+    sql_db = FakeSQLDatabase()
+    sql_db.dialect = type("Dialect", (), {"name": "postgresql"})()
+    sql_result_cache.query_frame(sql_db, "select name from products")
+    assert sql_db.queries == ["SET TRANSACTION READ ONLY", "select name from products"]
+
+
+def test_tool_keeps_the_query_tool_interface(versions):
+    sql_db = FakeSQLDatabase()
+    tool = sql_result_cache.CachedQuerySQLDatabaseTool.model_construct(db=sql_db)
+    assert tool.name == "sql_db_query"
+    first = json.loads(tool.invoke({"query": "select name from products"}))
+    second = json.loads(tool.invoke({"query": "select name from products"}))
+    assert len(sql_db.queries) == 1
+
+    assert first == second
+    assert first["row_count"] == 1
+    assert first["data"] == {"id": [1], "name": ["Milk"]}
+    # The cached result keeps its handle in the result store
+    assert sql_result_store.get_result(first["handle"]).to_dict("list") == first["data"]
+
+
+def test_tool_returns_errors_as_text(versions):
+    tool = sql_result_cache.CachedQuerySQLDatabaseTool.model_construct(
+        db=FakeSQLDatabase(error="syntax error")
+    )
+    assert tool.invoke({"query": "select nme from products"}).startswith("Error:")
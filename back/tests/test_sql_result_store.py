@@ -0,0 +1,144 @@
+import json
+import sys
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.services import sql_result_store
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    sql_result_store.clear_result_store()
+    yield
+    sql_result_store.clear_result_store()
+
+
+def sales(days: int) -> pd.DataFrame:
+    return sql_result_store.result_frame(
+        ["day", "product", "total", "returned"],
+        [
+            (date(2025, 1, 1) + pd.Timedelta(days=i), f"p{i % 3}", Decimal(i), i % 2 == 0)
+            for i in range(days)
+        ],
+    )
+
+
+def test_result_frame_converts_decimals():
+    frame = sql_result_store.result_frame(["total"], [(Decimal("1.50"),), (None,)])
+    assert frame["total"].dtype == float
+    assert frame["total"].iloc[0] == 1.5
+
+
+def test_short_result_is_returned_whole():
+    shaped = sql_result_store.shape_result(sales(3), "sqlres_x")
+    assert shaped == {
+        "handle": "sqlres_x",
+        "row_count": 3,
+        "columns": ["day", "product", "total", "returned"],
+        "data": {
+            "day": ["2025-01-01", "2025-01-02", "2025-01-03"],
+            "product": ["p0", "p1", "p2"],
+            "total": [0.0, 1.0, 2.0],
+            "returned": [True, False, True],
+        },
+    }
+    json.dumps(shaped)
+
+
+def test_long_result_is_capped_to_head_tail_and_summary(monkeypatch):
+    monkeypatch.setattr(sql_result_store, "PREVIEW_ROWS", 10)
+    monkeypatch.setattr(sql_result_store, "HEAD_ROWS", 3)
+    monkeypatch.setattr(sql_result_store, "TAIL_ROWS", 2)
+    shaped = sql_result_store.shape_result(sales(100), "sqlres_x")
+
+    assert shaped["truncated"] is True
+    assert shaped["row_count"] == 100
+    assert "data" not in shaped
+    assert shaped["head"]["total"] == [0.0, 1.0, 2.0]
+    assert shaped["tail"]["day"] == ["2025-04-09", "2025-04-10"]
+    assert shaped["summary"] == {
+        "day": {"min": "2025-01-01", "max": "2025-04-10", "distinct": 100},
+        "product": {"min": "p0", "max": "p2", "distinct": 3},
+        "total": {"min": 0.0, "max": 99.0, "mean": 49.5, "sum": 4950.0},
+        "returned": {"true": 50, "false": 50},
+    }
+    json.dumps(shaped)
+
+
+def test_nulls_are_json_null():
+    frame = sql_result_store.result_frame(["a", "b"], [(None, 1.0), (None, None)])
+    shaped = sql_result_store.shape_result(frame, "sqlres_x")
+    assert shaped["data"] == {"a": [None, None], "b": [1.0, None]}
+    assert sql_result_store._summary(frame["a"]) == {"nulls_only": True}
+
+
+def test_handle_returns_the_full_result():
+    frame = sales(100)
+    handle = sql_result_store.put_result(frame)
+    assert sql_result_store.is_result_handle(handle)
+    assert not sql_result_store.is_result_handle('[{"date": "2025-01-01"}]')
+    assert sql_result_store.get_result(handle) is frame
+    # The same frame, e.g. from the query cache, keeps its handle
+    assert sql_result_store.put_result(frame) == handle
+    assert sql_result_store.get_result("sqlres_unknown") is None
+
+
+def test_require_result_checks_the_columns():
+    handle = sql_result_store.put_result(sales(3))
+
+    assert sql_result_store.require_result(handle, columns=("day",)) is not None
+    with pytest.raises(ValueError, match="has no date column, it has day, product"):
+        sql_result_store.require_result(handle, columns=("date",))
+    with pytest.raises(ValueError, match="has expired"):
+        sql_result_store.require_result("sqlres_unknown")
+
+
+def test_store_is_bounded_by_bytes(monkeypatch):
+    frames = [sales(10) for _ in range(3)]
+    size = int(frames[0].memory_usage(index=True, deep=True).sum())
+    monkeypatch.setattr(sql_result_store, "STORE_BYTES", size * 2)
+    handles = [sql_result_store.put_result(frame) for frame in frames]
+
+    assert sql_result_store.get_result(handles[0]) is None
+    assert sql_result_store.get_result(handles[1]) is frames[1]
+    assert sql_result_store.get_result(handles[2]) is frames[2]
+    # An evicted frame is stored again under a new handle
+    assert sql_result_store.put_result(frames[0]) != handles[0]
+
+
+def test_result_larger_than_the_store_gets_no_handle(monkeypatch):
+    kept, too_large = sales(3), sales(100)
+    monkeypatch.setattr(
+        sql_result_store,
+        "STORE_BYTES",
+        int(too_large.memory_usage(index=True, deep=True).sum()) - 1,
+    )
+    handle = sql_result_store.put_result(kept)
+
+    assert sql_result_store.put_result(too_large) is None
+    # Nothing was evicted to make room for it
+    assert sql_result_store.get_result(handle) is kept
+
+    shaped = sql_result_store.shape_result(too_large, None)
+    assert shaped["handle"] is None
+    assert shaped["message"].startswith("Result too large to keep")
+    json.dumps(shaped)
+
+
+def test_handles_expire_after_their_last_use(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sql_result_store.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(sql_result_store, "STORE_TTL_SECONDS", 60)
+    used, unused = sql_result_store.put_result(sales(2)), sql_result_store.put_result(sales(2))
+
+    now[0] += 50
+    assert sql_result_store.get_result(used) is not None
+    now[0] += 50
+    assert sql_result_store.get_result(unused) is None
+    assert sql_result_store.get_result(used) is not None
@@ -0,0 +1,99 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.services.sql_validator import MAX_QUERY_ROWS, validate_sql
+
+TABLES = {
+    "products": ["id", "name", "Unit Price"],
+    "sales": ["transaction_id", "product_id", "quantity", "date"],
+}
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT name FROM products;", f"SELECT name FROM products\nLIMIT {MAX_QUERY_ROWS}"),
+        ("select name from products limit 5", "select name from products limit 5"),
+        (
+            "select name from products LIMIT 999999",
+            f"select name from products LIMIT {MAX_QUERY_ROWS}",
+        ),
+        (
+            "select name from products limit all",
+            f"select name from products limit {MAX_QUERY_ROWS}",
+        ),
+        (
+            "select * from (select name from products limit 3) t",
+            f"select * from (select name from products limit 3) t\nLIMIT {MAX_QUERY_ROWS}",
+        ),
+        (
+            "select name from products fetch first 3 rows only",
+            "select name from products fetch first 3 rows only",
+        ),
+    ],
+)
+def test_limit_is_added_or_lowered(sql, expected):
+    assert validate_sql(sql, TABLES) == (expected, [])
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT p.name, SUM(s.quantity) FROM sales s JOIN products p ON p.id = s.product_id"
+        " WHERE s.date >= '2025-01-01' GROUP BY p.name",
+        "SELECT EXTRACT(YEAR FROM date) AS year, COUNT(*) FROM public.sales GROUP BY 1",
+        "WITH monthly AS (SELECT product_id, SUM(quantity) AS q FROM sales GROUP BY 1)"
+        ' SELECT m.q, p."Unit Price" FROM monthly m JOIN products AS p ON p.id = m.product_id',
+        "SELECT day FROM generate_series('2025-01-01'::date, '2025-01-31', '1 day') AS day",
+        "SELECT name FROM products WHERE name = 'DROP TABLE sales; --'",
+    ],
+)
+def test_valid_queries(sql):
+    checked, problems = validate_sql(sql, TABLES)
+    assert problems == []
+    assert checked.startswith(sql)
+
+
+@pytest.mark.parametrize(
+    "sql, problem",
+    [
+        ("DELETE FROM sales", "Only SELECT queries can be run"),
+        ("SELECT 1; DROP TABLE sales", "Only a single statement can be run"),
+        (
+            "WITH gone AS (DELETE FROM sales RETURNING *) SELECT * FROM gone",
+            "Query is not read-only: DELETE",
+        ),
+        ("SELECT * INTO backup FROM sales", "Query is not read-only: INTO"),
+        ("SELECT * FROM sales FOR UPDATE", "Query is not read-only: UPDATE"),
+        (
+            "SELECT setval('sales_id_seq', 1), pg_terminate_backend(123)",
+            "Query calls functions with side effects: pg_terminate_backend, setval",
+        ),
+        (
+            "SELECT pg_catalog.nextval('sales_id_seq')",
+            "Query calls functions with side effects: nextval",
+        ),
+        (
+            "SELECT set_config('search_path', 'x', false), pg_advisory_lock(1)",
+            "Query calls functions with side effects: pg_advisory_lock, set_config",
+        ),
+        ("SELECT lo_import('/etc/passwd')", "Query calls functions with side effects: lo_import"),
+        ("SELECT name FROM produts", "Unknown table produts"),
+        ("SELECT usename FROM pg_catalog.pg_user", "Unknown table pg_catalog.pg_user"),
+        ("SELECT s.amount FROM sales s", "Unknown column amount in table sales"),
+        ("SELECT sales.qty FROM sales", "Unknown column qty in table sales"),
+    ],
+)
+def test_invalid_queries(sql, problem):
+    checked, problems = validate_sql(sql, TABLES)
+    assert checked is None
+    assert problem in problems
+
+
+def test_names_are_not_checked_without_a_schema():
+    assert validate_sql("SELECT x.y FROM anything x")[1] == []
+    assert validate_sql("UPDATE anything SET y = 1")[0] is None
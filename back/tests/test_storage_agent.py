@@ -21,3 +21,66 @@ def test_storage_agent_is_created_correctly(monkeypatch):
     agent = storage_agent.storage_react_agent
     assert agent.name == "storage_agent"
     assert "sql_agent_tool" in agent.nodes["tools"].bound.tools_by_name
+
+
+PRODUCTS = {1: {"name": "Mango", "price": 1.5}}
+
+
+@pytest.fixture
+def inventory(monkeypatch):
+    calls = []
+    monkeypatch.setattr(storage_agent, "get_product_dimension", lambda: PRODUCTS)
+    monkeypatch.setattr(
+        storage_agent,
+        "resolve_product_id",
+        lambda product: 1 if str(product).lower() in ("mango", "1") else None,
+    )
+
+    def inventory_at(product_id, at):
+        calls.append((product_id, at))
+        return 17
+
+    monkeypatch.setattr(storage_agent, "inventory_at", inventory_at)
+    return calls
+
+
+def test_inventory_report_of_a_product_on_a_date_is_end_of_day(inventory):
+    result = storage_agent.inventory_levels_report("Mango", at="2025-03-01")
+
+    assert result == {"product": "Mango", "at": "2025-03-01T23:59:59", "amount": 17}
+    assert inventory[0][1].date().isoformat() == "2025-03-01"
+
+
+def test_inventory_report_over_a_range(inventory, monkeypatch):
+    import pandas as pd
+
+    def inventory_levels(start, end):
+        return pd.DataFrame({1: [5, 4]}, index=pd.date_range(start, end))
+
+    monkeypatch.setattr(storage_agent, "inventory_levels", inventory_levels)
+
+    result = storage_agent.inventory_levels_report(start_date="2025-03-01", end_date="2025-03-02")
+
+    assert result == {"days": ["2025-03-01", "2025-03-02"], "levels": {"Mango": [5, 4]}}
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"product": "Durian", "at": "2025-03-01"},
+        {"at": "2025-03-01"},
+        {"product": "Mango", "at": "someday"},
+        {"start_date": "2025-01-01"},
+        {"start_date": "2024-01-01", "end_date": "2025-01-01"},
+    ],
+)
+def test_inventory_report_rejects_invalid_requests(inventory, kwargs):
+    assert "error" in storage_agent.inventory_levels_report(**kwargs)
+    assert not inventory
+
+
+def test_storage_agent_can_call_the_inventory_tool():
+    assert (
+        "inventory_levels_tool"
+        in storage_agent.storage_react_agent.nodes["tools"].bound.tools_by_name
+    )
@@ -18,3 +18,38 @@ export const fetchSalesData = async (startDate, endDate) => {
     throw err;
   }
 };
+
+// ranges: { name: [startDate, endDate] }, answered by one request and one query
+export const fetchSalesDataRanges = async (ranges) => {
+  const params = new URLSearchParams();
+  Object.entries(ranges).forEach(([name, [startDate, endDate]]) => {
+    params.append('range', `${name}:${startDate}:${endDate}`);
+  });
+
+  try {
+    const res = await axios.get(`${VITE_BACKEND_URL}/api/sales-data`, {
+      params,
+      withCredentials: true,
+    });
+
+    return res.data.ranges;
+  } catch (err) {
+    console.error('Error fetching sales data ranges:', err);
+    throw err;
+  }
+};
+
+// Delta sync: pass the cursor of the previous response, 0 for everything
+export const fetchSalesChanges = async (since = 0, granularity = 'day') => {
+  try {
+    const res = await axios.get(`${VITE_BACKEND_URL}/api/sales-changes`, {
+      params: { since, granularity },
+      withCredentials: true,
+    });
+
+    return res.data;
+  } catch (err) {
+    console.error('Error fetching sales changes:', err);
+    throw err;
+  }
+};